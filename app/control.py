@@ -1,11 +1,15 @@
 import data
 import view
 import error
+import profiling
+import snapshot
 import os
+import pandas as pd
 from jinja2 import Environment, FileSystemLoader
 
 NAME_SEARCH = 'search'
 NAME_PRINT = 'print'
+REFRESH_INTERVAL = 2000  # milliseconds between the checks for changes of the database in read-only mode
 
 
 class MainControl:
@@ -15,15 +19,20 @@ class MainControl:
     data_con: data.DatabaseConnector
     main_app: view.MainApplication
     main_tables: []
+    _pending_changes: list
+    _commit_conflicts: pd.DataFrame
 
-    def __init__(self, database, db_def, gui_def, path):
+    def __init__(self, database, db_def, gui_def, path, read_only=False):
         """Initialize the main control by giving the paths of the database and the definition file.
         The main application is created and loaded with all necessary widgets.
+        In read-only mode, the tables are taken from the shared memory of a loader process if it is running,
+        they cannot be changed and are read again when the database was changed.
 
         :param database: path to the database file
         :param db_def: path to the database definition file
         :param gui_def: path to the GUI definition file
         :param path: current path of the application
+        :param read_only: True for a viewer that only displays the data
         """
 
         self.app_path = path
@@ -31,12 +40,23 @@ class MainControl:
         db_def_path = str(os.path.join(path, db_def))
         gui_def_path = str(os.path.join(path, gui_def))
 
-        self.data_con = data.DatabaseConnector(db_path, db_def_path)
-        self.main_tables = [data.NAME_PLAN, data.NAME_UNIT, data.NAME_EXERCISE, data.NAME_CATEGORY,
-                            data.NAME_RESOURCE]  # data.NAME_CALENDAR is not yet implemented
+        self.main_tables = [data.NAME_PLAN, data.NAME_CALENDAR, data.NAME_UNIT, data.NAME_EXERCISE, data.NAME_CATEGORY,
+                            data.NAME_RESOURCE]
         self.main_app = view.MainApplication(self.main_tables + [NAME_SEARCH, NAME_PRINT], gui_def_path, path)
+        # the main window is already shown, so the progress of reading large tables can be displayed
+        if read_only:
+            self.data_con = self.main_app.run_in_foreground(
+                'Daten werden geladen...', lambda progress: data.DatabaseConnector(
+                    db_path, db_def_path, progress=progress, cache=snapshot.SharedMemoryCache(db_path), read_only=True))
+        else:
+            self.data_con = self.main_app.run_in_foreground(
+                'Daten werden geladen...', lambda progress: data.DatabaseConnector(db_path, db_def_path,
+                                                                                    progress=progress))
         self.main_app.init_main_widget(self.main_tables, self._get_data_of_tables(self.main_tables))
         self.main_app.set_main_tree_widget(self._get_tree_structure())
+        self._pending_changes = []  # changes of the data that are not yet displayed
+        self._commit_conflicts = None  # rows of the last commit that were changed by another process
+        self.data_con.connect_change_listener(self._data_changed)
         self._init_connectors()
 
     def _init_connectors(self):
@@ -45,28 +65,63 @@ class MainControl:
         :return: None
         """
 
-        # create, search, commit and revert are only accessible from the main widget
-        self.main_app.connect_create(self._button_create)
+        # search is only accessible from the main widget
         self.main_app.connect_search(self._button_search)
-        self.main_app.connect_commit(self._button_commit)
-        self.main_app.connect_revert(self._button_revert)
         self.main_app.connect_table_click(self._table_clicked)
 
-        # save and delete are only accessible from the detail widgets
-        self.main_app.connect_save(self.main_tables, self._button_save)
-        self.main_app.connect_delete(self.main_tables, self._button_delete)
+        if self.data_con.is_read_only():
+            # the data cannot be changed, but is read again if another process has changed the database
+            self.main_app.set_read_only()
+            self.main_app.connect_timer(REFRESH_INTERVAL, self._refresh_data)
+        else:
+            # create, commit and revert are only accessible from the main widget
+            self.main_app.connect_create(self._button_create)
+            self.main_app.connect_commit(self._button_commit)
+            self.main_app.connect_revert(self._button_revert)
+            # save and delete are only accessible from the detail widgets
+            self.main_app.connect_save(self.main_tables, self._button_save)
+            self.main_app.connect_delete(self.main_tables, self._button_delete)
+            # undo and redo of the changes that were not committed yet
+            self.main_app.connect_shortcut('Ctrl+Z', self._undo)
+            self.main_app.connect_shortcut('Ctrl+Y', self._redo)
         # cancel is accessible from all detail and additional widgets, but not the main widget
         self.main_app.connect_cancel(self.main_tables + [NAME_SEARCH, NAME_PRINT], self._button_cancel)
         # display, edit and export are only accessible from the search widget
         self.main_app.connect_display([NAME_SEARCH], self._button_display)
-        self.main_app.connect_edit([NAME_SEARCH], self._button_edit)
+        if not self.data_con.is_read_only():
+            self.main_app.connect_edit([NAME_SEARCH], self._button_edit)
         self.main_app.connect_export([NAME_SEARCH], self._button_export)
         # print is only accessible from the export/print widget
         self.main_app.connect_print([NAME_PRINT], self._button_print)
+        # the language of the displayed texts can be switched at any time
+        self.main_app.connect_shortcut('F9', self._switch_language)
+        # the debug tables are only accessible if profiling is enabled
+        if profiling.is_enabled():
+            self.main_app.connect_shortcut('F11', self._show_memory_report)
+            self.main_app.connect_shortcut('F12', self._show_statistics)
+
+    def _switch_language(self):
+        """This action switches the displayed texts to the next language of the translations.
+
+        :return: None
+        """
+
+        languages = view.LANGUAGES
+        self.main_app.set_language(languages[(languages.index(self.main_app.get_language()) + 1) % len(languages)])
+
+    def _refresh_data(self):
+        """This action is called periodically in read-only mode to read the tables again if the database was changed.
+        The main widgets are rebuilt by _data_changed.
+
+        :return: None
+        """
+
+        if not self.main_app.is_busy():
+            self.data_con.refresh()
 
     def _switch_main_widget(self, name=None):
         """Switch the main widget to a table specific one or back to the initial main widget.
-        If it is switched back to the initial main widget, the main tree widget is calculated again.
+        The main widgets do not need to be calculated again, as they are kept up to date by _data_changed.
 
         :param name: name of the table/widget to be loaded - will switch back to main if None is given
         :return: None
@@ -74,13 +129,95 @@ class MainControl:
         if name is None:
             # switch back to the main widget
             self.main_app.switch_main_widget()
-            # calculate the new tree structure and set the main tree widget
-            self.main_app.set_main_tree_widget(self._get_tree_structure())
-            self.main_app.init_main_widget(self.main_tables, self._get_data_of_tables(self.main_tables))
         else:
             # switch to the given widget
             self.main_app.switch_main_widget(name)
 
+    def _data_changed(self, table_name, event, entry):
+        """This action is called by the database connector for every changed row.
+        The change is applied to the main widgets directly, unless a background task is running.
+        In that case, the change is stored and applied after the task has finished.
+
+        :param table_name: name of the changed table
+        :param event: type of the change (data.EVENT_*)
+        :param entry: Series element that was changed, None if the whole table was reloaded
+        :return: None
+        """
+
+        self._pending_changes.append((table_name, event, entry))
+        if not self.main_app.is_busy():
+            # widgets may only be changed from the main thread
+            self._apply_pending_changes()
+
+    def _apply_pending_changes(self):
+        """Apply all stored changes of the data to the main table widgets and the main tree widget.
+        Only the affected rows and tree items are changed. If a table was reloaded, everything is built again.
+
+        :return: None
+        """
+
+        changes = self._pending_changes
+        self._pending_changes = []
+
+        if any(event == data.EVENT_RELOADED for table_name, event, entry in changes):
+            # the whole table was read again, so the main widgets need to be built again
+            self.main_app.set_main_tree_widget(self._get_tree_structure())
+            self.main_app.init_main_widget(self.main_tables, self._get_data_of_tables(self.main_tables))
+            return
+
+        for table_name, event, entry in changes:
+            if event == data.EVENT_TOTAL:
+                # the materialized total of an entry has changed, so only the total column is updated
+                self.main_app.update_main_tree_totals(table_name, entry['ID'], entry[data.TOTAL_COLUMN])
+            elif self.data_con.is_relation_table(table_name):
+                self._apply_relation_change(table_name, event, entry)
+            elif table_name in self.main_tables:
+                self._apply_entry_change(table_name, event, entry)
+
+    def _apply_entry_change(self, table_name, event, entry):
+        """Apply the change of an entry of a main or subordinate table to the main widgets.
+
+        :param table_name: name of the changed table
+        :param event: type of the change (data.EVENT_*)
+        :param entry: Series element that was changed
+        :return: None
+        """
+
+        if event == data.EVENT_INSERTED:
+            # a new entry has no relations yet, so the tree item has no children
+            self.main_app.insert_main_table_row(table_name, entry)
+            self.main_app.insert_main_tree_item(self._build_tree_item([table_name, entry, None]))
+        elif event == data.EVENT_UPDATED:
+            self.main_app.update_main_table_row(table_name, entry)
+            self.main_app.update_main_tree_items(table_name, entry)
+        elif event == data.EVENT_DELETED:
+            self.main_app.remove_main_table_row(table_name, entry['ID'])
+            self.main_app.remove_main_tree_items(table_name, entry['ID'])
+
+    def _apply_relation_change(self, table_name, event, entry):
+        """Apply the change of a relation table entry to the main tree widget.
+        The entry of the related table is added or removed as a child of every item of the top table entry.
+
+        :param table_name: name of the changed relation table
+        :param event: type of the change (data.EVENT_*)
+        :param entry: Series element that was changed
+        :return: None
+        """
+
+        top_key = self.data_con.get_top_table_key(table_name)
+        top_table = self.data_con.get_column_relations(table_name)[top_key]
+        for column, sub_table in self.data_con.get_column_relations(table_name).items():
+            if column == top_key:
+                continue  # the top table is the parent, not the child
+
+            if event == data.EVENT_INSERTED:
+                # build the tree item of the child including its own children
+                sub_data = self.data_con.get_data_top_down(sub_table, [entry[column]])
+                self.main_app.add_main_tree_child(top_table, entry[top_key],
+                                                  self._build_tree_item(sub_data[entry[column]]))
+            elif event == data.EVENT_DELETED:
+                self.main_app.remove_main_tree_child(top_table, entry[top_key], sub_table, entry[column])
+
     def _fill_relation_tables(self, table, main_id='', editable=True):
         """Fill the relation tables of the current widget according to the data related to the given table.
         Tables can optionally be set to disabled, so no changes can be done.
@@ -92,80 +229,87 @@ class MainControl:
         :return: None
         """
 
-        # retrieve the defined relation table settings
-        relation_tables = self.data_con.get_table_relations(table)
-        # iterate all relation tables
-        for table_name in relation_tables.keys():
-            # relation table name consists of the two main tables joined together
-            sub_tables = table_name.split('_')
-            if len(sub_tables) == 2:
-                if table == sub_tables[0]:
-                    # first part is main table, so second part is sub_table
-                    sub_table = sub_tables[1]
-                elif table == sub_tables[1]:
-                    # second part is main table, so first part is sub_table
-                    sub_table = sub_tables[0]
-                else:
-                    # given table name is not existent in relation table name
-                    self.main_app.send_critical_message(
-                        f'Fehler! Beziehungen in Datenbankschema falsch gesetzt für {table}')
-                    return
-
-                # retrieve the data of the sub_table and set the relation table in the current widget
-                sub_table_data = self.data_con.get_table_content(sub_table)
-                relation_was_set = self.main_app.set_relation_table(sub_table, sub_table_data, editable)
-
-                # set the selected entries of the sub_table only if a main ID is given and a relation was set
-                if main_id != '' and relation_was_set:
-                    # search for the entries in the relation table that match the main ID
-                    relation_data = self.data_con.lookup_entry_in_table(table_name, relation_tables[table_name],
-                                                                        [main_id])
-                    # get the key name of the sub table
-                    sub_table_key = self.data_con.get_table_relations(sub_table)[table_name]
-                    # search for the entries in the sub table that match the entries of the selected relation table data
-                    selected_sub_table_data = self.data_con.lookup_entry_in_table(sub_table, 'ID', relation_data[
-                        sub_table_key].to_list())
-
-                    # build the list of selected rows for the table widget
-                    selected_rows = sub_table_data[
-                        sub_table_data['ID'].isin(selected_sub_table_data['ID'])].index.to_list()
-                    # set the selection in the table widget
-                    self.main_app.set_relation_table_selection(sub_table, selected_rows)
-                else:
-                    # clear the selection in the table widget
-                    self.main_app.set_relation_table_selection(sub_table, [])
-
+        # iterate all relations to the tables on the far side of the relation tables
+        for relation in self.data_con.get_relations(table):
+            # retrieve the data of the sub_table and set the relation table in the current widget
+            sub_table_data = self.data_con.get_table_content(relation.far_table)
+            relation_was_set = self.main_app.set_relation_table(relation.far_table, sub_table_data, editable)
+
+            # set the selected entries of the sub_table only if a main ID is given and a relation was set
+            if main_id != '' and relation_was_set:
+                # search for the entries in the relation table that match the main ID
+                relation_data = self.data_con.lookup_entry_in_table(relation.relation_table, relation.key, [main_id])
+
+                # build the list of selected rows for the table widget
+                selected_rows = sub_table_data[
+                    sub_table_data['ID'].isin(relation_data[relation.far_key])].index.to_list()
+                # set the selection in the table widget
+                self.main_app.set_relation_table_selection(relation.far_table, selected_rows)
             else:
-                # table name contains two underscores, logic cannot apply
-                self.main_app.send_critical_message(
-                    f'Fehler! Datenbankschema oder Programmierung falsch für {table}!')
+                # clear the selection in the table widget
+                self.main_app.set_relation_table_selection(relation.far_table, [])
+
+    def _fill_lookup_tables(self, table, editable=True):
+        """Fill the table fields of the current widget that choose an entry of another table,
+        e.g. the plan of a calendar entry. The tables are found via the column relations of the given table.
+        The tables need to be filled before the fields are set, as the value of such a field is the chosen row.
+
+        :param table: name of the currently displayed table
+        :param editable: optional switch to set tables to disabled, so no changes can be done
+        :return: None
+        """
 
-    def __show_widget(self, table_name, table_rows, edit_mode=True):
+        for column, far_table in self.data_con.get_column_relations(table).items():
+            if far_table != '':
+                self.main_app.set_relation_table(far_table, self.data_con.get_table_content(far_table), editable)
+
+    def __show_widget(self, table_name, table_ids, edit_mode=True):
         """Show the chosen widget and fill the widget fields with data.
         Set edit_mode to define if data should be editable or not.
 
+        :param table_name: name of the table
+        :param table_ids: IDs of the selected rows
         :param edit_mode: True if data should be editable and save button enabled.
         :return: None
         """
 
         # check if only one row was selected
-        if len(table_rows) == 0:
+        if len(table_ids) == 0:
             # too few lines selected
             self.main_app.send_critical_message('Fehler! Keine Zeile ausgewählt! Bitte genau eine Zeile auswählen!')
-        elif len(table_rows) > 1:
+        elif len(table_ids) > 1:
             # too many lines selected
             self.main_app.send_critical_message('Fehler! Zu viele Zeilen ausgewählt! Bitte genau eine Zeile auswählen!')
         else:
             self._switch_main_widget(table_name)  # switch to chosen table widget
-            # get row data corresponding to chosen row
-            table_data = self.data_con.get_table_content(table_name)
-            row = table_data.iloc[table_rows[0]]
+            # get row data corresponding to chosen ID
+            row = self.data_con.lookup_entry_in_table(table_name, 'ID', [table_ids[0]]).iloc[0]
             # fill the widget with data and enable the save and delete buttons
+            self._fill_lookup_tables(table_name, edit_mode)
             self.main_app.set_fields_of_current_widget(table_name, row, edit_mode)
             self.main_app.enable_save_button(edit_mode)
             self.main_app.enable_delete_button(True)
             # fill the relation tables with data
             self._fill_relation_tables(table_name, row['ID'], edit_mode)
+            # show the entries that use the displayed entry
+            used_in = self.data_con.get_used_in(table_name, row['ID'])
+            self.main_app.set_used_in({table: self.data_con.lookup_entry_in_table(table, 'ID', ids)['NAME'].to_list()
+                                       for table, ids in used_in.items()})
+
+    @staticmethod
+    def _get_table_of_widget(widget_name, action='') -> str:
+        """Get the table name out of the name of a widget of the main widget, e.g. tableMain_plan_calendar
+        or pushButton_plan_calendar_create. Table names may contain underscores themselves.
+
+        :param widget_name: name of the widget
+        :param action: optional action at the end of the widget name, e.g. create
+        :return: name of the table
+        """
+
+        table = widget_name.split('_', 1)[1]
+        if action != '':
+            table = table.removesuffix('_' + action)
+        return table.upper()
 
     def _table_clicked(self, widget_name):
         """This action is called when a main table is double-clicked.
@@ -179,10 +323,10 @@ class MainControl:
                 table_name = self.main_app.get_displayed_table()
             else:  # main table was clicked
                 # table name is found in the widget name
-                table_name = widget_name.split('_')[1].upper()
+                table_name = self._get_table_of_widget(widget_name)
 
-            table_rows = self.main_app.get_selected_rows_of_widget(widget_name)  # get selection
-            self.__show_widget(table_name, table_rows, False)  # show the widget in display mode
+            table_ids = self.main_app.get_selected_ids_of_widget(widget_name)  # get selection
+            self.__show_widget(table_name, table_ids, False)  # show the widget in display mode
         else:
             # function cannot be called here
             self.main_app.send_critical_message('Fehler! Funktion kann hier nicht ausgeführt werden!')
@@ -197,12 +341,14 @@ class MainControl:
 
         if self.main_app.get_main_display():  # check if main display is active
             # table = self.main_app.get_main_left().comboBox_tables.currentText()  # get chosen table
-            table = button_name.split('_')[1].upper()
+            table = self._get_table_of_widget(button_name, 'create')
             self._switch_main_widget(table)  # switch to chosen table widget
             self.main_app.enable_save_button(True)  # enable the save button
             self.main_app.enable_delete_button(False)  # disable the delete button
+            self._fill_lookup_tables(table)  # fill the tables to choose the related entries
             self.main_app.set_fields_of_current_widget(table, editable=True)  # set fields editable
             self._fill_relation_tables(table)  # fill the relation table widgets in the current widget
+            self.main_app.set_used_in({})  # a new entry is not used anywhere
         else:
             # if main display is not active, creation process cannot be started
             self.main_app.send_critical_message('Fehler! Funktion kann hier nicht ausgeführt werden!')
@@ -215,9 +361,9 @@ class MainControl:
         """
 
         table_name = self.main_app.get_displayed_table()  # get current table
-        table_rows = list(self.main_app.get_selected_rows_of_current_widget().values())[0]  # get selection
+        table_ids = list(self.main_app.get_selected_ids_of_current_widget().values())[0]  # get selection
 
-        self.__show_widget(table_name, table_rows, False)  # show the widget in display mode
+        self.__show_widget(table_name, table_ids, False)  # show the widget in display mode
 
     def _button_edit(self):
         """This action calls the detail widget of the chosen table with the selected entry.
@@ -227,9 +373,9 @@ class MainControl:
         """
 
         table_name = self.main_app.get_displayed_table()  # get current table
-        table_rows = list(self.main_app.get_selected_rows_of_current_widget().values())[0]  # get selection
+        table_ids = list(self.main_app.get_selected_ids_of_current_widget().values())[0]  # get selection
 
-        self.__show_widget(table_name, table_rows, True)  # show the widget in edit mode
+        self.__show_widget(table_name, table_ids, True)  # show the widget in edit mode
 
     def _button_export(self, table_name):
         """This action calls the print widget of the chosen table with the selected entry.
@@ -239,26 +385,25 @@ class MainControl:
         """
         if self.main_app.get_main_display():
             # main screen is displayed, so get table rows from corresponding table
-            table_rows = self.main_app.get_selected_rows_of_widget('tableMain_' + table_name)  # get selection
+            table_ids = self.main_app.get_selected_ids_of_widget('tableMain_' + table_name)  # get selection
             table_name = table_name.upper()
         else:
             # search screen is displayed, so get table rows from current widget
-            table_rows = list(self.main_app.get_selected_rows_of_current_widget().values())[0]  # get selection
+            table_ids = list(self.main_app.get_selected_ids_of_current_widget().values())[0]  # get selection
             table_name = self.main_app.get_displayed_table()
 
         # check if only one row was selected
-        if len(table_rows) == 0:
+        if len(table_ids) == 0:
             # too few lines selected
             self.main_app.send_critical_message('Fehler! Keine Zeile ausgewählt! Bitte genau eine Zeile auswählen!')
-        elif len(table_rows) > 1:
+        elif len(table_ids) > 1:
             # too many lines selected
             self.main_app.send_critical_message('Fehler! Zu viele Zeilen ausgewählt! Bitte genau eine Zeile auswählen!')
         else:
             self._switch_main_widget(NAME_PRINT)  # switch to export widget
             self.main_app.set_label_table_name(table_name)  # set the table name
-            # get row data corresponding to chosen row
-            table_data = self.data_con.get_table_content(table_name)
-            row = table_data.iloc[table_rows[0]]
+            # get row data corresponding to chosen ID
+            row = self.data_con.lookup_entry_in_table(table_name, 'ID', [table_ids[0]]).iloc[0]
             # build the tree structure and set the tree widget with the selected data
             self.main_app.set_current_tree_widget(self._get_tree_structure(main_id=row['ID'], table=table_name),
                                                   self.data_con.get_table_columns(table_name), True)
@@ -284,6 +429,7 @@ class MainControl:
 
         # create a jinja environment to load the template file
         env = Environment(loader=FileSystemLoader(str(os.path.join(self.app_path, 'templates'))))
+        env.filters['duration'] = view.format_duration  # durations are stored in seconds
         template_file = table_name + '.jinja'
         # load the template file
         template = env.get_template(template_file.lower())
@@ -295,8 +441,14 @@ class MainControl:
         # unit[ID, NAME, DESCRIPTION, DURATION, EXERCISE, CATEGORY]
         # exercise[ID, NAME, DESCRIPTION, DURATION, URL, CATEGORY, RESOURCE]
 
+        # add the total durations, which are maintained by the data connector
+        for unit_data in split_data[3]:
+            unit_data['TOTAL'] = self.data_con.get_duration_total(data.NAME_UNIT, unit_data['ID'])
+        plan_total = self.data_con.get_duration_total(data.NAME_PLAN, split_data[0])
+
         # render the html template with the given data
-        html = template.render(plan_name=split_data[1], plan_description=split_data[2], unit_data=split_data[3])
+        html = template.render(plan_name=split_data[1], plan_description=split_data[2], plan_total=plan_total,
+                               unit_data=split_data[3])
 
         return html
 
@@ -366,6 +518,24 @@ class MainControl:
 
         return return_data
 
+    def _show_statistics(self):
+        """This action shows the statistics of the profiler in a separate window.
+
+        :return: None
+        """
+
+        statistics = pd.DataFrame(profiling.get_profiler().get_statistics(),
+                                  columns=['NAME', 'COUNT', 'TOTAL_MS', 'MEAN_MS', 'MAX_MS', 'COPIES', 'ROWS', 'PEAK_KB'])
+        self.main_app.show_debug_table('statistics', statistics.round(3))
+
+    def _show_memory_report(self):
+        """This action shows the memory usage of all tables in a separate window.
+
+        :return: None
+        """
+
+        self.main_app.show_debug_table('memory', self.data_con.get_memory_report().round(3))
+
     def _button_print(self):
         """This action prints the currently displayed widget.
         Regarding the displayed table, the widget is either printed as pdf (from html) or as jpg (from screenshot).
@@ -390,7 +560,7 @@ class MainControl:
         if self.main_app.get_main_display():
             # search can only be accessed via the main widget
             # table_name = self.main_app.get_main_left().comboBox_tables.currentText()  # get chosen table name
-            table_name = button_name.split('_')[1].upper()
+            table_name = self._get_table_of_widget(button_name, 'search')
             self._switch_main_widget(NAME_SEARCH)  # switch to search widget
             # set up the search table with the right data
             self.main_app.set_search_table(table_name, self.data_con.get_table_content(table_name))
@@ -403,21 +573,82 @@ class MainControl:
 
     def _button_commit(self):
         """This action commits all table changes to the database.
+        The changes are written in a background thread, so the application stays responsive.
+        If another process has changed the database, the tables are read again and the widgets are updated afterwards.
+
+        :return: None
+        """
+
+        self.main_app.run_in_background('Änderungen werden gespeichert...', self._commit_task,
+                                        self._commit_finished)
 
+    def _commit_task(self, progress):
+        """Commit all changes to the database via a separate connection.
+        This method is executed in a background thread.
+
+        :param progress: function to report the progress per table
         :return: None
         """
 
-        self.data_con.commit_changes()  # commit all changes to the database
+        # the connections of the pool can be used in any thread
+        self._commit_conflicts = self.data_con.commit_changes(progress=progress)
+
+    def _commit_finished(self):
+        """Update the widgets after the commit and show the entries that could not be saved,
+        because they were changed by another user in the meantime.
+
+        :return: None
+        """
+
+        self._apply_pending_changes()
+        if self._commit_conflicts is not None and len(self._commit_conflicts.index) > 0:
+            changes = {data.EVENT_INSERTED: 'hinzugefügt', data.EVENT_UPDATED: 'geändert',
+                       data.EVENT_DELETED: 'gelöscht'}
+            entries = [f'{self.main_app.translate_text(table)} {entry_id} ({changes[change]})'
+                       for table, entry_id, change in self._commit_conflicts[['TABLE', 'ID', 'CHANGE']].itertuples(
+                           index=False)]
+            self.main_app.send_information_message('Folgende Einträge wurden zwischenzeitlich von einem anderen '
+                                                   'Benutzer geändert und nicht gespeichert:\n' + '\n'.join(entries))
 
     def _button_revert(self):
-        """This action reverts all changes made to the tables and loads them back from the database.
+        """This action reverts all changes made to the tables since they were read or committed.
+        The changes are reverted in a background thread, the widgets are updated when it is finished.
 
         :return: None
         """
 
-        self.data_con.rollback_changes()  # revert all changes, read data again from database
-        self.main_app.set_main_tree_widget(self._get_tree_structure())  # reset the main tree widget
-        self.main_app.init_main_widget(self.main_tables, self._get_data_of_tables(self.main_tables))  # reset all tables
+        self.main_app.run_in_background('Änderungen werden verworfen...', self._revert_task,
+                                        self._apply_pending_changes)
+
+    def _revert_task(self, progress):
+        """Revert all changes by undoing them in reverse order, so the database does not need to be read again.
+        This method is executed in a background thread.
+
+        :param progress: function to report the progress per table
+        :return: None
+        """
+
+        self.data_con.rollback_changes(progress=progress)
+
+    def _undo(self):
+        """This action undoes the last change that was not committed yet.
+        It is only possible in the main widget, so no detail widget shows an entry that is changed by it.
+        The main widgets are updated by _data_changed.
+
+        :return: None
+        """
+
+        if self.main_app.get_main_display() and not self.main_app.is_busy():
+            self.data_con.undo()
+
+    def _redo(self):
+        """This action redoes the last undone change. It is only possible in the main widget.
+
+        :return: None
+        """
+
+        if self.main_app.get_main_display() and not self.main_app.is_busy():
+            self.data_con.redo()
 
     def _button_cancel(self):
         """This action cancels the current widget.
@@ -470,47 +701,31 @@ class MainControl:
 
             table_data.append(value)  # add the value to the list
 
+        if table_name == data.NAME_CALENDAR and not self._check_calendar_entry(table_data):
+            return  # the entry is not saved, so it can still be changed
+
         entry_id = self._save_entry(table_name, table_data)  # save the resulting entry to the data table
 
         # also build and save relation table data
         relation_tables = self.main_app.get_gui_definition()[table_name][2]  # retrieve the GUI definition for relations
 
+        selected_ids = self.main_app.get_selected_ids_of_current_widget()  # IDs of the selected rows per widget
         for relation_widget_name in relation_tables.keys():  # iterate through all relation widgets
-            # get selected rows of widget with name relation_widget_name
-            selected_rows = self.main_app.get_selected_rows_of_current_widget()[relation_widget_name]
             # build relation table entries
             rel_table_name = relation_tables[relation_widget_name][0]  # name of relation table
             main_id_name = relation_tables[relation_widget_name][1]  # primary key name
             sub_id_name = relation_tables[relation_widget_name][2]  # foreign key name
 
-            for row in selected_rows:
-                # to get the right ID of the foreign key, the corresponding ID has to be read from the table widget
-                # ID needs to be converted into int
-                try:
-                    sub_table_id = int(self.main_app.get_item_of_table_widget(relation_widget_name, row, 0))
-                except ValueError:
-                    # ID could not be converted
-                    self.main_app.send_critical_message('Fehler beim Schreiben der Beziehungsdaten!')
-                    return
-
+            # the IDs of the foreign key are taken from the rows of the table widget
+            for sub_table_id in selected_ids[relation_widget_name].tolist():
                 # build the entry for the relation data as a dict with the key names
                 # because the right column order is not known at this point
                 relation_data = {main_id_name: entry_id,
                                  sub_id_name: sub_table_id}
                 self._save_entry(rel_table_name, relation_data)  # save the resulting entry to the data table
 
-            # get unselected rows of widget with name relation_widget_name
-            unselected_rows = self.main_app.get_unselected_rows_of_widget(relation_widget_name)
-            for row in unselected_rows:
-                # to get the right ID of the foreign key, the corresponding ID has to be read from the table widget
-                # ID needs to be converted into int
-                try:
-                    sub_table_id = int(self.main_app.get_item_of_table_widget(relation_widget_name, row, 0))
-                except ValueError:
-                    # ID could not be converted
-                    self.main_app.send_critical_message('Fehler beim Schreiben der Beziehungsdaten!')
-                    return
-
+            # get the IDs of the unselected rows of widget with name relation_widget_name
+            for sub_table_id in self.main_app.get_unselected_ids_of_widget(relation_widget_name).tolist():
                 # build the entry for the relation data as a dict with the key names
                 # because the right column order is not known at this point
                 relation_data = {main_id_name: entry_id,
@@ -523,6 +738,37 @@ class MainControl:
 
         self._switch_main_widget()  # switch back to the main widget after saving is completed
 
+    def _check_calendar_entry(self, table_data) -> bool:
+        """Check a calendar entry before it is saved. A plan needs to be chosen.
+        If other plans are scheduled on the same days, the user is asked whether the entry should be saved anyway.
+
+        :param table_data: list of values of the calendar entry
+        :return: True if the entry can be saved
+        """
+
+        try:
+            entry = self.data_con.build_record_for_table(data.NAME_CALENDAR, table_data)
+            if entry['PLAN_ID'] == '':
+                self.main_app.send_critical_message('Fehler! Kein Plan ausgewählt! Bitte genau einen Plan auswählen!')
+                return False
+            conflicts = self.data_con.get_entry_conflicts(entry)
+        except error.DataMismatchError:  # entry data does not match the data table or has no valid date
+            self.main_app.send_critical_message('Fehler beim Aufbau des Tabelleneintrags! DataMismatchError')
+            return False
+
+        if len(conflicts) == 0:
+            return True
+        # show the names of the plans with their first common day
+        calendar = self.data_con.lookup_entry_in_table(data.NAME_CALENDAR, 'ID', list(conflicts.keys()))
+        plans = self.data_con.lookup_entry_in_table(data.NAME_PLAN, 'ID', calendar['PLAN_ID'].to_list())
+        plan_names = dict(zip(plans['ID'], plans['NAME']))
+        plan_ids = dict(zip(calendar['ID'], calendar['PLAN_ID']))
+        lines = [f'{day}: {plan_names.get(plan_ids[entry_id], plan_ids[entry_id])}'
+                 for entry_id, day in conflicts.items()]
+        message = ('An folgenden Tagen ist bereits ein Plan eingetragen:\n' + '\n'.join(lines) +
+                   '\nMöchten Sie den Termin trotzdem speichern?')
+        return self.main_app.ask_user_confirmation('Terminkonflikt', message)
+
     def _button_delete(self):
         """This action deletes the currently displayed entry.
 
@@ -647,7 +893,10 @@ class MainControl:
                         child_items.append(self._build_tree_item(child_content))
 
         # finally create the top item with all child items and return
-        return self.main_app.create_tree_item(self.main_app.translate_text(name), item_data.to_list(), child_items)
+        # the total durations are maintained by the data connector, so the children do not need to be summed up
+        total = self.data_con.get_duration_total(name, item_data['ID']) if self.data_con.has_duration_totals(
+            name) else None
+        return self.main_app.create_tree_item(name, item_data, child_items, total)
 
     def _delete_entry(self, table_name, data_entry) -> int:
         """Delete an entry from the table.
@@ -661,12 +910,12 @@ class MainControl:
         try:
             if self.data_con.is_relation_table(table_name):
                 # build entry for relation table differently as it's a combination of IDs
-                entry = self.data_con.build_entry_for_relation_table(table_name, data_entry)
+                entry = self.data_con.build_record_for_relation_table(table_name, data_entry)
                 # delete the entry from the table
                 return self.data_con.delete_entry_from_table(table_name, entry)
             else:
                 # build entry for non-relation table normally
-                entry = self.data_con.build_entry_for_table(table_name, data_entry)
+                entry = self.data_con.build_record_for_table(table_name, data_entry)
                 # delete the entry from the table, including relation table entries
                 return self.data_con.delete_entry_from_table(table_name, entry)
         except error.DataMismatchError:  # entry data does not match the data table
@@ -690,7 +939,7 @@ class MainControl:
         try:
             if self.data_con.is_relation_table(table_name):
                 # build entry for relation table differently as it's a combination of IDs
-                entry = self.data_con.build_entry_for_relation_table(table_name, data_entry)
+                entry = self.data_con.build_record_for_relation_table(table_name, data_entry)
                 try:
                     # add the entry to the table - this inhibits a check whether the entry is already existing
                     self.data_con.add_entry_to_table(table_name, entry)
@@ -699,7 +948,7 @@ class MainControl:
                     return -1
             else:
                 # build entry for non-relation table normally
-                entry = self.data_con.build_entry_for_table(table_name, data_entry)
+                entry = self.data_con.build_record_for_table(table_name, data_entry)
                 if data_entry[0] == '':
                     # new entry without ID needs to be added
                     return self.data_con.add_entry_to_table(table_name, entry)
@@ -1,7 +1,22 @@
 import pandas as pd
+import numpy as np
+import itertools
+import logging
+import os
+import pathlib
+import queue
+import re
 import sqlite3
+import threading
+import time
+import weakref
 import xml.etree.ElementTree as ElTr
 import error
+import schedule
+import snapshot
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager, nullcontext
+from typing import NamedTuple
 
 NAME_UNIT = 'UNIT'
 NAME_EXERCISE = 'EXERCISE'
@@ -17,6 +32,83 @@ NAME_EXERCISE_CATEGORY = 'EXERCISE_CATEGORY'
 NAME_TYPE_MAIN = 'MAIN'
 NAME_TYPE_RELATION = 'RELATION'
 NAME_TYPE_SUB = 'SUB'
+EVENT_INSERTED = 'INSERTED'
+EVENT_UPDATED = 'UPDATED'
+EVENT_DELETED = 'DELETED'
+EVENT_RELOADED = 'RELOADED'
+EVENT_TOTAL = 'TOTAL'  # the total duration of an entry has changed, the entry contains ID and TOTAL_COLUMN
+_JOURNAL_ADD = 'ADD'
+_JOURNAL_DELETE = 'DELETE'
+_JOURNAL_MODIFY = 'MODIFY'
+READ_CHUNK_SIZE = 10000  # number of rows that are fetched from the database at once
+POOL_READERS = min(os.cpu_count() or 1, 8)  # number of read-only connections, also the threads for reading at startup
+COLUMN_DTYPES = {'INTEGER': np.int64, 'REAL': np.float64}  # dtypes of the column types, all others are objects
+VERSION_COLUMN = 'ROW_VERSION'  # column of the main tables in the database that counts the committed changes per row
+DURATION_COLUMN = 'DURATION'  # column of the durations in seconds
+TOTAL_COLUMN = 'TOTAL_DURATION'  # sum of the durations of the entries below an entry via its relation tables
+CALENDAR_COLUMNS = ('PLAN_ID', 'DATE', 'REPEAT_DAYS', 'END_DATE')  # columns of the calendar entries for the index
+_logger = logging.getLogger(__name__)
+
+
+class _Relation(NamedTuple):
+    """Edge of the relation graph from a table via a relation table to the table on the far side
+    """
+
+    relation_table: str  # name of the relation table
+    key: str  # column of the relation table that refers to the table
+    far_table: str  # name of the table on the far side
+    far_key: str  # column of the relation table that refers to the far table
+
+
+class _Record(tuple):
+    """Lightweight entry of a table that can be given to the mutation methods instead of a Series element.
+    The values are stored in the order of the table columns and can be read by column name like in a Series.
+    Each table definition creates its own record type, see _DataTableDefinition.get_record_type.
+    """
+
+    __slots__ = ()
+    _columns: tuple = ()
+    _positions: dict = {}
+
+    def __getitem__(self, key):
+        """Get a value by column name or by position
+
+        :param key: column name or position
+        :return: value of the column
+        """
+
+        if isinstance(key, str):
+            return tuple.__getitem__(self, self._positions[key])
+        return tuple.__getitem__(self, key)
+
+    def replace(self, column, value):
+        """Get a copy of the record with another value in a column
+
+        :param column: column name
+        :param value: new value of the column
+        :return: new record of the same type
+        """
+
+        values = list(self)
+        values[self._positions[column]] = value
+        return type(self)(values)
+
+    def keys(self) -> tuple:
+        """Get the columns of the record like the index of a Series
+
+        :return: column names in the order of the values
+        """
+
+        return self._columns
+
+    @classmethod
+    def get_columns(cls) -> tuple:
+        """Get the columns of the record type
+
+        :return: column names in the order of the values
+        """
+
+        return cls._columns
 
 
 class _DataTableDefinition:
@@ -31,6 +123,10 @@ class _DataTableDefinition:
     _column_relations: dict
     _table_relations: dict
     _table_keys: list
+    _relations: tuple
+    _top_table_key: str
+    _column_set: frozenset
+    _record_type: type
 
     def __init__(self, name, definition):
         """Construct a definition object out of the definitions read from XML
@@ -47,6 +143,13 @@ class _DataTableDefinition:
         self._table_keys = definition[4]
         self._table_type = definition[5]
         self._top_table = definition[6]
+        self._relations = definition[7]
+        self._top_table_key = definition[8]
+        # the checks of the entries only compare with these, so they are prepared once per table
+        self._column_set = frozenset(self._column_names)
+        self._record_type = type(f'{name}_RECORD', (_Record,), {
+            '__slots__': (), '_columns': tuple(self._column_names),
+            '_positions': {column: position for position, column in enumerate(self._column_names)}})
 
     def get_name(self) -> str:
         """Get the name of the table
@@ -64,6 +167,22 @@ class _DataTableDefinition:
 
         return self._column_names
 
+    def get_column_set(self) -> frozenset:
+        """Get all the columns of the table as a set, including column ID
+
+        :return: set of all columns
+        """
+
+        return self._column_set
+
+    def get_record_type(self) -> type:
+        """Get the record type of the table, which holds the values of an entry in the order of the columns
+
+        :return: subclass of _Record for this table
+        """
+
+        return self._record_type
+
     def get_column_types(self) -> dict:
         """Get all type definitions of the columns, excluding column ID
 
@@ -112,6 +231,33 @@ class _DataTableDefinition:
 
         return self._top_table
 
+    def get_relations(self) -> tuple:
+        """Get the edges of the relation graph from the table to the tables on the far side of its relation tables
+
+        :return: tuple of relations in the order of the relation definitions
+        """
+
+        return self._relations
+
+    def get_top_table_key(self) -> str:
+        """Get the column that refers to the top table
+
+        :return: column name of the top table key, empty string if the table has no top table
+        """
+
+        return self._top_table_key
+
+    def get_column_dtype(self, column):
+        """Get the numpy dtype of a column for reading it from the database
+
+        :param column: name of the column
+        :return: dtype of the column, object if the column is not defined or has no numeric type
+        """
+
+        if column in self._table_keys or column == VERSION_COLUMN:
+            return np.int64
+        return COLUMN_DTYPES.get(self._column_types.get(column, ''), object)
+
     def has_table_keys(self) -> bool:
         """Check if table has table keys defined
 
@@ -152,43 +298,163 @@ class _DataTable:
     _name: str
     _data: pd.DataFrame
     _definition: _DataTableDefinition
+    _modified: bool
+    _memory_usage: int
+    _journal: list
+    _redo_journal: list
+    _versions: pd.Series
 
-    def __init__(self, sql_con: sqlite3.Connection, name, definition):
+    def __init__(self, sql_con: sqlite3.Connection, name, definition, cache=None, progress=None):
         """Constructor for table object
 
         :param sql_con: sqlite connection to database
         :param name: name of table
         :param definition: definition of this table
+        :param cache: optional SnapshotCache, the table is read from its snapshot if it is still valid
+        :param progress: optional function (done, total, name) to report the number of read rows
         """
 
         self._name = name
         self._definition = _DataTableDefinition(name, definition)
+        self._modified = False  # no changes that are not yet written to the database
+        self._memory_usage = None  # memory usage is calculated when needed
+        self._journal = []  # changes since the table was read or written, to be undone in reverse order
+        self._redo_journal = []  # undone changes, to be redone in reverse order
 
         try:
-            # try to read table from database
-            self.read_table_sql(sql_con)
-        except (ValueError, pd.errors.DatabaseError):
+            # try to read table from the snapshot or else from database
+            if not self.read_table_snapshot(cache):
+                self.read_table_sql(sql_con, progress)
+                self.write_table_snapshot(cache)
+            elif progress is not None:
+                progress(len(self._data.index), len(self._data.index), name)
+        except (ValueError, sqlite3.OperationalError):
+            if sql_con.execute("select count(*) from sqlite_master where type = 'table' and name = ?",
+                               (name,)).fetchone()[0] > 0:
+                raise  # the table exists but cannot be read, so it must not be created again
             # table does not exist
             self._data = pd.DataFrame(columns=self._definition.get_column_names())
 
             if self._definition.has_table_keys():
                 # table has column ID, so index of the dataframe needs to be set
                 self._data.set_index(keys=self._definition.get_table_keys(), inplace=True, verify_integrity=True)
+            self.__split_versions()
 
             self._create_table_sql(sql_con)  # create the table in the database
 
-    def read_table_sql(self, sql_con: sqlite3.Connection):
+    def read_table_sql(self, sql_con: sqlite3.Connection, progress=None, chunk_size=READ_CHUNK_SIZE):
         """Read table from database
-        Raises ValueError when table does not exist
+        The rows are fetched in chunks and written into preallocated column arrays of the defined types,
+        so there is never more than one chunk of rows as Python objects in memory.
+        Raises sqlite3.OperationalError when table does not exist
 
         :param sql_con: sqlite connection to database
+        :param progress: optional function (done, total, name) to report the number of read rows
+        :param chunk_size: number of rows that are fetched at once
         :return: None
         """
 
-        self._data = pd.read_sql(f'select * from {self._name}', sql_con)
+        total = sql_con.execute(f'select count(*) from {self._name}').fetchone()[0]
+        cursor = sql_con.execute(f'select * from {self._name}')
+        columns = [description[0] for description in cursor.description]
+        arrays = [np.empty(total, dtype=self._definition.get_column_dtype(column)) for column in columns]
+
+        done = 0
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if len(rows) == 0:
+                break
+            if done + len(rows) > len(arrays[0]):
+                # rows were added since they were counted, so the arrays need to grow
+                arrays = [np.concatenate([array, np.empty(done + len(rows) - len(array), dtype=array.dtype)])
+                          for array in arrays]
+
+            for index, values in enumerate(zip(*rows)):  # transpose the rows of the chunk to columns
+                if arrays[index].dtype != object:
+                    chunk = np.asarray(values)
+                    if np.can_cast(chunk.dtype, arrays[index].dtype, casting='same_kind'):
+                        arrays[index][done:done + len(rows)] = chunk
+                        continue
+                    # NULL, text or real numbers in an integer column cannot be stored without changing them,
+                    # so the column needs to hold objects
+                    arrays[index] = arrays[index].astype(object)
+                arrays[index][done:done + len(rows)] = values
+            done += len(rows)
+            if progress is not None:
+                progress(done, total, self._name)
+
+        table_data = {}
+        for column, array in zip(columns, arrays):
+            array = array[:done]
+            if array.dtype == object and column in self._definition.get_table_keys():
+                # keys of a table that was created with text keys and was not converted, e.g. as it is read-only
+                table_data[column] = array.astype(np.int64)
+            elif array.dtype == object and self._definition.get_column_dtype(column) != object:
+                # numeric column with NULL values gets the same dtype as with pd.read_sql (e.g. float with NaN)
+                table_data[column] = pd.Series(array.tolist())
+            else:
+                table_data[column] = array
+        self._data = pd.DataFrame(table_data, columns=columns)
         if self._definition.has_table_keys():
             # table has column 'ID', so ID is the index
             self._data.set_index(keys=self._definition.get_table_keys(), inplace=True, verify_integrity=True)
+        self.__split_versions()
+        self._set_synchronized()
+
+    def read_table_snapshot(self, cache: snapshot.SnapshotCache) -> bool:
+        """Read table from its snapshot, if the snapshot is valid for the current state of the database
+
+        :param cache: SnapshotCache of the database or None
+        :return: True if the table was read, False if it needs to be read from the database
+        """
+
+        if cache is None:
+            return False
+        columns = self._definition.get_column_names()
+        if self._definition.has_table_keys():
+            columns = columns + [VERSION_COLUMN]  # the row versions are stored like a normal column
+        table_data = cache.load_table(self._name, columns, cache.get_database_stamp())
+        if table_data is None:
+            return False
+
+        self._data = table_data
+        if self._definition.has_table_keys():
+            # table has column 'ID', so ID is the index
+            self._data.set_index(keys=self._definition.get_table_keys(), inplace=True, verify_integrity=True)
+        self.__split_versions()
+        self._set_synchronized()
+        return True
+
+    def write_table_snapshot(self, cache: snapshot.SnapshotCache) -> bool:
+        """Write the snapshot of the table for the current state of the database.
+        Only tables whose data matches the database are written.
+
+        :param cache: SnapshotCache of the database or None
+        :return: True if the snapshot was written
+        """
+
+        if cache is None or not self.is_loaded() or self.is_modified():
+            return False
+        if self._definition.has_table_keys():
+            # the index and the row versions are stored like normal columns
+            return cache.save_table(self._name, self._data.assign(**{VERSION_COLUMN: self._versions}).reset_index(),
+                                    cache.get_database_stamp())
+        return cache.save_table(self._name, self._data, cache.get_database_stamp())
+
+    def __split_versions(self):
+        """Move the row versions out of the Dataframe, so the entries only contain the defined columns.
+        Relation tables have no row versions, as their rows are only added or deleted but never changed.
+
+        :return: None
+        """
+
+        if not self._definition.has_table_keys():
+            self._versions = None
+        elif VERSION_COLUMN in self._data.columns:
+            self._versions = self._data.pop(VERSION_COLUMN).fillna(0).astype(np.int64)
+        else:
+            # the database was not migrated yet, e.g. because it is opened read-only
+            self._versions = pd.Series(0, index=self._data.index, dtype=np.int64)
 
     def _create_table_sql(self, sql_con: sqlite3.Connection):
         """Create table on database with current contents of _data
@@ -203,102 +469,211 @@ class _DataTable:
             self._data.to_sql(self._name, con=sql_con, if_exists='fail', index=True,
                               index_label=self._definition.get_table_keys(),
                               dtype=self._definition.get_column_types())
+            _add_version_column(sql_con, self._name)
         else:
             # no column ID, so no special index
             self._data.to_sql(self._name, con=sql_con, if_exists='fail', index=False,
                               dtype=self._definition.get_column_types())
 
-    def modify_table_sql(self, sql_con: sqlite3.Connection, sort=True):
-        """Write current contents of _data to database
+    def modify_table_sql(self, sql_con: sqlite3.Connection, id_map: dict) -> list:
+        """Write the changed rows of _data to database.
+        Only the rows in the journal are written, so changes of other processes to other rows are kept.
+        A row of a main table is only written if its version in the database is still the one that was read,
+        otherwise another process has changed it in the meantime and the row is reported as conflict.
+        The conflicting rows stay in the journal, so they can be written again or reverted.
+        An added row gets a new ID if another process has added a row with the same ID in the meantime,
+        afterwards the IDs need to be replaced in all tables via replace_ids.
 
-        :param sort: sort the table by index before writing to SQL
         :param sql_con: sqlite connection to database
-        :return: None
+        :param id_map: dictionary to be filled with the new IDs by the IDs of the added rows that were already taken
+        :return: list of dictionaries of the conflicting rows, that were not written
         """
 
-        if sort:
-            # sort the dataframe if necessary
-            self._data.sort_index(axis=0, ascending=True, kind='quicksort', inplace=True)
+        if len(self._journal) == 0:
+            return []  # nothing was changed since the table was read or written
+
+        # the row before its first change tells if the row existed in the database
+        first_rows = {}
+        for kind, rows in self._journal:
+            for label, before, after in rows:
+                first_rows.setdefault(label, before)
+
+        conflicts = []
+        kept_rows = []
+        versions = self._versions.copy() if self._versions is not None else None
+        # the database is locked for other writers, so no row can change between the check and the write
+        if not sql_con.in_transaction:
+            sql_con.execute('begin immediate')
+        try:
+            for label, before in first_rows.items():
+                after = self._data.loc[label] if label in self._data.index else None
+                if versions is not None:
+                    conflict = self.__write_entry_sql(sql_con, label, after, versions, id_map)
+                    if conflict is not None:
+                        conflicts.append(conflict)
+                        kept_rows.append((label, before, after))
+                else:
+                    self.__write_relation_sql(sql_con, before, after)
+            sql_con.commit()
+        except Exception:
+            sql_con.rollback()
+            raise
 
-        if self._definition.has_table_keys():
-            # table has column 'ID', so ID is the index
-            self._data.to_sql(self._name, con=sql_con, if_exists='replace', index=True,
-                              index_label=self._definition.get_table_keys(),
-                              dtype=self._definition.get_column_types())
+        self._versions = versions
+        self._set_synchronized()
+        self.__keep_changes(kept_rows)
+        return conflicts
+
+    def __write_entry_sql(self, sql_con: sqlite3.Connection, entry_id, row, versions, id_map) -> dict:
+        """Write a changed row of a main table to database, if it was not changed by another process
+
+        :param sql_con: sqlite connection to database
+        :param entry_id: ID of the row
+        :param row: current row of the Dataframe, None if the row was deleted
+        :param versions: row versions to be updated with the written row
+        :param id_map: dictionary to be filled with the new ID, if the ID of an added row was already taken
+        :return: dictionary of the conflict or None if the row was written
+        """
+
+        key = self._definition.get_table_keys()[0]
+        values = [] if row is None else [_to_sql_value(value) for value in row.tolist()]
+        if entry_id in versions.index:
+            version = int(versions[entry_id])
+            if row is None:
+                event = EVENT_DELETED
+                cursor = sql_con.execute(f'delete from {self._name} where {key} = ? and {VERSION_COLUMN} = ?',
+                                         [int(entry_id), version])
+            else:
+                event = EVENT_UPDATED
+                assignments = ', '.join(f'{column} = ?' for column in self._data.columns)
+                cursor = sql_con.execute(f'update {self._name} set {assignments}, '
+                                         f'{VERSION_COLUMN} = {VERSION_COLUMN} + 1 '
+                                         f'where {key} = ? and {VERSION_COLUMN} = ?', values + [int(entry_id), version])
+            if cursor.rowcount == 1:
+                if row is None:
+                    versions.drop(entry_id, inplace=True)
+                else:
+                    versions[entry_id] = version + 1
+                return None
+        elif row is not None:
+            new_id = int(entry_id)
+            if sql_con.execute(f'select count(*) from {self._name} where {key} = ?', [new_id]).fetchone()[0] > 0:
+                # another process has added a row with this ID, so the next free ID of both processes is used
+                new_id = max(sql_con.execute(f'select max({key}) from {self._name}').fetchone()[0],
+                             self._data.index.max()) + 1
+                id_map[entry_id] = new_id
+            columns = ', '.join([key] + list(self._data.columns) + [VERSION_COLUMN])
+            placeholders = ', '.join(['?'] * (len(self._data.columns) + 2))
+            sql_con.execute(f'insert into {self._name} ({columns}) values ({placeholders})',
+                            [new_id] + values + [1])
+            versions[entry_id] = 1  # the row is moved to its new ID by replace_ids
+            return None
         else:
-            # no column ID, so no special index
-            self._data.to_sql(self._name, con=sql_con, if_exists='replace', index=False,
-                              dtype=self._definition.get_column_types())
+            return None  # the row was added and deleted again, so there is nothing to write
+
+        current = sql_con.execute(f'select {VERSION_COLUMN} from {self._name} where {key} = ?',
+                                  [int(entry_id)]).fetchone()
+        if current is None and row is None:
+            return None  # the row was also deleted by the other process
+        return {'TABLE': self._name, 'ID': entry_id, 'CHANGE': event, 'READ_VERSION': version,
+                'DATABASE_VERSION': current[0] if current is not None else None,
+                'ENTRY': None if row is None else row.to_dict()}
 
-    def delete_entry(self, entry: pd.Series) -> int:
+    def __write_relation_sql(self, sql_con: sqlite3.Connection, before, after):
+        """Write a changed row of a relation table to database.
+        Relation rows are identified by their values, so they do not conflict with the changes of other processes:
+        a row that was already deleted is not deleted again and a row that was already added is not added twice.
+
+        :param sql_con: sqlite connection to database
+        :param before: row before the first change, None if the row was added
+        :param after: current row of the Dataframe, None if the row was deleted
+        :return: None
+        """
+
+        if before is not None and after is not None and before.equals(after):
+            return  # the row was deleted and added again
+        condition = ' and '.join(f'{column} is ?' for column in self._data.columns)
+        if before is not None:
+            sql_con.execute(f'delete from {self._name} where rowid = '
+                            f'(select rowid from {self._name} where {condition} limit 1)',
+                            [_to_sql_value(value) for value in before.tolist()])
+        if after is not None:
+            values = [_to_sql_value(value) for value in after.tolist()]
+            if sql_con.execute(f'select count(*) from {self._name} where {condition}', values).fetchone()[0] == 0:
+                placeholders = ', '.join(['?'] * len(self._data.columns))
+                sql_con.execute(f'insert into {self._name} ({", ".join(self._data.columns)}) values ({placeholders})',
+                                values)
+
+    def delete_entry(self, entry) -> int:
         """Delete specific entry of table
 
-        :param entry: Series element to be deleted from the Dataframe
-        :return: complete Dataframe after modification
+        :param entry: Series element or record to be deleted from the Dataframe
+        :return: ID of deleted entry, -1 for relation tables
         """
 
-        if not self.__check_columns(entry):  # check if the columns of the entry match the data table
-            raise error.DataMismatchError(f'Error in check_columns: {entry.index} does not match {self._data.columns}')
-        elif self._definition.has_table_keys():
+        values = self.__get_values(entry)
+        if self._definition.has_table_keys():
             # table has column 'ID', so ID is the index
-            if entry['ID'] in self._data.index:  # check if ID is in table
-                self._data.drop(self._data[self._data.index == entry['ID']].index, axis='rows', inplace=True)
+            if values[0] in self._data.index:  # check if ID is in table
+                selected_rows = [values[0]]
             else:
                 # no entry with this ID was found
                 raise error.NoDataFoundError(f'Error! Entry {entry} was not found in table!')
-            return_id = entry['ID']
+            return_id = values[0]
         else:
             # table is relation table, so it has no column ID
-            selected_rows = self._data[self._data == entry].dropna(how='any').index
+            selected_rows = self._data.index[self.__match_rows(values)]
             if len(selected_rows) > 0:  # check if values are in table
-                self._data.drop(selected_rows, axis='rows', inplace=True)
                 return_id = -1
             else:
                 # no entry with these values was found
                 raise error.NoDataFoundError(f'Error! Entry {entry} was not found in table!')
+        self._record(_JOURNAL_DELETE, [(label, self._data.loc[label].copy(), None) for label in selected_rows])
+        self._data.drop(selected_rows, axis='rows', inplace=True)
+        self._set_modified(True)
         return return_id
 
-    def add_entry(self, entry: pd.Series) -> int:
-        """Add single entry to the table
+    def add_entry(self, entry) -> int:
+        """Add single entry to the table.
+        The ID of a new entry of a main table is set in a given Series element, records cannot be changed.
 
-        :param entry: Series element to be added to the Dataframe
+        :param entry: Series element or record to be added to the Dataframe
         :return: ID of added entry
         """
 
-        if not self.__check_columns(entry):  # check if the columns of the entry match the data table
-            raise error.DataMismatchError(f'Error in check_columns: {entry.index} does not match {self._data.columns}')
+        values = self.__get_values(entry)
+        # all subsequent IDs are +1 of the max index, the first ID is set to zero
+        return_id = 0 if len(self._data.index) == 0 else self._data.index.max() + 1
+        if self._definition.has_table_keys():
+            # ID will be determined dynamically
+            if isinstance(entry, pd.Series):
+                entry['ID'] = return_id
+            self.__set_row(return_id, values[1:])
         else:
-            if self._definition.has_table_keys():
-                # ID will be determined dynamically
-                if len(self._data.index) == 0:  # check if dataframe is empty
-                    entry['ID'] = return_id = 0  # first ID is set to zero
-                else:
-                    entry['ID'] = return_id = self._data.index.max() + 1  # all subsequent IDs are +1 of the max index
-                self._data.loc[entry['ID']] = entry
-            else:
-                # check if keys already exist in the Dataframe
-                if len(self._data[self._data == entry].dropna(how='any').index) > 0:
-                    raise error.KeyAlreadyExistError(f'Key {list(entry)} already exists in Dataframe!')
-                else:
-                    # if table has no ID, just add the entry to the end of the Dataframe
-                    return_id = self._data.index.max() + 1  # all subsequent IDs are +1 of the max index
-                    self._data.loc[return_id] = entry
+            # check if keys already exist in the Dataframe
+            if self.__match_rows(values).any():
+                raise error.KeyAlreadyExistError(f'Key {values} already exists in Dataframe!')
+            # if table has no ID, just add the entry to the end of the Dataframe
+            self.__set_row(return_id, values)
+        self._record(_JOURNAL_ADD, [(return_id, None, self._data.loc[return_id].copy())])
+        self._set_modified(True)
         return return_id
 
-    def modify_entry(self, entry: pd.Series) -> int:
+    def modify_entry(self, entry) -> int:
         """Modify a single entry of the table
 
-        :param entry: Series element to be modified
+        :param entry: Series element or record to be modified
         :return: ID of modified entry
         """
 
-        if not self.__check_columns(entry):  # check if the columns of the entry match the data table
-            raise error.DataMismatchError(f'Error in check_columns: {entry.index} does not match {self._data.columns}')
-        elif self._definition.has_table_keys():
+        values = self.__get_values(entry)
+        if self._definition.has_table_keys():
             # table is main table, so column ID exists
-            if entry['ID'] in self._data.index:  # check if ID is in table
-                for col in self._data.columns:
-                    self._data.at[entry['ID'], col] = entry[col]
+            if values[0] in self._data.index:  # check if ID is in table
+                before = self._data.loc[values[0]].copy()
+                for col, value in zip(self._definition.get_column_names()[1:], values[1:]):
+                    self._data.at[values[0], col] = value
+                self._record(_JOURNAL_MODIFY, [(values[0], before, self._data.loc[values[0]].copy())])
             else:
                 # no entry with this ID was found
                 raise error.NoDataFoundError(f'Error! Entry {entry} was not found in table!')
@@ -306,7 +681,8 @@ class _DataTable:
             # relation table entries cannot be modified, only deleted and added
             raise error.ForbiddenActionError(f'Modify is not allowed on this type of table!')
 
-        return entry['ID']
+        self._set_modified(True)
+        return values[0]
 
     def lookup_table_by_column(self, name, values) -> pd.DataFrame:
         """Lookup all entries in a table where the column values match the given values
@@ -344,89 +720,1000 @@ class _DataTable:
 
         return self._definition
 
-    def __check_columns(self, row: pd.Series) -> bool:
-        """Check if the columns of a row have the same definition as the Dataframe
+    def _record(self, kind, rows):
+        """Record a change in the journal, so it can be undone.
+        Changes that were undone before cannot be redone anymore.
 
-        :param row: Series to check the columns
-        :return: True if column definitions match, False if not
+        :param kind: kind of the change (_JOURNAL_*)
+        :param rows: list of (index, row before, row after) of all changed rows, the missing row is None
+        :return: None
         """
 
-        if self._definition.has_table_keys():
-            # if the table has table keys, reset_index() is necessary as the ID field is present in row,
-            # but normally not in the dataframe because it is defined as the index.
-            if not len(self._data.reset_index().columns.difference(row.index)) == 0:
-                return False
-            else:
-                return True
-        else:
-            # if the table has no table keys, just compare the indices of the columns.
-            if not len(self._data.columns.difference(row.index)) == 0:
-                return False
+        self._journal.append((kind, rows))
+        self.discard_redo()
+
+    def undo(self) -> list:
+        """Undo the last change of the journal
+
+        :return: list of (event, entry) of the changed rows to be notified, empty if there is nothing to undo
+        """
+
+        if len(self._journal) == 0:
+            return []
+        kind, rows = self._journal.pop()
+        self._redo_journal.append((kind, rows))
+        # the inverse change: an added row is deleted, a deleted row is added and a modified row gets its old values
+        changes = [(label, after, before) for label, before, after in reversed(rows)]
+        return self.__apply_changes(changes, {_JOURNAL_ADD: EVENT_DELETED, _JOURNAL_DELETE: EVENT_INSERTED,
+                                              _JOURNAL_MODIFY: EVENT_UPDATED}[kind])
+
+    def redo(self) -> list:
+        """Redo the last undone change
+
+        :return: list of (event, entry) of the changed rows to be notified, empty if there is nothing to redo
+        """
+
+        if len(self._redo_journal) == 0:
+            return []
+        kind, rows = self._redo_journal.pop()
+        self._journal.append((kind, rows))
+        return self.__apply_changes(rows, {_JOURNAL_ADD: EVENT_INSERTED, _JOURNAL_DELETE: EVENT_DELETED,
+                                           _JOURNAL_MODIFY: EVENT_UPDATED}[kind])
+
+    def rollback(self) -> list:
+        """Undo all changes since the table was read or written, so it matches the database again.
+        Only the changed rows are touched, so the costs depend on the number of changes, not on the size of the table.
+
+        :return: list of (event, entry) of the changed rows to be notified
+        """
+
+        changes = []
+        while len(self._journal) > 0:
+            changes += self.undo()
+        self._redo_journal = []
+        return changes
+
+    def discard_redo(self):
+        """Discard the undone changes, as a new change was made
+
+        :return: None
+        """
+
+        self._redo_journal = []
+
+    def __apply_changes(self, changes, event) -> list:
+        """Apply changes of the journal to the Dataframe
+
+        :param changes: list of (index, old row, new row), the row is added if there is no old row and deleted
+            if there is no new row
+        :param event: event to be notified for the changed rows
+        :return: list of (event, entry) of the changed rows
+        """
+
+        notifications = []
+        for label, old_row, new_row in changes:
+            if new_row is None:
+                self._data.drop(label, axis='rows', inplace=True)
+                notifications.append((event, self.__build_entry(label, old_row)))
             else:
-                return True
+                self.__set_row(label, new_row)
+                notifications.append((event, self.__build_entry(label, new_row)))
+
+        if not self._data.index.is_monotonic_increasing:
+            # deleted rows were added at the end, so the original order needs to be restored
+            self._data.sort_index(inplace=True)
+        self._set_modified(len(self._journal) > 0)
+        return notifications
+
+    def __set_row(self, label, values):
+        """Set a row of the Dataframe, the row is added if the label does not exist.
+        The first row of an empty Dataframe would turn all columns into objects, so their types are inferred again.
+
+        :param label: index label of the row
+        :param values: values of the row in the order of the columns
+        :return: None
+        """
+
+        was_empty = len(self._data.index) == 0
+        self._data.loc[label] = values
+        if was_empty:
+            self._data = self._data.infer_objects()
+
+    def __build_entry(self, label, row) -> pd.Series:
+        """Build the entry of a row as it is given to the mutation methods, including the ID of main tables
+
+        :param label: index of the row
+        :param row: row of the Dataframe
+        :return: Series element of the row
+        """
+
+        if self._definition.has_table_keys():
+            return pd.Series([label] + row.to_list(), index=self._definition.get_table_keys() + list(row.index))
+        return row.copy()
+
+    def _set_synchronized(self):
+        """Mark the table as matching the database after it was read or written.
+        The changes before cannot be undone anymore.
+
+        :return: None
+        """
+
+        self._journal = []
+        self._redo_journal = []
+        self._set_modified(False)
+
+    def __keep_changes(self, rows):
+        """Record changed rows in the journal again after the table was read or written, e.g. the rows that could not
+        be written because of a conflict. Every row becomes a change of its own, so it can be reverted.
+
+        :param rows: list of (index, row in the Dataframe before the change, row after the change)
+        :return: None
+        """
+
+        for label, before, after in rows:
+            if before is None and after is None or before is not None and after is not None and before.equals(after):
+                continue
+            kind = _JOURNAL_ADD if before is None else _JOURNAL_DELETE if after is None else _JOURNAL_MODIFY
+            self._journal.append((kind, [(label, before, after)]))
+        self._set_modified(len(self._journal) > 0)
+
+    def get_changed_rows(self) -> dict:
+        """Get the current rows of all rows in the journal, to keep the changes when the table is read again
+
+        :return: dictionary of the rows by their index, None for deleted rows
+        """
+
+        return {label: self._data.loc[label].copy() if label in self._data.index else None
+                for kind, rows in self._journal for label, before, after in rows}
+
+    def restore_changed_rows(self, changed_rows):
+        """Apply the rows of get_changed_rows again after the table was read again.
+        The changes are recorded against the rows that were read, so they can be reverted to them.
+
+        :param changed_rows: dictionary of the rows by their index, None for deleted rows
+        :return: None
+        """
+
+        rows = []
+        for label, after in changed_rows.items():
+            before = self._data.loc[label].copy() if label in self._data.index else None
+            if after is None and before is not None:
+                self._data.drop(label, axis='rows', inplace=True)
+            elif after is not None:
+                self.__set_row(label, after)
+            rows.append((label, before, after))
+        if not self._data.index.is_monotonic_increasing:
+            self._data.sort_index(inplace=True)
+        self.__keep_changes(rows)
+
+    def replace_ids(self, table_name, id_map) -> bool:
+        """Replace the IDs of rows of a table that were changed when they were written, in the index of the rows
+        if it is this table, or else in the columns of this table that refer to the table
+
+        :param table_name: name of the table with the changed IDs
+        :param id_map: dictionary of the new IDs by the old IDs
+        :return: True if any row of this table was changed
+        """
+
+        if table_name == self._name:
+            self._data.rename(index=id_map, inplace=True)
+            self._versions.rename(index=id_map, inplace=True)
+            self._data.sort_index(inplace=True)
+            self._versions.sort_index(inplace=True)
+            return True
+
+        columns = [column for column, relation in self._definition.get_column_relations().items()
+                   if relation == table_name]
+        replaced = False
+        for column in columns:
+            selection = self._data[column].isin(id_map.keys())
+            if selection.any():
+                self._data.loc[selection, column] = self._data.loc[selection, column].map(id_map)
+                replaced = True
+            # the changes in the journal refer to the new IDs as well, so they can be undone and redone
+            for kind, rows in self._journal + self._redo_journal:
+                for row in [row for label, before, after in rows for row in (before, after) if row is not None]:
+                    if row[column] in id_map:
+                        row[column] = id_map[row[column]]
+        self._memory_usage = None
+        return replaced
+
+    def _set_modified(self, modified):
+        """Set whether the table has changes that are not yet written to the database.
+        The memory usage needs to be calculated again after every change.
+
+        :param modified: True if the table was changed, False if it matches the database
+        :return: None
+        """
+
+        self._modified = modified
+        self._memory_usage = None
+
+    def is_modified(self) -> bool:
+        """Check if the table has changes that are not yet written to the database
+
+        :return: True if the table has unsaved changes
+        """
+
+        return self._modified
+
+    def is_loaded(self) -> bool:
+        """Check if the data of the table is loaded into memory
+
+        :return: True if the data is loaded, False if it was evicted
+        """
+
+        return self._data is not None
+
+    def evict(self):
+        """Remove the data of the table from memory. It needs to be read again via read_table_sql before the next use.
+        Raises ForbiddenActionError if the table has unsaved changes, as they would be lost.
+
+        :return: None
+        """
+
+        if self._modified:
+            raise error.ForbiddenActionError(f'Table {self._name} has unsaved changes and cannot be evicted!')
+        self._data = None
+        self._redo_journal = []  # undone changes cannot be redone after the table is read again
+        self._memory_usage = None
+
+    def get_memory_usage(self) -> int:
+        """Get the memory usage of the data of the table including the index and the contents of strings.
+        The value is cached until the table is changed.
+
+        :return: memory usage in bytes, 0 if the data is not loaded
+        """
+
+        if not self.is_loaded():
+            return 0
+        if self._memory_usage is None:
+            self._memory_usage = int(self._data.memory_usage(index=True, deep=True).sum())
+        return self._memory_usage
+
+    def __get_values(self, entry) -> list:
+        """Get the values of an entry in the order of the columns of the definition, including the ID of main tables.
+        Records of this table already have the right columns, Series elements are checked against the columns.
+
+        :param entry: Series element or record of this table
+        :return: list of values
+        """
+
+        if type(entry) is self._definition.get_record_type():
+            return list(entry)
+        if isinstance(entry, pd.Series) and self._definition.get_column_set().issubset(entry.index):
+            entry_values = entry.to_dict()
+            return [entry_values[column] for column in self._definition.get_column_names()]
+        # the columns of the entry do not match the data table
+        columns = entry.get_columns() if isinstance(entry, _Record) else getattr(entry, 'index', None)
+        raise error.DataMismatchError(
+            f'Error in check_columns: {columns} does not match {self._definition.get_column_names()}')
+
+    def __match_rows(self, values) -> np.ndarray:
+        """Find the rows of a relation table that have the given values in all columns
+
+        :param values: values in the order of the columns
+        :return: boolean mask of the matching rows
+        """
+
+        mask = np.ones(len(self._data.index), dtype=bool)
+        for column, value in zip(self._definition.get_column_names(), values):
+            mask &= (self._data[column] == value).to_numpy()
+        return mask
+
+
+class _ConnectionPool:
+    """Pool of sqlite3 connections to one database: one writer connection and several read-only connections.
+    The connections can be used from any thread, but only by one thread at a time.
+    """
+
+    _database: str
+    _writer: sqlite3.Connection
+    _writer_lock: threading.RLock
+    _readers: queue.Queue
+    _max_readers: int
+    _connections: list
+    _lock: threading.Lock
+
+    def __init__(self, database, max_readers=POOL_READERS, read_only=False):
+        """Open the writer connection to the database, the read-only connections are opened when they are needed
+
+        :param database: path to database file
+        :param max_readers: maximum number of read-only connections
+        :param read_only: open the writer connection in read-only mode as well, so the database cannot be changed
+        """
+
+        self._database = database
+        self._writer = self.open_connection(read_only)
+        self._writer_lock = threading.RLock()  # the writer may be used again within a write, e.g. to read
+        self._readers = queue.Queue()  # read-only connections that are not in use
+        self._max_readers = max_readers
+        self._connections = [self._writer]  # all opened connections
+        self._lock = threading.Lock()
+
+    def open_connection(self, read_only=False) -> sqlite3.Connection:
+        """Open a new connection to the database that is not managed by the pool.
+        The connection may be used in other threads than the one that created it, but not concurrently.
+
+        :param read_only: open the database in read-only mode, so the connection cannot change it
+        :return: new sqlite connection to the database
+        """
+
+        if read_only:
+            uri = pathlib.Path(self._database).absolute().as_uri() + '?mode=ro'
+            return sqlite3.connect(uri, uri=True, check_same_thread=False)
+        return sqlite3.connect(self._database, check_same_thread=False)
+
+    @contextmanager
+    def writer(self):
+        """Use the writer connection. Other threads have to wait until it is released again.
+
+        :return: context manager of the writer connection
+        """
+
+        with self._writer_lock:
+            yield self._writer
+
+    @contextmanager
+    def reader(self):
+        """Use one of the read-only connections. If all of them are in use, the thread waits for the next free one.
+
+        :return: context manager of a read-only connection
+        """
+
+        try:
+            sql_con = self._readers.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                # open a new connection as long as the maximum is not reached
+                sql_con = self.open_connection(read_only=True) if len(self._connections) <= self._max_readers else None
+                if sql_con is not None:
+                    self._connections.append(sql_con)
+            if sql_con is None:
+                sql_con = self._readers.get()
+        try:
+            yield sql_con
+        finally:
+            self._readers.put(sql_con)
+
+    def close(self):
+        """Close all connections of the pool
+
+        :return: None
+        """
+
+        with self._lock:
+            for sql_con in self._connections:
+                sql_con.close()
+            self._connections = []
 
 
 class DatabaseConnector:
     """Base class to handle the database connection
     """
 
-    _sql_con: sqlite3.Connection
+    _pool: _ConnectionPool
+    _database: str
     _data_tables: dict[str, _DataTable]
-    _instance = None
-
-    def __init__(self, database: str, db_def: str):
+    _change_listeners: list
+    _last_access: dict[str, float]
+    _memory_budget: int
+    _table_copies: weakref.WeakValueDictionary
+    _copy_ids: itertools.count
+    _snapshot_cache: snapshot.SnapshotCache
+    _read_only: bool
+    _db_def: str
+    _loaded_stamp: list
+    _history: list
+    _redo_history: list
+    _parent_relations: dict[str, list]
+    _reverse_index: dict[tuple, dict]
+    _top_down_plans: dict[str, tuple]
+    _total_relations: dict[str, list]
+    _duration_totals: dict[str, dict]
+    _durations: dict[str, dict]
+    _calendar_index: schedule.CalendarIndex
+    _instances: dict = {}  # open connectors by the real path of their database
+    _instances_lock = threading.Lock()
+
+    def __init__(self, database: str, db_def: str, use_snapshots=True, progress=None, cache=None, read_only=False):
         """Create a sqlite3 connection to a SQL database.
         If the database is not existing, it will be automatically generated as an empty database.
         Definition file as XML will be read and used to create the DataTable objects.
+        The tables are read from the snapshot cache next to the database, as long as the database was not changed.
+        If the connector of the database is already open, it is kept as it is,
+        but it must have been opened with the same definition file, cache and read_only flag.
+
+        :param database: path to database file
+        :param db_def: path to database definition file
+        :param use_snapshots: use the snapshot cache for reading the tables
+        :param progress: optional function (done, total, name) to report the read rows of every table
+        :param cache: optional cache to be used instead of the snapshot files, e.g. snapshot.SharedMemoryCache
+        :param read_only: True if the tables must not be changed, the database needs to exist already
+        :raises ValueError: if the connector of the database is already open with other options
+        """
+
+        if cache is None and use_snapshots:
+            cache = snapshot.SnapshotCache(database)
+        if getattr(self, '_database', None) is not None:
+            # connector was returned from the registry, so it is already initialized
+            self.__check_options(db_def, cache, read_only)
+            return
+
+        try:
+            self.__open(database, db_def, progress, cache, read_only)
+        except Exception:
+            # the connector cannot be used, so it must not be returned from the registry for this database
+            with self._instances_lock:
+                key = os.path.realpath(database)
+                if self._instances.get(key) is self:
+                    del self._instances[key]
+            if getattr(self, '_pool', None) is not None:
+                self._pool.close()
+            self._database = None
+            raise
+
+    def __open(self, database: str, db_def: str, progress, cache, read_only: bool):
+        """Connect to the database and read or create its tables, see __init__
 
         :param database: path to database file
         :param db_def: path to database definition file
+        :param progress: optional function (done, total, name) to report the read rows of every table
+        :param cache: cache of the snapshots or None
+        :param read_only: True if the tables must not be changed, the database needs to exist already
+        :return: None
         """
 
-        self._sql_con = sqlite3.connect(database)  # connect to given database
+        self._database = database
+        self._read_only = read_only
+        self._db_def = os.path.realpath(db_def)
+        self._pool = _ConnectionPool(database, read_only=read_only)  # connect to given database
         def_tables = _read_db_definition(db_def)  # read the db definition out of the xml file
         self._data_tables = {}  # create the dictionary for the data tables
+        self._change_listeners = []  # functions to be notified about changed rows
+        self._last_access = {}  # time of the last access per table
+        self._memory_budget = 0  # no memory budget, so no table is evicted
+        self._table_copies = weakref.WeakValueDictionary()  # live copies handed out by get_table_content
+        self._copy_ids = itertools.count()
+        self._history = []  # names of the changed tables per user action, to undo them in reverse order
+        self._redo_history = []  # undone user actions, to redo them in reverse order
+        self._parent_relations = _get_parent_relations(def_tables)
+        self._reverse_index = {}  # parent IDs by child ID per relation table and column, built when needed
+        self._top_down_plans = {}  # compiled plans of get_data_top_down by main table name
+        self._total_relations = _get_total_relations(def_tables, self._parent_relations)
+        self._duration_totals = {}  # total durations by ID per top table, built when needed
+        self._durations = {}  # durations by ID per table below a top table, to update the totals on changes
+        self._calendar_index = None  # sorted dates of the calendar, built when needed
+        self._snapshot_cache = cache
+
+        # the existing tables are read concurrently, the missing ones are created afterwards with this connection
+        with self._pool.reader() as sql_con:
+            existing_tables = {row[0] for row in sql_con.execute("select name from sqlite_master where type='table'")}
+        if not read_only:
+            self.__upgrade_tables({name: definition for name, definition in def_tables.items()
+                                   if name in existing_tables})
+        self._loaded_stamp = snapshot.get_database_stamp(database)  # changes after this are found by refresh
+        self.__load_datatables({name: definition for name, definition in def_tables.items() if name in existing_tables},
+                               progress)
 
         for name in def_tables.keys():  # iterate through all tables that are defined in the xml file
-            self.__add_datatable(name, def_tables[name])
+            if name not in self._data_tables:
+                self.__add_datatable(name, def_tables[name], progress)
+                self._loaded_stamp = snapshot.get_database_stamp(database)  # the created table is known
+        # keep the order of the definition file, as all tables are iterated in this order
+        self._data_tables = {name: self._data_tables[name] for name in def_tables.keys()}
 
-    def __new__(cls, database: str, db_def: str):
-        """Override method to create Singleton pattern.
-        Only one instance of DatabaseConnector shall be created as only one database connection is needed.
+    def __new__(cls, database: str, db_def: str, use_snapshots=True, progress=None, cache=None, read_only=False):
+        """Override method to keep one instance per database.
+        Several databases can be open at the same time, but every database only has one connector,
+        so there are no diverging copies of its tables. The connector is removed from the registry by close.
 
         :param database: path to database file
         :param db_def: path to database definition file
+        :param use_snapshots: use the snapshot cache for reading the tables
+        :param progress: optional function (done, total, name) to report the read rows of every table
+        :param cache: optional cache to be used instead of the snapshot files, e.g. snapshot.SharedMemoryCache
+        :param read_only: True if the tables must not be changed, the database needs to exist already
+        """
+
+        key = os.path.realpath(database)
+        with cls._instances_lock:
+            if key not in cls._instances:  # no instance exists yet for this database -> create new instance
+                cls._instances[key] = super(DatabaseConnector, cls).__new__(cls)
+            return cls._instances[key]  # stored instance
+
+    def __check_options(self, db_def: str, cache, read_only: bool):
+        """Check if the options of a further connector of the database match the ones of the open connector
+
+        :param db_def: path to database definition file
+        :param cache: cache of the snapshots or None
+        :param read_only: True if the tables must not be changed
+        :return: None
+        :raises ValueError: if the connector was opened with other options
+        """
+
+        if os.path.realpath(db_def) != self._db_def:
+            raise ValueError(f'Database {self._database} is already open with the definition file {self._db_def}')
+        if read_only != self._read_only:
+            raise ValueError(f'Database {self._database} is already open with read_only={self._read_only}')
+        if (cache is None) != (self._snapshot_cache is None) or \
+                (cache is not None and not self._snapshot_cache.is_compatible(cache)):
+            raise ValueError(f'Database {self._database} is already open with another snapshot cache')
+
+    @classmethod
+    def get_open_connectors(cls) -> dict:
+        """Get all connectors that are open in this process
+
+        :return: dictionary of the real paths of the databases and their connectors
+        """
+
+        with cls._instances_lock:
+            return dict(cls._instances)
+
+    @classmethod
+    def close_all(cls):
+        """Close the connectors of all databases
+
+        :return: None
         """
 
-        if not cls._instance:  # no instance exists yet -> create new instance
-            cls._instance = super(DatabaseConnector, cls).__new__(cls)
-        return cls._instance  # stored instance
+        for data_con in cls.get_open_connectors().values():
+            data_con.close()
 
-    def __add_datatable(self, name, definition):
+    def __add_datatable(self, name, definition, progress=None):
         """Create a new DataTable and link it in the dict
         Additionally save columns of table in another dict to access from outside
 
         :param name: table name
         :param definition: table definitions from XML file
+        :param progress: optional function (done, total, name) to report the read rows
         :return: None
         """
 
         # create a new DataTable instance with the given definition
-        self._data_tables[name] = _DataTable(self._sql_con, name, definition)
+        with self._pool.writer() as sql_con:
+            self._data_tables[name] = _DataTable(sql_con, name, definition, self._snapshot_cache, progress)
+        self._last_access[name] = time.monotonic()
+
+    def __upgrade_tables(self, def_tables):
+        """Upgrade the tables of a database that was created by a previous version of the application.
+        Columns that were added to the definition are added to the tables, main tables get the column of the
+        row versions, keys that were stored as text are converted into integers
+        and durations that were stored as time text are converted into seconds.
+
+        :param def_tables: table definitions from XML file of the existing tables
+        :return: None
+        """
 
-    def _delete_relation_tables(self, name, entry: pd.Series):
+        with self._pool.writer() as sql_con:
+            for name, definition in def_tables.items():
+                columns = [row[1] for row in sql_con.execute(f'pragma table_info({name})')]
+                _add_missing_columns(sql_con, name, {column: column_type for column, column_type in
+                                                     definition[1].items() if column not in columns})
+                if _DataTableDefinition(name, definition).has_table_keys() and VERSION_COLUMN not in columns:
+                    _add_version_column(sql_con, name)
+                for key in definition[4]:
+                    _convert_key_column(sql_con, name, key)
+                if definition[1].get(DURATION_COLUMN) == 'INTEGER' and DURATION_COLUMN in columns:
+                    _convert_duration_column(sql_con, name)
+
+    def __load_datatables(self, def_tables, progress=None):
+        """Create the DataTables of existing tables concurrently on a thread pool.
+        Every worker reads with a read-only connection of the pool, as sqlite3 releases the GIL while querying.
+        The progress of the workers is reported in the calling thread, so it can update the GUI.
+
+        :param def_tables: table definitions from XML file of the tables that exist in the database
+        :param progress: optional function (done, total, name) to report the read rows
+        :return: None
+        """
+
+        progress_queue = queue.Queue()  # progress of the workers, reported by the calling thread
+
+        def load_datatable(name, definition):
+            with self._pool.reader() as sql_con:
+                return _DataTable(sql_con, name, definition, self._snapshot_cache,
+                                  lambda done, total, table: progress_queue.put((done, total, table)))
+
+        def report_progress():
+            while not progress_queue.empty():
+                state = progress_queue.get_nowait()
+                if progress is not None:
+                    progress(*state)
+
+        with ThreadPoolExecutor(max_workers=max(min(POOL_READERS, len(def_tables)), 1)) as executor:
+            futures = {executor.submit(load_datatable, name, definition): name for name, definition in
+                       def_tables.items()}
+            pending = set(futures)
+            while len(pending) > 0:
+                done, pending = wait(pending, timeout=0.05)
+                report_progress()
+            report_progress()
+
+            for future, name in futures.items():
+                self._data_tables[name] = future.result()  # exceptions of the workers are raised here
+                self._last_access[name] = time.monotonic()
+
+    def _read_data_table(self, name, sql_con: sqlite3.Connection):
+        """Read the data of a table again, from its snapshot if it is still valid or else from the database.
+        A new snapshot is written if the table was read from the database.
+
+        :param name: table name
+        :param sql_con: sqlite connection to database
+        :return: None
+        """
+
+        data_table = self._data_tables[name]
+        if not data_table.read_table_snapshot(self._snapshot_cache):
+            data_table.read_table_sql(sql_con)
+            data_table.write_table_snapshot(self._snapshot_cache)
+
+    def _get_data_table(self, name) -> _DataTable:
+        """Get the DataTable for accessing its data.
+        If the data was evicted from memory, it is read again from the database and the memory budget is enforced.
+
+        :param name: table name
+        :return: DataTable with loaded data
+        """
+
+        data_table = self._data_tables[name]
+        self._last_access[name] = time.monotonic()
+        if not data_table.is_loaded():
+            with self._pool.reader() as sql_con:
+                self._read_data_table(name, sql_con)
+            self._enforce_memory_budget(keep=name)
+        return data_table
+
+    def set_memory_budget(self, budget):
+        """Set the memory budget for the data of all tables.
+        If the budget is exceeded, the least recently used tables without unsaved changes are evicted from memory.
+        They are read again from the database when they are needed.
+
+        :param budget: memory budget in bytes, 0 for no budget
+        :return: None
+        """
+
+        self._memory_budget = budget
+        self._enforce_memory_budget()
+
+    def _enforce_memory_budget(self, keep=None):
+        """Evict the least recently used tables without unsaved changes until the memory budget is met
+
+        :param keep: optional name of a table that must not be evicted, as it is currently used
+        :return: None
+        """
+
+        if self._memory_budget <= 0:
+            return  # no budget set
+
+        memory_usage = sum(data_table.get_memory_usage() for data_table in self._data_tables.values())
+        # tables with unsaved changes cannot be evicted, the oldest access is evicted first
+        candidates = sorted([name for name, data_table in self._data_tables.items() if
+                             data_table.is_loaded() and not data_table.is_modified() and name != keep],
+                            key=lambda name: self._last_access[name])
+
+        for name in candidates:
+            if memory_usage <= self._memory_budget:
+                break
+            memory_usage -= self._data_tables[name].get_memory_usage()
+            self._data_tables[name].evict()
+            self.__forget_history([name])
+
+    def get_memory_report(self) -> pd.DataFrame:
+        """Get a report of the memory usage of all tables and of the live copies handed out by get_table_content
+
+        :return: Dataframe with one row per table
+        """
+
+        report = []
+        for name, data_table in self._data_tables.items():
+            copies = [table_copy for (table, copy_id), table_copy in list(self._table_copies.items()) if table == name]
+            report.append({'NAME': name,
+                           'ROWS': len(data_table.get_table().index) if data_table.is_loaded() else 0,
+                           'MEMORY_KB': data_table.get_memory_usage() / 1024,
+                           'LOADED': data_table.is_loaded(),
+                           'MODIFIED': data_table.is_modified(),
+                           'COPIES': len(copies),
+                           'COPIES_KB': sum(int(table_copy.memory_usage(index=True, deep=True).sum())
+                                            for table_copy in copies) / 1024,
+                           'IDLE_S': time.monotonic() - self._last_access[name]})
+        return pd.DataFrame(report)
+
+    def reader(self):
+        """Use a read-only connection of the connection pool. It can be used in any thread.
+
+        :return: context manager of the connection
+        """
+
+        return self._pool.reader()
+
+    def writer(self):
+        """Use the writer connection of the connection pool. It can be used in any thread, but only by one at a time.
+
+        :return: context manager of the connection
+        """
+
+        return self._pool.writer()
+
+    def close(self):
+        """Close all connections to the database and remove the connector from the registry.
+        Unsaved changes are lost, the next connector for this database reads it again.
+
+        :return: None
+        """
+
+        with self._instances_lock:
+            key = os.path.realpath(self._database)
+            if self._instances.get(key) is self:
+                del self._instances[key]
+        self._pool.close()
+        if self._snapshot_cache is not None:
+            self._snapshot_cache.close()
+
+    def is_read_only(self) -> bool:
+        """Check if the tables of this connector must not be changed
+
+        :return: True if the connector is read-only
+        """
+
+        return self._read_only
+
+    def __check_writable(self):
+        """Raise ForbiddenActionError if the connector is read-only
+
+        :return: None
+        """
+
+        if self._read_only:
+            raise error.ForbiddenActionError(f'Database {self._database} is opened read-only!')
+
+    def refresh(self) -> bool:
+        """Read all tables again if the database was changed by another process since it was read.
+        If the snapshots of the changed database are not available yet (e.g. not yet published in shared memory),
+        the tables are kept until the next call. Without a loader process that publishes them, the database is read.
+
+        :return: True if the tables were read again
+        """
+
+        stamp = snapshot.get_database_stamp(self._database)
+        if stamp == self._loaded_stamp:
+            return False
+        if self._snapshot_cache is not None and not self._snapshot_cache.is_published(stamp) and \
+                self._snapshot_cache.has_publisher():
+            return False
+
+        self._loaded_stamp = stamp  # all tables are read in this state
+        with self._pool.reader() as sql_con:
+            for name, data_table in self._data_tables.items():
+                if data_table.is_loaded():
+                    # evicted tables are read when they are needed
+                    self._read_data_table(name, sql_con)
+                    self._notify_change(name, EVENT_RELOADED)
+        self.__forget_history(list(self._data_tables.keys()))
+        return True
+
+    def connect_change_listener(self, listener):
+        """Connect a function that is notified about every changed row of any table.
+        The listener is called with (table name, event, entry), where event is one of
+        EVENT_INSERTED, EVENT_UPDATED, EVENT_DELETED or EVENT_RELOADED.
+        The entry is the Series element that was changed, or None if the whole table was reloaded.
+
+        :param listener: function to be called for every change
+        :return: None
+        """
+
+        self._change_listeners.append(listener)
+
+    def disconnect_change_listener(self, listener):
+        """Disconnect a function that was connected via connect_change_listener
+
+        :param listener: function that shall not be notified anymore
+        :return: None
+        """
+
+        if listener in self._change_listeners:
+            self._change_listeners.remove(listener)
+
+    def _notify_change(self, name, event, entry=None):
+        """Notify all connected listeners about a change in a table.
+        Before, the reverse index of a changed relation table, the total durations and the calendar index are updated.
+        Afterwards, the listeners are notified about the changed totals with EVENT_TOTAL.
+
+        :param name: name of the changed table
+        :param event: type of the change
+        :param entry: Series element that was changed, None if the whole table was reloaded
+        :return: None
+        """
+
+        for (table, column, top_key), index in list(self._reverse_index.items()):
+            if table != name:
+                continue
+            if event == EVENT_RELOADED:
+                del self._reverse_index[(table, column, top_key)]  # built again when it is needed
+            elif event == EVENT_INSERTED:
+                index.setdefault(entry[column], set()).add(entry[top_key])
+            elif event == EVENT_DELETED:
+                index.get(entry[column], set()).discard(entry[top_key])
+
+        changed_totals = self.__update_duration_totals(name, event, entry)
+
+        if name == NAME_CALENDAR and self._calendar_index is not None:
+            if event == EVENT_RELOADED:
+                self._calendar_index = None  # built again when it is needed
+            elif event == EVENT_DELETED:
+                self._calendar_index.remove(entry['ID'])
+            else:
+                self._calendar_index.add(entry['ID'], *[entry[column] for column in CALENDAR_COLUMNS])
+
+        for listener in self._change_listeners:
+            listener(name, event, entry)
+
+        for top_table, top_id in dict.fromkeys(changed_totals):
+            total = pd.Series([top_id, self.get_duration_total(top_table, top_id)], index=['ID', TOTAL_COLUMN])
+            for listener in self._change_listeners:
+                listener(top_table, EVENT_TOTAL, total)
+
+    def has_duration_totals(self, table_name) -> bool:
+        """Check if total durations are maintained for a table, as it has relation tables to entries with durations
+
+        :param table_name: name of the table
+        :return: True if get_duration_total can be used for the table
+        """
+
+        return table_name in self._total_relations
+
+    def get_duration_total(self, table_name, entry_id) -> int:
+        """Get the sum of the durations of the entries below an entry, e.g. of the exercises of a unit.
+        The totals are calculated once per table and then kept up to date with every change,
+        so the hierarchy does not need to be walked.
+
+        :param table_name: name of the table, see has_duration_totals
+        :param entry_id: ID of the entry
+        :return: total duration in seconds
+        """
+
+        if table_name not in self._duration_totals:
+            totals = {}
+            for relation_table, top_key, column, sub_table in self._total_relations[table_name]:
+                durations = self.__get_durations(sub_table)
+                table_data = self._get_data_table(relation_table).get_table()
+                for top_id, sub_id in zip(table_data[top_key].to_list(), table_data[column].to_list()):
+                    totals[top_id] = totals.get(top_id, 0) + durations.get(sub_id, 0)
+            self._duration_totals[table_name] = totals
+        return self._duration_totals[table_name].get(entry_id, 0)
+
+    def __get_durations(self, table_name) -> dict:
+        """Get the durations of all entries of a table, which are kept to calculate the changes of the totals
+
+        :param table_name: name of the table with the duration column
+        :return: dictionary of the durations in seconds by ID
+        """
+
+        if table_name not in self._durations:
+            table_data = self._get_data_table(table_name).get_table()
+            self._durations[table_name] = {entry_id: _parse_duration(duration) for entry_id, duration in
+                                           zip(table_data.index.to_list(), table_data[DURATION_COLUMN].to_list())}
+        return self._durations[table_name]
+
+    def __update_duration_totals(self, name, event, entry) -> list:
+        """Update the total durations for a change in a table.
+        Totals that were not calculated yet are not touched, but the changed entries are still reported.
+
+        :param name: name of the changed table
+        :param event: type of the change
+        :param entry: Series element or record that was changed, None if the whole table was reloaded
+        :return: list of (table name, ID) of the entries whose total has changed
+        """
+
+        if event == EVENT_RELOADED:
+            for top_table, relations in self._total_relations.items():
+                if any(name in (top_table, relation_table, sub_table) for relation_table, _, _, sub_table in relations):
+                    self._duration_totals.pop(top_table, None)  # calculated again when it is needed
+            self._durations.pop(name, None)
+            return []
+
+        changed = []
+        durations = self._durations.get(name)
+        if durations is not None:
+            # the previous duration is needed for the difference, so the durations are updated afterwards
+            duration = _parse_duration(entry[DURATION_COLUMN])
+            difference = duration - durations.get(entry['ID'], 0) if event == EVENT_UPDATED else 0
+            if event == EVENT_DELETED:
+                durations.pop(entry['ID'], None)
+            else:
+                durations[entry['ID']] = duration
+        for top_table, relations in self._total_relations.items():
+            totals = self._duration_totals.get(top_table)
+            if name == top_table and event == EVENT_DELETED and totals is not None:
+                totals.pop(entry['ID'], None)
+            for relation_table, top_key, column, sub_table in relations:
+                if name == relation_table and event in (EVENT_INSERTED, EVENT_DELETED):
+                    if totals is not None:
+                        duration = self.__get_durations(sub_table).get(entry[column], 0)
+                        totals[entry[top_key]] = totals.get(entry[top_key], 0) + (
+                            duration if event == EVENT_INSERTED else -duration)
+                    changed.append((top_table, entry[top_key]))
+                elif name == sub_table and event == EVENT_UPDATED:
+                    # the totals of all entries that contain the changed entry differ by the same amount
+                    top_ids = self.__get_reverse_index(relation_table, column, top_key).get(entry['ID'], set())
+                    if totals is not None:
+                        for top_id in top_ids:
+                            totals[top_id] = totals.get(top_id, 0) + difference
+                    changed += [(top_table, top_id) for top_id in top_ids]
+        return changed
+
+    def get_calendar_entries(self, first, last=None, plan_ids=None, limit=None) -> pd.DataFrame:
+        """Get the sessions of the calendar in a period, including the sessions of recurring entries.
+        The dates are looked up in the calendar index and recurring entries are only expanded for the period,
+        so the costs depend on the number of found sessions, not on the size of the calendar.
+
+        :param first: first date of the period as date or ISO text
+        :param last: optional last date of the period, the period has no end if it is not given
+        :param plan_ids: optional list of plan IDs, the sessions of other plans are skipped
+        :param limit: optional maximum number of sessions, e.g. to get the next sessions of a plan
+        :return: Dataframe with the columns DATE, ID and PLAN_ID, sorted by date
+        """
+
+        occurrences = self.__get_calendar_index().iter_occurrences(
+            _to_calendar_day(first), schedule.NO_END if last is None else _to_calendar_day(last),
+            None if plan_ids is None else set(plan_ids))
+        table_data = pd.DataFrame(list(itertools.islice(occurrences, limit)), columns=['DATE', 'ID', 'PLAN_ID'])
+        table_data['DATE'] = schedule.to_texts(table_data['DATE'])
+        return table_data
+
+    def get_calendar_conflicts(self, first, last) -> dict[str, list]:
+        """Get the days of a period with more than one session in the calendar
+
+        :param first: first date of the period as date or ISO text
+        :param last: last date of the period as date or ISO text
+        :return: dictionary of the lists of calendar entry IDs by date as ISO text
+        """
+
+        conflicts = self.__get_calendar_index().find_conflicts(_to_calendar_day(first), _to_calendar_day(last))
+        return {schedule.to_text(day): entry_ids for day, entry_ids in conflicts.items()}
+
+    def get_entry_conflicts(self, entry) -> dict[int, str]:
+        """Get the calendar entries that have a session on the same day as the given calendar entry,
+        so a conflict can be reported before the entry is saved. A saved entry does not conflict with itself.
+
+        :param entry: Series element or record of the calendar entry, the ID is empty for a new entry
+        :return: dictionary of the first common date as ISO text by the IDs of the conflicting entries
+        """
+
+        entry_id = None if entry['ID'] == '' else entry['ID']
+        conflicts = self.__get_calendar_index().find_entry_conflicts(*[entry[column] for column in CALENDAR_COLUMNS],
+                                                                     entry_id=entry_id)
+        return {other_id: schedule.to_text(day) for other_id, day in conflicts.items()}
+
+    def __get_calendar_index(self) -> schedule.CalendarIndex:
+        """Get the index of the dates of the calendar. It is built on the first use and kept up to date by
+        _notify_change, so the calendar table is only read once.
+
+        :return: index of the calendar
+        """
+
+        if self._calendar_index is None:
+            table_data = self._get_data_table(NAME_CALENDAR).get_table()
+            self._calendar_index = schedule.CalendarIndex(zip(table_data.index.to_list(), *[
+                table_data[column].to_list() for column in CALENDAR_COLUMNS]))
+        return self._calendar_index
+
+    def _delete_relation_tables(self, name, entry):
         """Delete all entries that relate to the given entry and are safe to delete
 
         :param name: Name of table
-        :param entry: Series element to be deleted, contains key for relation lookup
+        :param entry: Series element or record to be deleted, contains key for relation lookup
         :return:
         """
 
         # iterate through all relation tables where the given ID is mentioned and delete it
         for table, key in self._data_tables[name].get_definition().get_table_relations().items():
             relation_table = self.lookup_table_by_relation([entry['ID']], name, table)
-            for index, row in relation_table.iterrows():
-                self._data_tables[table].delete_entry(row)
+            record_type = self._data_tables[table].get_definition().get_record_type()
+            for values in relation_table[list(record_type.get_columns())].itertuples(index=False, name=None):
+                row = record_type(values)
+                self._get_data_table(table).delete_entry(row)
+                self._history[-1].append(table)
+                self._notify_change(table, EVENT_DELETED, row)
 
     def get_table_content(self, name) -> pd.DataFrame:
         """Get Dataframe of a table
@@ -437,10 +1724,14 @@ class DatabaseConnector:
 
         if self._data_tables[name].get_definition().has_table_keys():
             # reset index only if it's a main table
-            return self._data_tables[name].get_table().copy().reset_index()
+            table_copy = self._get_data_table(name).get_table().copy().reset_index()
         else:
             # do not reset the index for relation tables
-            return self._data_tables[name].get_table().copy()
+            table_copy = self._get_data_table(name).get_table().copy()
+
+        # the copy is tracked for the memory report as long as it is alive
+        self._table_copies[(name, next(self._copy_ids))] = table_copy
+        return table_copy
 
     def get_table_relations(self, name) -> dict:
         """Get the relations to other tables
@@ -450,6 +1741,15 @@ class DatabaseConnector:
         """
         return self._data_tables[name].get_definition().get_table_relations()
 
+    def get_relations(self, name) -> tuple:
+        """Get the edges of the relation graph from a table to the tables on the far side of its relation tables
+
+        :param name: Name of the table
+        :return: tuple of relations with relation table, key, far table and far key
+        """
+
+        return self._data_tables[name].get_definition().get_relations()
+
     def get_column_relations(self, name) -> dict:
         """Get the column relations of a table
 
@@ -468,39 +1768,56 @@ class DatabaseConnector:
 
         return self._data_tables[name].get_definition().get_column_names()
 
-    def add_entry_to_table(self, name, entry: pd.Series) -> int:
+    def add_entry_to_table(self, name, entry) -> int:
         """Add single entry to specific table
 
         :param name: Name of table
-        :param entry: Series element to be added
+        :param entry: Series element or record to be added
         :return: ID of added entry
         """
 
-        return self._data_tables[name].add_entry(entry)
+        self.__check_writable()
+        self.__start_action()
+        entry_id = self._get_data_table(name).add_entry(entry)
+        if isinstance(entry, _Record) and self._data_tables[name].get_definition().has_table_keys():
+            entry = entry.replace('ID', entry_id)  # the listeners get the entry with its new ID
+        self._history[-1].append(name)
+        self._notify_change(name, EVENT_INSERTED, entry)
+        return entry_id
 
-    def delete_entry_from_table(self, name, entry: pd.Series) -> int:
+    def delete_entry_from_table(self, name, entry) -> int:
         """Delete single entry from specific table
 
         :param name: Name of table
-        :param entry: Series element to be deleted
+        :param entry: Series element or record to be deleted
         :return: None
         """
 
+        self.__check_writable()
+        self.__start_action()  # the entry and its relations are undone together
         # first delete possible entries in relation tables
         self._delete_relation_tables(name, entry)
 
         # then delete the entry in the table itself
-        return self._data_tables[name].delete_entry(entry)
+        entry_id = self._get_data_table(name).delete_entry(entry)
+        self._history[-1].append(name)
+        self._notify_change(name, EVENT_DELETED, entry)
+        return entry_id
 
-    def modify_entry_in_table(self, name, entry: pd.Series) -> int:
+    def modify_entry_in_table(self, name, entry) -> int:
         """Modify single entry in specific table
 
         :param name: Name of table
-        :param entry: Series element to be modified
+        :param entry: Series element or record to be modified
         :return: ID of modified entry
         """
 
-        return self._data_tables[name].modify_entry(entry)
+        self.__check_writable()
+        self.__start_action()
+        entry_id = self._get_data_table(name).modify_entry(entry)
+        self._history[-1].append(name)
+        self._notify_change(name, EVENT_UPDATED, entry)
+        return entry_id
 
     def lookup_entry_in_table(self, name, column, values) -> pd.DataFrame:
         """Search for entries in a table by a specific column.
@@ -511,7 +1828,7 @@ class DatabaseConnector:
         :return: Dataframe of corresponding entries
         """
 
-        return self._data_tables[name].lookup_table_by_column(column, values)
+        return self._get_data_table(name).lookup_table_by_column(column, values)
 
     def lookup_table_by_relation(self, values, source_table, search_table) -> pd.DataFrame:
         """Search for relation table corresponding to given ID values
@@ -522,49 +1839,200 @@ class DatabaseConnector:
         :return: Dataframe of the corresponding entries in the search table
         """
 
-        # retrieve the table relations of the given source table where the search table is mentioned
-        tables = [(key, value) for key, value in
-                  self._data_tables[source_table].get_definition().get_table_relations().items() if key == search_table]
-
-        if len(tables) == 1:  # search table is a relation table of the source table
-            for table, key_id in tables:
-                return self._data_tables[table].lookup_table_by_column(key_id, values)
-        elif len(tables) > 1:  # more than one entry has been found - this should not occur
-            raise error.DataMismatchError(f'Multiple table entries have been found!')
-        else:  # search table has no relation to the source table
+        # retrieve the key of the source table in the search table
+        key_id = self._data_tables[source_table].get_definition().get_table_relations().get(search_table)
+        if key_id is None:  # search table has no relation to the source table
             raise error.TableNotKnownError(f'Table {source_table} is not connected to table {search_table}')
+        return self._get_data_table(search_table).lookup_table_by_column(key_id, values)
 
-    def commit_changes(self, name=None):
+    def commit_changes(self, name=None, sql_con=None, progress=None) -> pd.DataFrame:
         """Commit changes made to Dataframes.
         If no name is given, the changes to all tables are committed.
+        If a progress function is given, it is called after each table with (done, total, table name).
+        Only the changed rows are written. Rows that were changed by another process since they were read are not
+        written but reported as conflicts, they keep their changes to be written again or reverted.
+        Added rows get new IDs if another process has added rows with the same IDs.
+        If another process has changed the database, the committed tables are read again,
+        so they contain the changes of both processes.
 
         :param name: name of table
-        :return: None
+        :param sql_con: optional sqlite connection to be used instead of the writer connection of the pool
+        :param progress: optional function to report the progress per table
+        :return: Dataframe of the conflicts with one row per entry that was not written
         """
 
-        if name is None:
-            # commit all changes
-            for key in self._data_tables.keys():
-                self._data_tables[key].modify_table_sql(self._sql_con)
-        else:
-            # only commit the changes to a specific table
-            self._data_tables[name].modify_table_sql(self._sql_con)
-
-    def rollback_changes(self, name=None):
+        self.__check_writable()
+        table_names = self.__get_table_names(name)
+        changed_externally = snapshot.get_database_stamp(self._database) != self._loaded_stamp
+        conflicts = []
+        changed_ids = set()  # tables whose IDs were replaced, as another process has added rows with the same IDs
+        # the tables that refer to other tables are written last, so they are written with the new IDs
+        table_names = sorted(table_names, key=lambda table: any(self.get_column_relations(table).values()))
+        with nullcontext(sql_con) if sql_con is not None else self._pool.writer() as sql_con:
+            for done, key in enumerate(table_names, start=1):
+                if self._data_tables[key].is_loaded():
+                    # evicted tables have no unsaved changes, so they do not need to be written
+                    id_map = {}
+                    conflicts += self._data_tables[key].modify_table_sql(sql_con, id_map)
+                    if len(id_map) > 0:
+                        changed_ids.update(self.__replace_ids(key, id_map))
+                if progress is not None:
+                    progress(done, len(table_names), key)
+
+            if changed_externally:
+                # the tables are read again with the rows of the other process, the conflicting rows keep their changes
+                for key in table_names:
+                    if self._data_tables[key].is_loaded():
+                        changed_rows = self._data_tables[key].get_changed_rows()
+                        self._read_data_table(key, sql_con)
+                        self._data_tables[key].restore_changed_rows(changed_rows)
+                        self._notify_change(key, EVENT_RELOADED)
+                        changed_ids.discard(key)
+        for key in changed_ids:
+            self._notify_change(key, EVENT_RELOADED)
+        self._loaded_stamp = snapshot.get_database_stamp(self._database)  # the changes of this connector are known
+        self.__forget_history(table_names)  # the written changes cannot be undone anymore
+
+        if not changed_externally:
+            # the database file was changed, so the snapshots are only valid if they are written after all tables.
+            # Otherwise, only the tables that were read again match the database and their snapshots are written.
+            for data_table in self._data_tables.values():
+                data_table.write_table_snapshot(self._snapshot_cache)
+
+        # the written tables have no unsaved changes anymore, so they can be evicted if the budget is exceeded
+        self._enforce_memory_budget()
+        return pd.DataFrame(conflicts, columns=['TABLE', 'ID', 'CHANGE', 'READ_VERSION', 'DATABASE_VERSION', 'ENTRY'])
+
+    def rollback_changes(self, name=None, progress=None):
         """Rollback changes made to Dataframes.
         If no name is given, the changes to all tables are reverted.
+        If a progress function is given, it is called after each table with (done, total, table name).
+        The changed rows are restored from the journal of the table and notified row by row,
+        so the database does not need to be read again.
 
         :param name: name of table
+        :param progress: optional function to report the progress per table
+        :return: None
+        """
+
+        table_names = self.__get_table_names(name)
+        for done, key in enumerate(table_names, start=1):
+            # evicted tables have no unsaved changes, so there is nothing to revert
+            for event, entry in self._data_tables[key].rollback():
+                self._notify_change(key, event, entry)
+            if progress is not None:
+                progress(done, len(table_names), key)
+        self.__forget_history(table_names)
+
+    def undo(self) -> bool:
+        """Undo the last action: an added, deleted or modified entry, including the deleted relations.
+        Only changes that were not committed yet can be undone.
+
+        :return: True if an action was undone
+        """
+
+        self.__check_writable()
+        self.__drop_empty_action()
+        if len(self._history) == 0:
+            return False
+
+        action = self._history.pop()
+        self._redo_history.append(action)
+        for name in reversed(action):
+            for event, entry in self._data_tables[name].undo():
+                self._notify_change(name, event, entry)
+        return True
+
+    def redo(self) -> bool:
+        """Redo the last undone action
+
+        :return: True if an action was redone
+        """
+
+        self.__check_writable()
+        if len(self._redo_history) == 0:
+            return False
+
+        action = self._redo_history.pop()
+        self._history.append(action)
+        for name in action:
+            for event, entry in self._data_tables[name].redo():
+                self._notify_change(name, event, entry)
+        return True
+
+    def can_undo(self) -> bool:
+        """Check if there is an action that can be undone
+
+        :return: True if undo is possible
+        """
+
+        return any(len(action) > 0 for action in self._history)
+
+    def can_redo(self) -> bool:
+        """Check if there is an undone action that can be redone
+
+        :return: True if redo is possible
+        """
+
+        return len(self._redo_history) > 0
+
+    def __start_action(self):
+        """Start a new action in the history. The undone actions cannot be redone anymore.
+
+        :return: None
+        """
+
+        self.__drop_empty_action()
+        if len(self._redo_history) > 0:
+            for data_table in self._data_tables.values():
+                data_table.discard_redo()
+            self._redo_history = []
+        self._history.append([])
+
+    def __drop_empty_action(self):
+        """Remove the last action from the history if it did not change anything, e.g. because it failed
+
         :return: None
         """
 
+        if len(self._history) > 0 and len(self._history[-1]) == 0:
+            self._history.pop()
+
+    def __replace_ids(self, name, id_map) -> list:
+        """Replace the IDs of added rows that got new IDs when they were written, in the table itself and in all
+        tables that refer to it
+
+        :param name: name of the table with the changed IDs
+        :param id_map: dictionary of the new IDs by the old IDs
+        :return: names of the changed tables
+        """
+
+        return [key for key, data_table in self._data_tables.items()
+                if data_table.is_loaded() and data_table.replace_ids(name, id_map)]
+
+    def __forget_history(self, table_names):
+        """Remove the given tables from all actions, as their journals were cleared by reading or writing them
+
+        :param table_names: list of table names
+        :return: None
+        """
+
+        self._history = [[name for name in action if name not in table_names] for action in self._history]
+        self._history = [action for action in self._history if len(action) > 0]
+        self._redo_history = [[name for name in action if name not in table_names] for action in self._redo_history]
+        self._redo_history = [action for action in self._redo_history if len(action) > 0]
+
+    def __get_table_names(self, name=None) -> list:
+        """Get the names of the tables to be processed: all tables if no name is given, else only the given one.
+
+        :param name: optional name of table
+        :return: list of table names
+        """
+
         if name is None:
-            # rollback all changes to what is saved on the database
-            for key in self._data_tables.keys():
-                self._data_tables[key].read_table_sql(self._sql_con)
+            return list(self._data_tables.keys())
         else:
-            # only rollback the changes to a specific table
-            self._data_tables[name].read_table_sql(self._sql_con)
+            return [name]
 
     def build_entry_for_table(self, table_name, table_data) -> pd.Series:
         """Build the entry for the datatable from the stored definition as a Series object
@@ -580,6 +2048,42 @@ class DatabaseConnector:
             # given table data does not match the amount of columns of the table
             raise error.DataMismatchError(f'Length of given data does not match number of columns for this table!')
 
+    def build_record_for_table(self, table_name, table_data):
+        """Build a record for the datatable from the stored definition.
+        Records are cheaper to build and to check than Series objects and are accepted by all mutation methods.
+
+        :param table_name: name of table
+        :param table_data: list of values in the order of the columns of the table
+        :return: record that matches the columns of the table
+        """
+
+        record_type = self._data_tables[table_name].get_definition().get_record_type()
+        if len(record_type.get_columns()) == len(table_data):
+            return record_type(table_data)
+        else:
+            # given table data does not match the amount of columns of the table
+            raise error.DataMismatchError(f'Length of given data does not match number of columns for this table!')
+
+    def build_record_for_relation_table(self, table_name, table_data: dict):
+        """Build a record for the relation table from the stored definition.
+        The table data is a dictionary as the column order is unknown when calling.
+
+        :param table_name: name of table
+        :param table_data: data of table as dict
+        :return: record that matches the columns of the table
+        """
+
+        record_type = self._data_tables[table_name].get_definition().get_record_type()
+        if len(record_type.get_columns()) == len(table_data):
+            try:
+                return record_type(table_data[column] for column in record_type.get_columns())
+            except KeyError as missing:
+                # column is missing in the dictionary
+                raise error.DataMismatchError(f'Column {missing} missing in table data!')
+        else:
+            # given table data does not match the amount of columns of the table
+            raise error.DataMismatchError(f'Length of given data does not match number of columns for this table!')
+
     def build_entry_for_relation_table(self, table_name, table_data: dict) -> pd.Series:
         """Build the relation table entry for the datatable from the stored definition as a Series object.
         The table data is a dictionary as the column order is unknown when calling.
@@ -647,91 +2151,317 @@ class DatabaseConnector:
         :return: column name of the top table key if existent, empty string if not
         """
 
-        top_table = self._data_tables[table_name].get_definition().get_top_table()
-        if top_table == '':  # given table has no top table
+        return self._data_tables[table_name].get_definition().get_top_table_key()
+
+    def get_used_in(self, table_name, entry_id) -> dict[str, list]:
+        """Retrieve all entries that use the given entry, directly or indirectly via the relation tables,
+        e.g. the units and plans that contain an exercise. This is the opposite direction of get_data_top_down.
+        The relations are looked up in a reverse index, so the costs depend on the number of found entries.
+
+        :param table_name: name of the table of the entry
+        :param entry_id: ID of the entry
+        :return: dictionary of the IDs of the using entries by table name
+        """
+
+        used_in = {}
+        visited = {(table_name, entry_id)}
+        pending = [(table_name, entry_id)]
+        while len(pending) > 0:
+            child_table, child_id = pending.pop()
+            for relation_table, column, top_table, top_key in self._parent_relations.get(child_table, []):
+                for parent_id in self.__get_reverse_index(relation_table, column, top_key).get(child_id, ()):
+                    if (top_table, parent_id) not in visited:
+                        visited.add((top_table, parent_id))
+                        used_in.setdefault(top_table, []).append(parent_id)
+                        pending.append((top_table, parent_id))
+
+        return {table: sorted(ids) for table, ids in used_in.items()}
 
-            return ''
-        else:  # given table has a top table
-            column_relations = self._data_tables[table_name].get_definition().get_column_relations()
-            # check for the right key name in the column relations
-            for column, relation_table in column_relations.items():
-                if top_table == relation_table:
-                    return column
-        return ''
+    def __get_reverse_index(self, relation_table, column, top_key) -> dict:
+        """Get the reverse index of a relation table, which maps the IDs of a column to the IDs of the top table.
+        The index is built on the first use and kept up to date by _notify_change.
 
-    def get_data_top_down(self, main_table_name: str, main_table_id: list, table_blacklist=None) -> dict:
+        :param relation_table: name of the relation table
+        :param column: column of the used entries
+        :param top_key: column of the using entries of the top table
+        :return: dictionary of the sets of top table IDs by the IDs of the column
+        """
+
+        key = (relation_table, column, top_key)
+        if key not in self._reverse_index:
+            index = {}
+            table_data = self._get_data_table(relation_table).get_table()
+            for child_id, parent_id in zip(table_data[column].to_list(), table_data[top_key].to_list()):
+                index.setdefault(child_id, set()).add(parent_id)
+            self._reverse_index[key] = index
+        return self._reverse_index[key]
+
+    def get_data_top_down(self, main_table_name: str, main_table_id: list) -> dict:
         """Retrieve all the data of a table from top down according to the relations.
         All table data will be stored in a dictionary that is returned.
+        The relations below the main table are compiled once into a plan, see _compile_top_down.
+        The plan is processed level by level, so every relation table is searched once for all IDs of a level
+        instead of once per ID.
 
         :param main_table_name: name of the main table to start the data selection
         :param main_table_id: list of IDs of the main table that shall be selected
-        :param table_blacklist: blacklist of table names that should not be processed (needed for recursion)
         :return: dictionary of table names and corresponding table data according to the selected main IDs
         """
 
-        # create blacklist if not given - the blacklisted tables should not be processed anymore
-        if table_blacklist is None:
-            table_blacklist = []
+        if main_table_name not in self._top_down_plans:
+            self._top_down_plans[main_table_name] = self._compile_top_down(main_table_name, [])
 
-        return_table = {}  # create empty dict to return at the end
+        return self.__get_data_by_plan(self._top_down_plans[main_table_name], main_table_id)
 
-        # retrieve main table data and insert into dict
-        main_table_data = self.lookup_entry_in_table(main_table_name, 'ID', main_table_id)
+    def _compile_top_down(self, main_table_name, table_blacklist) -> tuple:
+        """Compile the relations below a table into a plan for get_data_top_down.
+        Only relation tables with the table as top table are followed and every relation table is followed once,
+        so the plan is a tree that does not depend on the data.
+
+        :param main_table_name: name of the table to start with
+        :param table_blacklist: names of the tables that were already processed, is extended by this function
+        :return: tuple of the table name and the edges to the tables below, edges are None for subordinate tables.
+                 Each edge is a tuple of (relation table, key of the table, column of the table below, plan below).
+        """
 
         table_blacklist.append(main_table_name)  # main table should not be processed another time
+        if self.is_sub_table(main_table_name):
+            return main_table_name, None  # don't process children if it is a subordinate table
+
+        edges = []
+        for rel_table_name, rel_key_name in self.get_table_relations(main_table_name).items():
+            if rel_table_name in table_blacklist:
+                continue  # stop processing this table as it has already been processed
+            if not self.is_top_table(rel_table_name, main_table_name):
+                continue  # stop processing this relation table if the current main table is not the top table of it
+
+            table_blacklist.append(rel_table_name)  # relation table should not be processed in the next object
+            for column, sub_table in self.get_column_relations(rel_table_name).items():
+                if column != rel_key_name:  # the main key should not be processed
+                    edges.append((rel_table_name, rel_key_name, column,
+                                  self._compile_top_down(sub_table, table_blacklist)))
+        return main_table_name, tuple(edges)
+
+    def __get_data_by_plan(self, plan, main_table_id) -> dict:
+        """Retrieve the data of a plan from _compile_top_down for the given IDs.
+        Each edge of the plan is read as flat rows of (ID, child ID) for all IDs at once,
+        the rows are then assembled into the nested dictionary of get_data_top_down.
+
+        :param plan: plan of the table
+        :param main_table_id: list of IDs of the table
+        :return: dictionary of the IDs and the corresponding table data as in get_data_top_down
+        """
 
-        children = {}  # create empty dict for the children
-
-        if not self.is_sub_table(main_table_name):  # don't process children if it is a subordinate table
-            # setup children dict
-            for main_id in main_table_id:
-                children[main_id] = []
-
-            # retrieve main table relations and process children
-            main_table_relations = self.get_table_relations(main_table_name)
-            for rel_table_name, rel_key_name in main_table_relations.items():
-                if rel_table_name in table_blacklist:
-                    continue  # stop processing this table as it has already been processed
-                if not self.is_top_table(rel_table_name, main_table_name):
-                    continue  # stop processing this relation table if the current main table is not the top table of it
-
-                # lookup the relation table entries for the given main IDs
-                relation_table = self.lookup_table_by_relation(main_table_id, main_table_name, rel_table_name)
-
-                table_blacklist.append(rel_table_name)  # relation table should not be processed in the next object
-
-                # retrieve column relations and recursively retrieve the data below
-                column_relations = self.get_column_relations(rel_table_name)
-                for column, sub_table in column_relations.items():
-                    if column == rel_key_name:
-                        continue  # the main key should not be processed
-                    else:
-                        # recursively retrieve the tables below the current table
-                        sub_data = self.get_data_top_down(sub_table, relation_table[column].to_list(), table_blacklist)
-                        for main_id in main_table_id:
-                            selected_relation_data = relation_table.loc[
-                                relation_table[self.get_top_table_key(rel_table_name)] == main_id]
-
-                            # insert the children into the dict corresponding to the main id
-                            for key, row in selected_relation_data.iterrows():
-                                child = {row[column]: sub_data[row[column]]}
-                                if len(children[main_id]) == 0:
-                                    children[main_id] = [child]
-                                else:
-                                    children[main_id].append(child)
-
-        # build the final dict entry to return that contains the children if there are any
-        for main_id in main_table_id:
-            # iloc[0] is necessary here as a Series object needs to be retrieved, not Dataframe
-            selected_main_data = main_table_data.loc[main_table_data['ID'] == main_id].iloc[0]
-            if len(children.keys()) > 0:
-                # children exist
-                return_table[main_id] = [main_table_name, selected_main_data, children[main_id]]
-            else:
-                # no children
-                return_table[main_id] = [main_table_name, selected_main_data, None]
+        main_table_name, edges = plan
+        main_table_data = self.lookup_entry_in_table(main_table_name, 'ID', main_table_id)
+        positions = {}  # row of the table data per ID
+        for position, main_id in enumerate(main_table_data['ID'].to_list()):
+            positions.setdefault(main_id, position)
+
+        children = {main_id: [] for main_id in main_table_id}
+        for rel_table_name, rel_key_name, column, sub_plan in edges or ():
+            relation_table = self._get_data_table(rel_table_name).lookup_table_by_column(rel_key_name, main_table_id)
+            parent_ids = relation_table[rel_key_name].to_list()
+            child_ids = relation_table[column].to_list()
+            # retrieve the tables below for all children at once
+            sub_data = self.__get_data_by_plan(sub_plan, list(dict.fromkeys(child_ids)))
+            for parent_id, child_id in zip(parent_ids, child_ids):
+                children[parent_id].append({child_id: sub_data[child_id]})
+
+        # build the final dict entries that contain the children if there are any
+        return {main_id: [main_table_name, main_table_data.iloc[positions[main_id]],
+                          None if edges is None else children[main_id]] for main_id in main_table_id}
+
+
+def _get_parent_relations(def_tables) -> dict[str, list]:
+    """Get the relations from the used tables to their top tables out of the database definition
+
+    :param def_tables: table definitions from XML file
+    :return: dictionary of lists of (relation table, column, top table, top table key) by the name of the used table
+    """
+
+    parent_relations = {}
+    for name, definition in def_tables.items():
+        table_definition = _DataTableDefinition(name, definition)
+        top_table = table_definition.get_top_table()
+        top_key = table_definition.get_top_table_key()
+        if not table_definition.is_relation_table() or top_key == '':
+            continue
+        for column, table in table_definition.get_column_relations().items():
+            if column != top_key and table != '':
+                parent_relations.setdefault(table, []).append((name, column, top_table, top_key))
+    return parent_relations
+
+
+def _get_total_relations(def_tables, parent_relations) -> dict[str, list]:
+    """Get the relation tables that lead from a table to entries with durations, which are summed up to totals
+
+    :param def_tables: table definitions from XML file
+    :param parent_relations: relations of the used tables as returned by _get_parent_relations
+    :return: dictionary of lists of (relation table, top table key, column, used table) by the name of the top table
+    """
+
+    total_relations = {}
+    for table, relations in parent_relations.items():
+        if DURATION_COLUMN in def_tables[table][0]:
+            for relation_table, column, top_table, top_key in relations:
+                total_relations.setdefault(top_table, []).append((relation_table, top_key, column, table))
+    return total_relations
+
+
+def _to_calendar_day(value) -> int:
+    """Convert a date of a calendar query into the day of the calendar index
 
-        return return_table
+    :param value: date or ISO text (YYYY-MM-DD)
+    :return: ordinal of the day
+    """
+
+    try:
+        return schedule.to_day(value)
+    except (TypeError, ValueError):
+        raise error.DataMismatchError(f'{value} is not a valid date!')
+
+
+def _parse_duration(value) -> int:
+    """Convert a duration into seconds. Besides numbers, durations stored as time text (HH:MM:SS) are accepted.
+    Other texts, e.g. typed by hand into an old database, cannot be converted and are a duration of zero.
+
+    :param value: duration as number or text, missing values are a duration of zero
+    :return: duration in seconds
+    """
+
+    if value is None or (np.isscalar(value) and pd.isna(value)) or value == '':
+        return 0
+    try:
+        if isinstance(value, str) and ':' in value:
+            hours, minutes, seconds = ([int(part) for part in value.split(':')] + [0, 0])[:3]
+            return hours * 3600 + minutes * 60 + seconds
+        return int(value)
+    except (TypeError, ValueError):
+        _logger.warning('Duration %r is not a number or time text (HH:MM:SS) and is set to 0', value)
+        return 0
+
+
+def _convert_duration_column(sql_con: sqlite3.Connection, name):
+    """Convert the durations of a table in the database from time text (HH:MM:SS) into seconds.
+    A column that was created as TEXT would store the seconds as text again, so the table is rebuilt with an
+    INTEGER column first. Only values that are not converted yet are written, so nothing changes at the next start.
+
+    :param sql_con: sqlite connection to database
+    :param name: name of the table
+    :return: None
+    """
+
+    column_types = {row[1]: row[2] for row in sql_con.execute(f'pragma table_info({name})')}
+    # the statements are fetched completely, as an open statement would lock the table
+    unconverted = sql_con.execute(f"select count(*) from {name} "
+                                  f"where typeof({DURATION_COLUMN}) != 'integer'").fetchall()[0][0]
+    if column_types[DURATION_COLUMN].upper() == 'INTEGER' and unconverted == 0:
+        return  # the table was converted before
+    if not sql_con.in_transaction:
+        sql_con.execute('begin immediate')
+    try:
+        if column_types[DURATION_COLUMN].upper() != 'INTEGER':
+            _set_integer_column(sql_con, name, DURATION_COLUMN)
+
+        # durations in seconds are stored as integer now, all others are time text or missing
+        rows = sql_con.execute(f"select rowid, {DURATION_COLUMN} from {name} "
+                               f"where typeof({DURATION_COLUMN}) != 'integer'").fetchall()
+        sql_con.executemany(f'update {name} set {DURATION_COLUMN} = ? where rowid = ?',
+                            [(_parse_duration(duration), rowid) for rowid, duration in rows])
+        sql_con.commit()
+    except Exception:
+        sql_con.rollback()
+        raise
+
+
+def _convert_key_column(sql_con: sqlite3.Connection, name, key):
+    """Convert the key column of a table in the database into an INTEGER column.
+    A key column that was created as TEXT returns the IDs as text, so they would not match the IDs of new rows.
+
+    :param sql_con: sqlite connection to database
+    :param name: name of the table
+    :param key: name of the key column
+    :return: None
+    """
+
+    column_types = {row[1]: row[2] for row in sql_con.execute(f'pragma table_info({name})')}
+    if column_types.get(key, 'INTEGER').upper() == 'INTEGER':
+        return  # the table was created or converted with an integer key
+    if not sql_con.in_transaction:
+        sql_con.execute('begin immediate')
+    try:
+        _set_integer_column(sql_con, name, key)  # the IDs are converted by the affinity of the new column
+        sql_con.commit()
+    except Exception:
+        sql_con.rollback()
+        raise
+
+
+def _set_integer_column(sql_con: sqlite3.Connection, name, column):
+    """Rebuild a table in the database with the type INTEGER for a column, as SQLite cannot change column types.
+    The values are copied into the new table, so text of integers is stored as integer by the column affinity.
+    Must be called within a transaction.
+
+    :param sql_con: sqlite connection to database
+    :param name: name of the table
+    :param column: name of the column
+    :return: None
+    """
+
+    table_sql = sql_con.execute("select sql from sqlite_master where type = 'table' and name = ?",
+                                (name,)).fetchall()[0][0]
+    index_sqls = [row[0] for row in sql_con.execute(
+        "select sql from sqlite_master where type = 'index' and tbl_name = ? and sql is not null", (name,))]
+    # the old table is renamed, so the table can be created again with its original statement
+    sql_con.execute(f'alter table {name} rename to {name}_CONVERT')
+    sql_con.execute(re.sub(rf'("{column}"|\b{column}\b)\s+\w+', r'\1 INTEGER', table_sql, count=1))
+    sql_con.execute(f'insert into {name} select * from {name}_CONVERT')
+    sql_con.execute(f'drop table {name}_CONVERT')  # drops the indexes of the old table as well
+    for index_sql in index_sqls:
+        sql_con.execute(index_sql)
+
+
+def _add_missing_columns(sql_con: sqlite3.Connection, name, column_types):
+    """Add columns that are defined but missing to a table in the database. The existing rows get NULL values.
+
+    :param sql_con: sqlite connection to database
+    :param name: name of the table
+    :param column_types: column types from the definition by the names of the missing columns
+    :return: None
+    """
+
+    if len(column_types) == 0:
+        return
+    for column, column_type in column_types.items():
+        sql_con.execute(f'alter table {name} add column {column} {column_type}')
+    sql_con.commit()
+
+
+def _add_version_column(sql_con: sqlite3.Connection, name):
+    """Add the column of the row versions to a main table in the database. The existing rows get version 0.
+
+    :param sql_con: sqlite connection to database
+    :param name: name of the table
+    :return: None
+    """
+
+    sql_con.execute(f'alter table {name} add column {VERSION_COLUMN} INTEGER NOT NULL DEFAULT 0')
+    sql_con.commit()
+
+
+def _to_sql_value(value):
+    """Convert a value of a Dataframe into a value that can be written with sqlite3
+
+    :param value: value of a Dataframe cell
+    :return: python value, None for missing values
+    """
+
+    if value is None or (np.isscalar(value) and pd.isna(value)):
+        return None
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
 
 
 def _read_db_definition(db_def):
@@ -791,4 +2521,29 @@ def _read_db_definition(db_def):
         # save the data in the dictionary to the corresponding table name
         def_tables[name] = (column_names, column_types, column_relations, table_relations, table_keys, table_type, top)
 
-    return def_tables
+    # complete the definitions with the relation graph, so the relations do not need to be searched later
+    return {name: definition + _get_relation_graph(name, definition, def_tables)
+            for name, definition in def_tables.items()}
+
+
+def _get_relation_graph(name, definition, def_tables) -> tuple:
+    """Get the relations of a table and the key of its top table out of the definitions of all tables.
+    The tables on the far side are found via the column relations, not via the names of the relation tables.
+
+    :param name: name of the table
+    :param definition: definition of the table as read by _read_db_definition
+    :param def_tables: definitions of all tables
+    :return: tuple of the relations of the table and the column of the top table key
+    """
+
+    column_relations, table_relations, top = definition[2], definition[3], definition[6]
+    relations = []
+    for relation_table, key in table_relations.items():
+        if relation_table not in def_tables:
+            raise error.DataMismatchError(f'Relation table {relation_table} of table {name} is not defined!')
+        for far_key, far_table in def_tables[relation_table][2].items():
+            if far_key != key and far_table != '':
+                relations.append(_Relation(relation_table, key, far_table, far_key))
+
+    top_keys = [column for column, table in column_relations.items() if table == top and top != '']
+    return tuple(relations), top_keys[0] if len(top_keys) > 0 else ''
@@ -0,0 +1,277 @@
+"""Benchmarks for the data layer (DatabaseConnector) on generated databases of increasing size.
+
+Usage (from the app folder):
+    python data_benchmark.py --sizes 1000 10000 100000 1000000 --output bench_v1.json
+    python data_benchmark.py --output bench_v2.json --compare bench_v1.json
+"""
+
+import data
+import argparse
+import itertools
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from contextlib import closing
+from datetime import date, datetime, timedelta
+
+DB_DEF = 'data/db_def.xml'
+SIZES = [1000, 10000]
+REPEAT = 5
+REGRESSION_FACTOR = 1.2  # a benchmark is a regression if it is slower than this factor
+
+
+def generate_database(database, db_def, rows, seed=0):
+    """Generate a database that conforms to the given definition with the given number of rows per table.
+    Tables with an ID get the IDs 0..rows-1, relation columns reference random IDs of the related table.
+    Duplicate combinations in relation tables are removed, so these tables may contain fewer rows.
+
+    :param database: path to the database file to be created (an existing file is replaced)
+    :param db_def: path to the database definition file
+    :param rows: number of rows per table
+    :param seed: seed for the random generator, so the same database is generated every time
+    :return: None
+    """
+
+    if os.path.exists(database):
+        os.remove(database)
+
+    rng = np.random.default_rng(seed)
+    def_tables = data._read_db_definition(db_def)
+    with closing(sqlite3.connect(database)) as sql_con:
+        for name, definition in def_tables.items():
+            column_names, column_types, column_relations, table_relations, table_keys, table_type, top = definition[:7]
+
+            columns = {}
+            for column in column_names:
+                if column in table_keys:
+                    columns[column] = np.arange(rows)
+                elif column_relations.get(column, '') != '':
+                    # column references the ID of another table
+                    columns[column] = rng.integers(0, rows, size=rows)
+                elif column == 'DURATION':
+                    # durations in seconds, whole minutes like they are entered
+                    columns[column] = rng.integers(0, 60, size=rows) * 60
+                elif column == 'REPEAT_DAYS':
+                    # most calendar entries are single sessions, the others repeat weekly or every two weeks
+                    columns[column] = rng.choice([0, 0, 0, 7, 14], size=rows)
+                elif column in ('DATE', 'END_DATE'):
+                    columns[column] = [(date(2020, 1, 1) + timedelta(days=int(day))).isoformat()
+                                       for day in rng.integers(0, 3650, size=rows)]
+                else:
+                    columns[column] = [f'{column} {index}' for index in range(rows)]
+
+            table_data = pd.DataFrame(columns)
+            if len(table_keys) > 0:
+                # same layout as written by the DatabaseConnector: the ID is the index
+                table_data.set_index(keys=table_keys, inplace=True)
+                table_data.to_sql(name, con=sql_con, index=True, index_label=table_keys, dtype=column_types)
+            else:
+                # relation tables must not contain the same combination twice
+                table_data.drop_duplicates(inplace=True, ignore_index=True)
+                table_data.to_sql(name, con=sql_con, index=False, dtype=column_types)
+        sql_con.commit()
+
+
+def measure(action, repeat=REPEAT) -> dict:
+    """Call the given action several times and measure the duration of every call
+
+    :param action: function without parameters to be measured
+    :param repeat: number of calls
+    :return: dictionary of the statistics in seconds
+    """
+
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        action()
+        durations.append(time.perf_counter() - start)
+
+    return {'min': min(durations), 'median': statistics.median(durations), 'mean': statistics.mean(durations),
+            'repeat': repeat}
+
+
+def run_benchmarks(database, db_def, repeat=REPEAT) -> dict:
+    """Run all benchmarks of the DatabaseConnector on the given database
+
+    :param database: path to the database file
+    :param db_def: path to the database definition file
+    :param repeat: number of calls per benchmark
+    :return: dictionary of benchmark names and their statistics
+    """
+
+    results = {}
+
+    start = time.perf_counter()
+    data_con = data.DatabaseConnector(database, db_def)
+    duration = time.perf_counter() - start
+    results['load'] = {'min': duration, 'median': duration, 'mean': duration, 'repeat': 1}
+
+    def load_cached():
+        # the first load has written the snapshots of all tables, so they are read from the cache now
+        data.DatabaseConnector(database, db_def).close()
+        data.DatabaseConnector(database, db_def)
+
+    results['load_cached'] = measure(load_cached, repeat)
+    data_con = data.DatabaseConnector(database, db_def)
+
+    exercise_ids = data_con.get_table_content(data.NAME_EXERCISE)['ID'].to_list()
+    plan_ids = data_con.get_table_content(data.NAME_PLAN)['ID'].to_list()
+    exercise_columns = data_con.get_table_columns(data.NAME_EXERCISE)
+
+    def add_entry():
+        entry = data_con.build_record_for_table(data.NAME_EXERCISE, ['', 'Benchmark', 'Benchmark', 0, ''])
+        data_con.add_entry_to_table(data.NAME_EXERCISE, entry)
+
+    category_ids = itertools.count()
+
+    def add_relation_entry():
+        # the exercise -1 does not exist, so every combination is new
+        entry = data_con.build_record_for_relation_table(data.NAME_EXERCISE_CATEGORY,
+                                                        {'EXERCISE_ID': -1, 'CATEGORY_ID': next(category_ids)})
+        data_con.add_entry_to_table(data.NAME_EXERCISE_CATEGORY, entry)
+
+    def delete_entry():
+        entry = data_con.build_record_for_table(data.NAME_EXERCISE, [exercise_ids.pop()] + [''] * (
+                len(exercise_columns) - 1))
+        data_con.delete_entry_from_table(data.NAME_EXERCISE, entry)
+
+    results['add_entry'] = measure(add_entry, repeat)
+    results['add_entry_relation'] = measure(add_relation_entry, repeat)
+    results['delete_entry_from_table'] = measure(delete_entry, repeat)
+    results['lookup_table_by_relation'] = measure(
+        lambda: data_con.lookup_table_by_relation(exercise_ids[:10], data.NAME_EXERCISE, data.NAME_EXERCISE_CATEGORY),
+        repeat)
+    results['get_data_top_down'] = measure(lambda: data_con.get_data_top_down(data.NAME_PLAN, plan_ids[:10]),
+                                            repeat)
+    # the calendar index is built by the first call, all further calls only search it
+    results['get_calendar_entries'] = measure(
+        lambda: data_con.get_calendar_entries(date(2025, 1, 1), date(2025, 1, 31)), repeat)
+    calendar_entry = data_con.build_record_for_table(data.NAME_CALENDAR, ['', 0, '2025-01-06', 7, ''])
+    results['get_entry_conflicts'] = measure(lambda: data_con.get_entry_conflicts(calendar_entry), repeat)
+    results['commit_changes'] = measure(data_con.commit_changes, repeat)
+    results['rollback_changes'] = measure(data_con.rollback_changes, repeat)
+    data_con.close()  # the database is removed after the benchmarks
+
+    return results
+
+
+def compare_results(results, baseline, factor=REGRESSION_FACTOR) -> list:
+    """Compare benchmark results with the results of a previous version
+
+    :param results: current benchmark results as written by main
+    :param baseline: previous benchmark results as written by main
+    :param factor: factor of the median duration above which a benchmark counts as a regression
+    :return: list of (size, benchmark name, ratio) of all regressions
+    """
+
+    regressions = []
+    for size, benchmarks in results['results'].items():
+        for name, stats in benchmarks.items():
+            try:
+                previous = baseline['results'][size][name]
+            except KeyError:
+                continue  # benchmark did not exist in the previous version
+
+            key = 'median' if 'median' in stats and 'median' in previous else 'min'
+            ratio = stats[key] / previous[key] if previous[key] > 0 else 1.0
+            print(f'{size:>8} {name:<28} {previous[key]:10.6f}s -> {stats[key]:10.6f}s ({ratio:5.2f}x)')
+            if ratio > factor:
+                regressions.append((size, name, ratio))
+
+    return regressions
+
+
+def get_version() -> str:
+    """Get the current version of the repository to be stored with the results
+
+    :return: git commit hash or 'unknown'
+    """
+
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def create_parser(description, output, sizes=SIZES, repeat=REPEAT) -> argparse.ArgumentParser:
+    """Create the parser of the command line arguments that all benchmarks have in common
+
+    :param description: description of the benchmarks
+    :param output: default file for the JSON results
+    :param sizes: default numbers of rows per table
+    :param repeat: default number of calls per benchmark
+    :return: argument parser, further arguments can be added
+    """
+
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--sizes', type=int, nargs='+', default=sizes, help='number of rows per table')
+    parser.add_argument('--repeat', type=int, default=repeat, help='number of calls per benchmark')
+    parser.add_argument('--output', default=output, help='file for the JSON results')
+    parser.add_argument('--compare', default=None, help='JSON results of a previous version')
+    return parser
+
+
+def create_results(**environment) -> dict:
+    """Create the results of a benchmark run with the description of the environment
+
+    :param environment: additional information about the environment, e.g. versions of libraries
+    :return: dictionary of the results, the results per size are added to 'results'
+    """
+
+    return {'version': get_version(), 'timestamp': datetime.now().isoformat(),
+            'python': platform.python_version(), **environment, 'results': {}}
+
+
+def write_results(results, output, compare=None) -> int:
+    """Write the results as JSON and compare them with the results of a previous version
+
+    :param results: benchmark results as created by create_results
+    :param output: file for the JSON results
+    :param compare: optional file of the JSON results of a previous version
+    :return: exit code, 1 if a regression was found compared to the baseline
+    """
+
+    with open(output, 'w', encoding='UTF-8') as file:
+        json.dump(results, file, indent=2)
+
+    if compare is not None:
+        with open(compare, encoding='UTF-8') as file:
+            regressions = compare_results(results, json.load(file))
+        for size, name, ratio in regressions:
+            print(f'REGRESSION: {name} with {size} rows is {ratio:.2f}x slower')
+        return 1 if len(regressions) > 0 else 0
+
+    return 0
+
+
+def main():
+    """Generate the databases, run the benchmarks and write the results as JSON
+
+    :return: exit code, 1 if a regression was found compared to the baseline
+    """
+
+    args = create_parser('Benchmarks for the DatabaseConnector', 'data_benchmark.json').parse_args()
+    results = create_results(pandas=pd.__version__)
+
+    with tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as directory:
+        for size in args.sizes:
+            database = os.path.join(directory, f'benchmark_{size}.db')
+            start = time.perf_counter()
+            generate_database(database, DB_DEF, size)
+            print(f'generated database with {size} rows per table in {time.perf_counter() - start:.2f}s')
+
+            results['results'][str(size)] = run_benchmarks(database, DB_DEF, args.repeat)
+
+    return write_results(results, args.output, args.compare)
+
+
+if __name__ == '__main__':
+    exit(main())
@@ -1,17 +1,95 @@
+import atexit
 import data
 import error
+import multiprocessing
+import os
 import pandas as pd
+import shutil
+import snapshot
+import sqlite3
+import tempfile
+import threading
 import unittest
-from datetime import datetime
+import xml.etree.ElementTree as ElTr
+from contextlib import closing
+from datetime import date, datetime
 
 DATABASE = 'data/test.db'
 DB_DEF = 'data/db_def.xml'
+# databases that are shipped in the schema of the first version
+SHIPPED_DATABASES = ['data/main.db', 'data/main_prefilled.db', 'data/test.db']
+
+
+def _commit_in_other_process(database):
+    """Add an exercise with a category and rename the first exercise with a connector of another process
+
+    :param database: path to database file
+    :return: None
+    """
+
+    other_con = data.DatabaseConnector(database, DB_DEF)
+    exercise = other_con.build_record_for_table(data.NAME_EXERCISE, ['', 'Andere Übung', '', 60, ''])
+    added_id = other_con.add_entry_to_table(data.NAME_EXERCISE, exercise)
+    other_con.add_entry_to_table(data.NAME_EXERCISE_CATEGORY, other_con.build_record_for_relation_table(
+        data.NAME_EXERCISE_CATEGORY, {'EXERCISE_ID': added_id, 'CATEGORY_ID': 0}))
+    first = other_con.get_table_content(data.NAME_EXERCISE).iloc[0]
+    other_con.modify_entry_in_table(data.NAME_EXERCISE, first.replace({first['NAME']: 'Anderer Name'}))
+    other_con.commit_changes()
+    other_con.close()
+
+
+def _get_data_top_down_recursive(data_con, main_table_name, main_table_id, table_blacklist):
+    """Retrieve the data of a table from top down with one recursion per table and ID,
+    as reference for the compiled plans of get_data_top_down
+
+    :param data_con: DatabaseConnector object
+    :param main_table_name: name of the main table to start the data selection
+    :param main_table_id: list of IDs of the main table that shall be selected
+    :param table_blacklist: blacklist of table names that should not be processed
+    :return: dictionary of the IDs and the corresponding table data as in get_data_top_down
+    """
+
+    main_table_data = data_con.lookup_entry_in_table(main_table_name, 'ID', main_table_id)
+    table_blacklist.append(main_table_name)  # main table should not be processed another time
+    children = None
+    if not data_con.is_sub_table(main_table_name):  # don't process children if it is a subordinate table
+        children = {main_id: [] for main_id in main_table_id}
+        for rel_table_name, rel_key_name in data_con.get_table_relations(main_table_name).items():
+            if rel_table_name in table_blacklist or not data_con.is_top_table(rel_table_name, main_table_name):
+                continue
+            relation_table = data_con.lookup_table_by_relation(main_table_id, main_table_name, rel_table_name)
+            table_blacklist.append(rel_table_name)  # relation table should not be processed in the next object
+            for column, sub_table in data_con.get_column_relations(rel_table_name).items():
+                if column == rel_key_name:
+                    continue  # the main key should not be processed
+                # the IDs are only passed once, otherwise the children of a repeated ID would be added repeatedly
+                sub_data = _get_data_top_down_recursive(data_con, sub_table,
+                                                        list(dict.fromkeys(relation_table[column].to_list())),
+                                                        table_blacklist)
+                for main_id in main_table_id:
+                    for child_id in relation_table.loc[relation_table[rel_key_name] == main_id, column]:
+                        children[main_id].append({child_id: sub_data[child_id]})
+
+    return {main_id: [main_table_name, main_table_data.loc[main_table_data['ID'] == main_id].iloc[0],
+                      None if children is None else children[main_id]] for main_id in main_table_id}
+
+
+def _to_plain_top_down(top_down_data):
+    """Convert the result of get_data_top_down into dictionaries and lists, so two results can be compared
+
+    :param top_down_data: dictionary of the IDs and the corresponding table data
+    :return: same structure with the rows as dictionaries
+    """
+
+    return {main_id: [name, row.to_dict(), None if children is None else
+                      [_to_plain_top_down(child) for child in children]]
+            for main_id, (name, row, children) in top_down_data.items()}
 
 
 class DataUnitTest(unittest.TestCase):
     def test_add_entry_to_main_table(self):
         entry = pd.Series(index=data_con.get_table_columns(data.NAME_EXERCISE),
-                          data=['', 'Test Übung', 'Dies ist ein Test', '00:00:00', 'http://www.google.de'])
+                          data=['', 'Test Übung', 'Dies ist ein Test', 0, 'http://www.google.de'])
         data_before = data_con.get_table_content(data.NAME_EXERCISE)
         added_id = data_con.add_entry_to_table(data.NAME_EXERCISE, entry)
         data_after = data_con.get_table_content(data.NAME_EXERCISE)
@@ -28,9 +106,46 @@ class DataUnitTest(unittest.TestCase):
 
         data_con.rollback_changes()
 
+    def test_record_entries(self):
+        events = []
+
+        def listener(table_name, event, entry):
+            entry_id = entry['ID'] if table_name == data.NAME_EXERCISE else entry['CATEGORY_ID']
+            events.append((table_name, event, entry_id))
+
+        data_con.connect_change_listener(listener)
+        record = data_con.build_record_for_table(data.NAME_EXERCISE,
+                                                 ['', 'Test Record', 'Dies ist ein Test', 0, ''])
+        added_id = data_con.add_entry_to_table(data.NAME_EXERCISE, record)
+        relation_record = data_con.build_record_for_relation_table(data.NAME_EXERCISE_CATEGORY,
+                                                                   {'CATEGORY_ID': 0, 'EXERCISE_ID': added_id})
+        data_con.add_entry_to_table(data.NAME_EXERCISE_CATEGORY, relation_record)
+        data_con.modify_entry_in_table(data.NAME_EXERCISE, record.replace('ID', added_id).replace('NAME', 'Geändert'))
+        data_con.disconnect_change_listener(listener)
+
+        # assert that the records were written like Series elements and the listeners got the new ID
+        self.assertEqual(data_con.lookup_entry_in_table(data.NAME_EXERCISE, 'ID', [added_id])['NAME'].to_list(),
+                         ['Geändert'])
+        self.assertEqual(events, [(data.NAME_EXERCISE, data.EVENT_INSERTED, added_id),
+                                  (data.NAME_EXERCISE_CATEGORY, data.EVENT_INSERTED, 0),
+                                  (data.NAME_EXERCISE, data.EVENT_UPDATED, added_id)])
+        # assert that existing relations and records of other tables are rejected
+        with self.assertRaises(error.KeyAlreadyExistError):
+            data_con.add_entry_to_table(data.NAME_EXERCISE_CATEGORY, relation_record)
+        with self.assertRaises(error.DataMismatchError):
+            data_con.add_entry_to_table(data.NAME_EXERCISE_CATEGORY, record)
+        with self.assertRaises(error.DataMismatchError):
+            data_con.build_record_for_relation_table(data.NAME_EXERCISE_CATEGORY, {'EXERCISE_ID': 0, 'ID': 0})
+        # assert that the relation is deleted together with the exercise
+        data_con.delete_entry_from_table(data.NAME_EXERCISE, record.replace('ID', added_id))
+        self.assertEqual(data_con.get_table_content(data.NAME_EXERCISE_CATEGORY)['EXERCISE_ID'].isin(
+            [added_id]).any(), False)
+
+        data_con.rollback_changes()
+
     def test_delete_entry_from_main_table(self):
         entry = pd.Series(index=data_con.get_table_columns(data.NAME_EXERCISE),
-                          data=[0, 'Test', 'Test', '00:00:00', 'http://www.google.de'])
+                          data=[0, 'Test', 'Test', 0, 'http://www.google.de'])
         data_before = data_con.get_table_content(data.NAME_EXERCISE)
         deleted_id = data_con.delete_entry_from_table(data.NAME_EXERCISE, entry)
         data_after = data_con.get_table_content(data.NAME_EXERCISE)
@@ -47,7 +162,7 @@ class DataUnitTest(unittest.TestCase):
 
         # check if NoDataFoundError is raised if a not existing entry is tried to be deleted
         entry_not_found = pd.Series(index=data_con.get_table_columns(data.NAME_EXERCISE),
-                                    data=[-1, 'ERROR', 'ERROR', '00:00:00', 'http...'])
+                                    data=[-1, 'ERROR', 'ERROR', 0, 'http...'])
         with self.assertRaises(error.NoDataFoundError):
             data_con.delete_entry_from_table(data.NAME_EXERCISE, entry_not_found)
 
@@ -55,7 +170,7 @@ class DataUnitTest(unittest.TestCase):
 
     def test_modify_entry_in_main_table(self):
         entry = pd.Series(index=data_con.get_table_columns(data.NAME_EXERCISE),
-                          data=[0, f'Test Modify {datetime.now()}', 'Test Modify', '00:00:00', 'http://www.google.de'])
+                          data=[0, f'Test Modify {datetime.now()}', 'Test Modify', 0, 'http://www.google.de'])
         data_before = data_con.get_table_content(data.NAME_EXERCISE)
         modified_id = data_con.modify_entry_in_table(data.NAME_EXERCISE, entry)
         data_after = data_con.get_table_content(data.NAME_EXERCISE)
@@ -74,7 +189,7 @@ class DataUnitTest(unittest.TestCase):
 
         # check if NoDataFoundError is raised if a not existing entry is tried to be modified
         entry_not_found = pd.Series(index=data_con.get_table_columns(data.NAME_EXERCISE),
-                                    data=[-1, 'ERROR', 'ERROR', '00:00:00', 'http...'])
+                                    data=[-1, 'ERROR', 'ERROR', 0, 'http...'])
         with (self.assertRaises(error.NoDataFoundError)):
             data_con.modify_entry_in_table(data.NAME_EXERCISE, entry_not_found)
 
@@ -158,7 +273,7 @@ class DataUnitTest(unittest.TestCase):
 
     def test_rollback_changes(self):
         entry = pd.Series(index=data_con.get_table_columns(data.NAME_EXERCISE),
-                          data=['', 'Test Rollback', 'Dies ist ein Test Rollback', '00:00:00', 'http://www.google.de'])
+                          data=['', 'Test Rollback', 'Dies ist ein Test Rollback', 0, 'http://www.google.de'])
         data_before = data_con.get_table_content(data.NAME_EXERCISE)
         added_id = data_con.add_entry_to_table(data.NAME_EXERCISE, entry)
         data_after_add = data_con.get_table_content(data.NAME_EXERCISE)
@@ -175,6 +290,420 @@ class DataUnitTest(unittest.TestCase):
         # assert that the IDs of data_before and data_after_rollback match
         self.assertEqual(len(index_differences), 0)
 
+    def test_rollback_changes_in_background_thread(self):
+        entry = pd.Series(index=data_con.get_table_columns(data.NAME_EXERCISE),
+                          data=['', 'Test Rollback', 'Dies ist ein Test Rollback', 0, 'http://www.google.de'])
+        added_id = data_con.add_entry_to_table(data.NAME_EXERCISE, entry)
+        progress_tables = []
+
+        def rollback_task():
+            # the connections of the pool can be used in any thread
+            data_con.rollback_changes(progress=lambda done, total, name: progress_tables.append(name))
+
+        thread = threading.Thread(target=rollback_task)
+        thread.start()
+        thread.join()
+
+        data_after_rollback = data_con.get_table_content(data.NAME_EXERCISE)
+
+        # assert that after the rollback, the added ID is no longer in the table
+        self.assertEqual(data_after_rollback['ID'].isin([added_id]).any(), False)
+        # assert that the progress was reported once for every table
+        self.assertEqual(progress_tables, list(data._read_db_definition(DB_DEF).keys()))
+
+    def test_change_listener(self):
+        events = []
+
+        def listener(table_name, event, entry):
+            events.append((table_name, event))
+
+        data_con.connect_change_listener(listener)
+        entry = pd.Series(index=data_con.get_table_columns(data.NAME_EXERCISE),
+                          data=['', 'Test Listener', 'Dies ist ein Test', 0, 'http://www.google.de'])
+        added_id = data_con.add_entry_to_table(data.NAME_EXERCISE, entry)
+        relation_entry = data_con.build_entry_for_relation_table(data.NAME_EXERCISE_CATEGORY,
+                                                                 {'EXERCISE_ID': added_id, 'CATEGORY_ID': 0})
+        data_con.add_entry_to_table(data.NAME_EXERCISE_CATEGORY, relation_entry)
+        data_con.modify_entry_in_table(data.NAME_EXERCISE, entry)
+        data_con.delete_entry_from_table(data.NAME_EXERCISE, entry)
+        data_con.rollback_changes(data.NAME_EXERCISE)
+        data_con.disconnect_change_listener(listener)
+        data_con.rollback_changes()
+
+        # assert that every change was notified in the right order, including the deleted relation
+        self.assertEqual(events, [(data.NAME_EXERCISE, data.EVENT_INSERTED),
+                                  (data.NAME_EXERCISE_CATEGORY, data.EVENT_INSERTED),
+                                  (data.NAME_EXERCISE, data.EVENT_UPDATED),
+                                  (data.NAME_EXERCISE_CATEGORY, data.EVENT_DELETED),
+                                  (data.NAME_EXERCISE, data.EVENT_DELETED),
+                                  (data.NAME_EXERCISE, data.EVENT_INSERTED),
+                                  (data.NAME_EXERCISE, data.EVENT_UPDATED),
+                                  (data.NAME_EXERCISE, data.EVENT_DELETED)])
+
+    def test_undo_redo(self):
+        entry = pd.Series(index=data_con.get_table_columns(data.NAME_EXERCISE),
+                          data=['', 'Test Undo', 'Dies ist ein Test', 0, 'http://www.google.de'])
+        exercise_before = data_con.get_table_content(data.NAME_EXERCISE)
+        relation_before = data_con.get_table_content(data.NAME_EXERCISE_CATEGORY)
+        added_id = data_con.add_entry_to_table(data.NAME_EXERCISE, entry)
+        relation_entry = data_con.build_entry_for_relation_table(data.NAME_EXERCISE_CATEGORY,
+                                                                 {'EXERCISE_ID': added_id, 'CATEGORY_ID': 0})
+        data_con.add_entry_to_table(data.NAME_EXERCISE_CATEGORY, relation_entry)
+        modified_entry = entry.copy()
+        modified_entry['NAME'] = 'Test Undo geändert'
+        data_con.modify_entry_in_table(data.NAME_EXERCISE, modified_entry)
+        data_con.delete_entry_from_table(data.NAME_EXERCISE, modified_entry)
+
+        # assert that the delete is undone together with the deleted relation
+        self.assertEqual(data_con.undo(), True)
+        self.assertEqual(data_con.lookup_entry_in_table(data.NAME_EXERCISE, 'ID', [added_id])['NAME'].to_list(),
+                         ['Test Undo geändert'])
+        self.assertEqual(data_con.get_table_content(data.NAME_EXERCISE_CATEGORY)['EXERCISE_ID'].isin(
+            [added_id]).any(), True)
+        # assert that the modification is undone and can be redone
+        self.assertEqual(data_con.undo(), True)
+        self.assertEqual(data_con.lookup_entry_in_table(data.NAME_EXERCISE, 'ID', [added_id])['NAME'].to_list(),
+                         ['Test Undo'])
+        self.assertEqual(data_con.redo(), True)
+        self.assertEqual(data_con.lookup_entry_in_table(data.NAME_EXERCISE, 'ID', [added_id])['NAME'].to_list(),
+                         ['Test Undo geändert'])
+        # assert that all actions can be undone, so the tables match their state before
+        while data_con.undo():
+            pass
+        pd.testing.assert_frame_equal(data_con.get_table_content(data.NAME_EXERCISE), exercise_before)
+        pd.testing.assert_frame_equal(data_con.get_table_content(data.NAME_EXERCISE_CATEGORY), relation_before)
+        self.assertEqual(data_con.get_memory_report().set_index('NAME')['MODIFIED'].any(), False)
+        # assert that a new change discards the undone actions
+        data_con.add_entry_to_table(data.NAME_EXERCISE, entry)
+        self.assertEqual(data_con.can_redo(), False)
+
+        data_con.rollback_changes()
+
+    def test_get_used_in(self):
+        # assert that the existing exercise is only used by its category relation, which is no using entry
+        self.assertEqual(data_con.get_used_in(data.NAME_EXERCISE, 0), {})
+        self.assertEqual(data_con.get_used_in(data.NAME_CATEGORY, 0), {data.NAME_EXERCISE: [0]})
+
+        unit = pd.Series(index=data_con.get_table_columns(data.NAME_UNIT),
+                         data=['', 'Test Verwendung', 'Dies ist ein Test', 0])
+        unit_id = data_con.add_entry_to_table(data.NAME_UNIT, unit)
+        plan = pd.Series(index=data_con.get_table_columns(data.NAME_PLAN),
+                         data=['', 'Test Verwendung', 'Dies ist ein Test'])
+        plan_id = data_con.add_entry_to_table(data.NAME_PLAN, plan)
+        data_con.add_entry_to_table(data.NAME_EXERCISE_UNIT, data_con.build_entry_for_relation_table(
+            data.NAME_EXERCISE_UNIT, {'EXERCISE_ID': 0, 'UNIT_ID': unit_id}))
+        unit_plan = data_con.build_entry_for_relation_table(data.NAME_UNIT_PLAN,
+                                                            {'UNIT_ID': unit_id, 'PLAN_ID': plan_id})
+        data_con.add_entry_to_table(data.NAME_UNIT_PLAN, unit_plan)
+
+        # assert that the added relations are found, also indirectly via the unit
+        self.assertEqual(data_con.get_used_in(data.NAME_EXERCISE, 0),
+                         {data.NAME_UNIT: [unit_id], data.NAME_PLAN: [plan_id]})
+        self.assertEqual(data_con.get_used_in(data.NAME_CATEGORY, 0),
+                         {data.NAME_EXERCISE: [0], data.NAME_UNIT: [unit_id], data.NAME_PLAN: [plan_id]})
+        # assert that a deleted relation and a rollback update the result
+        data_con.delete_entry_from_table(data.NAME_UNIT_PLAN, unit_plan)
+        self.assertEqual(data_con.get_used_in(data.NAME_EXERCISE, 0), {data.NAME_UNIT: [unit_id]})
+        data_con.rollback_changes()
+        self.assertEqual(data_con.get_used_in(data.NAME_EXERCISE, 0), {})
+
+    def test_commit_conflicts(self):
+        with tempfile.TemporaryDirectory() as directory:
+            database = os.path.join(directory, 'concurrent.db')
+            shutil.copyfile(DATABASE, database)
+            editor_con = data.DatabaseConnector(database, DB_DEF)
+            exercises = editor_con.get_table_content(data.NAME_EXERCISE)
+            first_id = exercises['ID'].iloc[0]
+
+            # another process changes the first exercise and adds a new one
+            with closing(sqlite3.connect(database)) as sql_con:
+                sql_con.execute(f'update {data.NAME_EXERCISE} set NAME = ?, {data.VERSION_COLUMN} = '
+                                f'{data.VERSION_COLUMN} + 1 where ID = ?', ['Anderer Editor', int(first_id)])
+                sql_con.execute(f'insert into {data.NAME_EXERCISE} (ID, NAME, {data.VERSION_COLUMN}) values (?, ?, 1)',
+                                [100, 'Neu von anderem Editor'])
+                sql_con.commit()
+
+            entry = editor_con.build_entry_for_table(data.NAME_EXERCISE, exercises.iloc[0].to_list())
+            entry['NAME'] = 'Konflikt'
+            editor_con.modify_entry_in_table(data.NAME_EXERCISE, entry)
+            entry = editor_con.build_entry_for_table(data.NAME_EXERCISE, ['', 'Kein Konflikt', '', 0, ''])
+            added_id = editor_con.add_entry_to_table(data.NAME_EXERCISE, entry)
+            conflicts = editor_con.commit_changes()
+            names = editor_con.get_table_content(data.NAME_EXERCISE).set_index('ID')['NAME']
+
+            # assert that only the exercise changed by both processes is reported as conflict
+            self.assertEqual(conflicts['ID'].to_list(), [first_id])
+            self.assertEqual(conflicts['CHANGE'].to_list(), [data.EVENT_UPDATED])
+            # assert that the changes of both processes are read again and the conflicting change is kept unsaved
+            self.assertEqual(names.to_dict(), {first_id: 'Konflikt', added_id: 'Kein Konflikt',
+                                               100: 'Neu von anderem Editor'})
+            report = editor_con.get_memory_report().set_index('NAME')
+            self.assertEqual(report.loc[data.NAME_EXERCISE, 'MODIFIED'], True)
+            with closing(sqlite3.connect(database)) as sql_con:
+                self.assertEqual(sql_con.execute(f'select {data.VERSION_COLUMN} from {data.NAME_EXERCISE} where ID = ?',
+                                                 [int(added_id)]).fetchone()[0], 1)
+
+            # assert that the kept change can be reverted to the row of the other process
+            editor_con.rollback_changes()
+            names = editor_con.get_table_content(data.NAME_EXERCISE).set_index('ID')['NAME']
+            self.assertEqual(names[first_id], 'Anderer Editor')
+
+            editor_con.close()
+
+    def test_commit_with_other_connector(self):
+        with tempfile.TemporaryDirectory() as directory:
+            database = os.path.join(directory, 'concurrent.db')
+            shutil.copyfile(DATABASE, database)
+            editor_con = data.DatabaseConnector(database, DB_DEF)
+            exercise = editor_con.build_record_for_table(data.NAME_EXERCISE, ['', 'Eigene Übung', '', 30, ''])
+            added_id = editor_con.add_entry_to_table(data.NAME_EXERCISE, exercise)
+            editor_con.add_entry_to_table(data.NAME_EXERCISE_CATEGORY, editor_con.build_record_for_relation_table(
+                data.NAME_EXERCISE_CATEGORY, {'EXERCISE_ID': added_id, 'CATEGORY_ID': 0}))
+            first = editor_con.get_table_content(data.NAME_EXERCISE).iloc[0]
+            editor_con.modify_entry_in_table(data.NAME_EXERCISE, first.replace({first['NAME']: 'Eigener Name'}))
+
+            # the connector of the other process adds an exercise with the same ID and renames the same exercise
+            process = multiprocessing.get_context('spawn').Process(target=_commit_in_other_process, args=(database,))
+            process.start()
+            process.join()
+            self.assertEqual(process.exitcode, 0)
+            conflicts = editor_con.commit_changes()
+
+            # assert that the added exercise got a new ID together with its category and only the rename conflicts
+            self.assertEqual(conflicts[['TABLE', 'ID', 'CHANGE']].values.tolist(),
+                             [[data.NAME_EXERCISE, first['ID'], data.EVENT_UPDATED]])
+            with closing(sqlite3.connect(database)) as sql_con:
+                rows = sql_con.execute(f'select e.ID, e.NAME from {data.NAME_EXERCISE} e join '
+                                       f'{data.NAME_EXERCISE_CATEGORY} c on c.EXERCISE_ID = e.ID '
+                                       f'order by e.ID').fetchall()
+            self.assertEqual(rows[-2:], [(added_id, 'Andere Übung'), (added_id + 1, 'Eigene Übung')])
+            names = editor_con.get_table_content(data.NAME_EXERCISE).set_index('ID')['NAME']
+            self.assertEqual(names[added_id + 1], 'Eigene Übung')
+            self.assertEqual(editor_con.get_table_content(data.NAME_EXERCISE_CATEGORY)['EXERCISE_ID'].to_list()[-2:],
+                             [added_id, added_id + 1])
+            # assert that the conflicting rename is kept unsaved and overwrites the other one when it is saved again
+            self.assertEqual(names[first['ID']], 'Eigener Name')
+            self.assertEqual(len(editor_con.commit_changes().index), 0)
+            with closing(sqlite3.connect(database)) as sql_con:
+                self.assertEqual(sql_con.execute(f'select NAME from {data.NAME_EXERCISE} where ID = ?',
+                                                 [int(first['ID'])]).fetchone()[0], 'Eigener Name')
+
+            editor_con.close()
+
+    def test_get_data_top_down(self):
+        ids = {}
+        for table, values in [(data.NAME_PLAN, [['', 'Plan A', ''], ['', 'Plan B', '']]),
+                              (data.NAME_UNIT, [['', 'Einheit A', '', 0], ['', 'Einheit B', '', 0]]),
+                              (data.NAME_EXERCISE, [['', 'Übung A', '', 60, ''], ['', 'Übung B', '', 30, '']]),
+                              (data.NAME_CATEGORY, [['', 'Kategorie', '', '']]),
+                              (data.NAME_RESOURCE, [['', 'Ressource', '']])]:
+            ids[table] = [data_con.add_entry_to_table(table, data_con.build_record_for_table(table, entry))
+                          for entry in values]
+        plans, units, exercises = ids[data.NAME_PLAN], ids[data.NAME_UNIT], ids[data.NAME_EXERCISE]
+        for table, relations in [(data.NAME_UNIT_PLAN, [(units[0], plans[0]), (units[1], plans[0]),
+                                                        (units[0], plans[1])]),
+                                 (data.NAME_EXERCISE_UNIT, [(0, units[0]), (exercises[0], units[0]),
+                                                            (exercises[1], units[1]), (exercises[0], units[1])]),
+                                 (data.NAME_UNIT_CATEGORY, [(units[0], 0)]),
+                                 (data.NAME_EXERCISE_CATEGORY, [(exercises[0], ids[data.NAME_CATEGORY][0])]),
+                                 (data.NAME_EXERCISE_RESOURCE, [(exercises[1], ids[data.NAME_RESOURCE][0])])]:
+            for values in relations:
+                data_con.add_entry_to_table(table, data_con.build_entry_for_table(table, list(values)))
+
+        # assert that the compiled plans give the same data as the recursion, also for the tables below the top
+        # tables, whose relation tables to the tables above are skipped, and for the subordinate tables
+        for table in [data.NAME_PLAN, data.NAME_UNIT, data.NAME_EXERCISE, data.NAME_CATEGORY]:
+            table_ids = data_con.get_table_content(table)['ID'].to_list()
+            self.assertEqual(_to_plain_top_down(data_con.get_data_top_down(table, table_ids)),
+                             _to_plain_top_down(_get_data_top_down_recursive(data_con, table, table_ids, [])))
+        # assert that the relation tables are only followed once, e.g. not back from the exercises to the units
+        plan = _to_plain_top_down(data_con.get_data_top_down(data.NAME_PLAN, [plans[0]]))[plans[0]]
+        unit = plan[2][0][units[0]]
+        self.assertEqual([list(child.keys())[0] for child in unit[2]], [0, exercises[0], 0])
+        self.assertEqual(list(unit[2][1][exercises[0]][2][0].values())[0][0], data.NAME_CATEGORY)
+
+        data_con.rollback_changes()
+
+        with tempfile.TemporaryDirectory() as directory:
+            # exercises that consist of other exercises, so the relation table leads back to its own top table
+            tree = ElTr.parse(DB_DEF)
+            ElTr.SubElement(tree.getroot().find(f"TABLE[@NAME='{data.NAME_EXERCISE}']"), 'RELATION',
+                            KEY='EXERCISE_ID').text = 'EXERCISE_PART'
+            part_table = ElTr.SubElement(tree.getroot(), 'TABLE', NAME='EXERCISE_PART', TYPE='RELATION',
+                                         TOP=data.NAME_EXERCISE)
+            for column in ['EXERCISE_ID', 'PART_ID']:
+                ElTr.SubElement(part_table, 'COLUMN', TYPE='INTEGER', RELATION=data.NAME_EXERCISE).text = column
+            db_def = os.path.join(directory, 'db_def.xml')
+            tree.write(db_def, encoding='UTF-8')
+            database = os.path.join(directory, 'parts.db')
+            shutil.copyfile(DATABASE, database)
+            parts_con = data.DatabaseConnector(database, db_def)
+            part_id = parts_con.add_entry_to_table(data.NAME_EXERCISE, parts_con.build_record_for_table(
+                data.NAME_EXERCISE, ['', 'Teilübung', '', 10, '']))
+            parts_con.add_entry_to_table('EXERCISE_PART',
+                                         parts_con.build_entry_for_table('EXERCISE_PART', [0, part_id]))
+
+            # assert that the relation table is not followed again from the parts, as it was already processed
+            top_down_data = _to_plain_top_down(parts_con.get_data_top_down(data.NAME_EXERCISE, [0]))
+            self.assertEqual(top_down_data, _to_plain_top_down(
+                _get_data_top_down_recursive(parts_con, data.NAME_EXERCISE, [0], [])))
+            self.assertEqual(top_down_data[0][2][-1][part_id][2], [])
+
+            parts_con.close()
+
+    def test_memory_budget(self):
+        entry = pd.Series(index=data_con.get_table_columns(data.NAME_EXERCISE),
+                          data=['', 'Test Budget', 'Dies ist ein Test', 0, 'http://www.google.de'])
+        added_id = data_con.add_entry_to_table(data.NAME_EXERCISE, entry)
+        data_con.set_memory_budget(1)
+        report = data_con.get_memory_report().set_index('NAME')
+        data_con.set_memory_budget(0)
+
+        # assert that only the modified table is still loaded
+        self.assertEqual(report.loc[data.NAME_EXERCISE, 'LOADED'], True)
+        self.assertEqual(report['LOADED'].sum(), 1)
+        # assert that evicted tables are read again from the database when they are needed
+        self.assertEqual(len(data_con.get_table_content(data.NAME_CATEGORY).index) > 0, True)
+        self.assertEqual(data_con.get_table_content(data.NAME_EXERCISE)['ID'].isin([added_id]).any(), True)
+
+        data_con.rollback_changes()
+
+    def test_read_table_sql(self):
+        definition = data._read_db_definition(DB_DEF)[data.NAME_EXERCISE]
+        with tempfile.TemporaryDirectory() as directory, \
+                closing(sqlite3.connect(os.path.join(directory, 'chunks.db'))) as sql_con:
+            sql_con.execute('create table EXERCISE (ID INTEGER, NAME TEXT, DESCRIPTION TEXT, DURATION INTEGER, '
+                            'VIDEO_URL TEXT, ROW_VERSION INTEGER NOT NULL DEFAULT 0)')
+            rows = [(0, 'A', None, 60, ''), (1, 'B', 'Text', 90, None), (2, None, '', 30, 'url'),
+                    (3, 'D', 'Ä', 45, ''), (4, 'E', 'x', 75, '')]
+            sql_con.executemany('insert into EXERCISE (ID, NAME, DESCRIPTION, DURATION, VIDEO_URL) '
+                                'values (?, ?, ?, ?, ?)', rows)
+            sql_con.commit()
+            table = data._DataTable(sql_con, data.NAME_EXERCISE, definition)
+            progress = []
+            table.read_table_sql(sql_con, lambda done, total, name: progress.append((done, total, name)), 2)
+
+            # assert that the chunks were read completely and the progress was reported per chunk
+            self.assertEqual(progress, [(2, 5, data.NAME_EXERCISE), (4, 5, data.NAME_EXERCISE),
+                                        (5, 5, data.NAME_EXERCISE)])
+            expected = pd.read_sql('select ID, NAME, DESCRIPTION, DURATION, VIDEO_URL from EXERCISE', sql_con)
+            pd.testing.assert_frame_equal(table.get_table(), expected.set_index('ID'))
+            self.assertEqual(table.get_table()['DURATION'].dtype, 'int64')
+
+            # assert that real and NULL values in an integer column are read like with pd.read_sql
+            for statement in ['update EXERCISE set DURATION = 1.7 where ID = 3',
+                              'update EXERCISE set DURATION = NULL where ID = 1']:
+                sql_con.execute(statement)
+                sql_con.commit()
+                table.read_table_sql(sql_con, chunk_size=2)
+                expected = pd.read_sql('select ID, NAME, DESCRIPTION, DURATION, VIDEO_URL from EXERCISE', sql_con)
+                pd.testing.assert_frame_equal(table.get_table(), expected.set_index('ID'))
+                self.assertEqual(table.get_table().loc[3, 'DURATION'], 1.7)
+
+    def test_snapshot_cache(self):
+        cache = snapshot.SnapshotCache(DATABASE)
+        stamp = cache.get_database_stamp()
+        for name in data._read_db_definition(DB_DEF).keys():
+            table_data = data_con.get_table_content(name)
+            # assert that every table can be written and read again without changes
+            self.assertEqual(cache.save_table(name, table_data, stamp), True)
+            pd.testing.assert_frame_equal(cache.load_table(name, table_data.columns, stamp), table_data)
+
+        # assert that the snapshots are invalid after the database was changed
+        self.assertIsNone(cache.load_table(data.NAME_EXERCISE, data_con.get_table_columns(data.NAME_EXERCISE),
+                                           stamp[:-1] + [stamp[-1] + 1]))
+
+        with tempfile.TemporaryDirectory() as directory:
+            text_cache = snapshot.SnapshotCache(os.path.join(directory, 'missing.db'))
+            table_data = pd.DataFrame({'ID': [0, 1], 'NAME': ['Ä', None]})
+            # assert that nothing is cached for a database that does not exist
+            self.assertEqual(text_cache.save_table('TEST', table_data, text_cache.get_database_stamp()), False)
+            # assert that missing text values are restored
+            self.assertEqual(text_cache.save_table('TEST', table_data, [1]), True)
+            pd.testing.assert_frame_equal(text_cache.load_table('TEST', ['ID', 'NAME'], [1]), table_data)
+
+            # assert that a long text does not widen the other values of the column
+            table_data = pd.DataFrame({'ID': range(1000), 'NAME': ['x' * 10000] + ['Übung'] * 998 + [None]})
+            self.assertEqual(text_cache.save_table('TEST', table_data, [1]), True)
+            pd.testing.assert_frame_equal(text_cache.load_table('TEST', ['ID', 'NAME'], [1]), table_data)
+            self.assertLess(os.path.getsize(os.path.join(directory, 'missing.db.cache', 'TEST.1.npy')), 20000)
+
+    def test_shared_memory_viewer(self):
+        with tempfile.TemporaryDirectory() as directory:
+            database = os.path.join(directory, 'shared.db')
+            shutil.copyfile(DATABASE, database)
+            loader = snapshot.SharedMemoryCache(database, publish=True)
+            table_names = list(data._read_db_definition(DB_DEF).keys())
+            with closing(sqlite3.connect(database)) as sql_con:
+                for name in table_names:
+                    # the tables are published with their row versions
+                    table_data = pd.read_sql(f'select * from {name}', sql_con)
+                    loader.save_table(name, table_data, loader.get_database_stamp())
+
+            viewer_con = data.DatabaseConnector(database, DB_DEF, cache=snapshot.SharedMemoryCache(database),
+                                                read_only=True)
+            # assert that the viewer has the published tables and cannot change them
+            pd.testing.assert_frame_equal(viewer_con.get_table_content(data.NAME_EXERCISE),
+                                          data_con.get_table_content(data.NAME_EXERCISE))
+            with self.assertRaises(error.ForbiddenActionError):
+                viewer_con.delete_entry_from_table(data.NAME_EXERCISE_CATEGORY,
+                                                   viewer_con.get_table_content(data.NAME_EXERCISE_CATEGORY).iloc[0])
+
+            with closing(sqlite3.connect(database)) as sql_con:
+                sql_con.execute(f'delete from {data.NAME_EXERCISE_CATEGORY}')
+                sql_con.commit()
+                # assert that the viewer waits until the changed database was published
+                self.assertEqual(viewer_con.refresh(), False)
+                for name in table_names:
+                    table_data = pd.read_sql(f'select * from {name}', sql_con)
+                    loader.save_table(name, table_data, loader.get_database_stamp())
+            self.assertEqual(viewer_con.refresh(), True)
+            self.assertEqual(len(viewer_con.get_table_content(data.NAME_EXERCISE_CATEGORY).index), 0)
+
+            viewer = snapshot.SharedMemoryCache(database)
+            columns = data._read_db_definition(DB_DEF)[data.NAME_EXERCISE][0] + [data.VERSION_COLUMN]
+            exercises = viewer.load_table(data.NAME_EXERCISE, columns, viewer.get_database_stamp())
+            # assert that the numeric columns are read-only views on the shared memory
+            self.assertEqual(exercises['ID'].to_numpy().flags.writeable, False)
+            with self.assertRaises(ValueError):
+                exercises.loc[0, 'ID'] = 1000
+            self.assertEqual(viewer.load_table(data.NAME_EXERCISE, columns, viewer.get_database_stamp())['ID'][0], 0)
+            self.assertEqual(exercises['NAME'].to_numpy().flags.writeable, True)
+
+            loader.close()
+            with closing(sqlite3.connect(database)) as sql_con:
+                sql_con.execute(f'delete from {data.NAME_EXERCISE_UNIT}')
+                sql_con.commit()
+            # assert that the viewer reads the database itself without a loader process
+            self.assertEqual(viewer_con.refresh(), True)
+            self.assertEqual(len(viewer_con.get_table_content(data.NAME_EXERCISE_UNIT).index), 0)
+            viewer_con.close()
+
+    def test_connection_pool(self):
+        with data_con.reader() as sql_con:
+            # assert that the tables can be read, but not changed
+            self.assertEqual(sql_con.execute(f'select count(*) from {data.NAME_EXERCISE}').fetchone()[0] > 0, True)
+            with self.assertRaises(sqlite3.OperationalError):
+                sql_con.execute(f'delete from {data.NAME_EXERCISE}')
+
+        counts = []
+
+        def read_task():
+            with data_con.reader() as reader_con:
+                counts.append(reader_con.execute(f'select count(*) from {data.NAME_EXERCISE}').fetchone()[0])
+
+        threads = [threading.Thread(target=read_task) for _ in range(data.POOL_READERS + 2)]
+        with data_con.writer():
+            # readers are not blocked by the writer and more threads than connections need to wait for a free one
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        # assert that all threads have read the same table
+        self.assertEqual(len(set(counts)), 1)
+        self.assertEqual(len(counts), len(threads))
+
     def test_lookup_entry_in_table(self):
         exercise_name = 'Test Übung'
         lookup_existing = data_con.lookup_entry_in_table(data.NAME_EXERCISE, 'NAME', [exercise_name])
@@ -195,14 +724,256 @@ class DataUnitTest(unittest.TestCase):
         # assert that no entry was found
         self.assertEqual(len(lookup_none.index), 0)
 
-    def test_singleton_database_connector(self):
+    def test_relation_graph(self):
+        # assert that the relations lead to the tables on the far side of the relation tables
+        self.assertEqual([(relation.relation_table, relation.far_table, relation.far_key) for relation in
+                          data_con.get_relations(data.NAME_EXERCISE)],
+                         [(data.NAME_EXERCISE_UNIT, data.NAME_UNIT, 'UNIT_ID'),
+                          (data.NAME_EXERCISE_RESOURCE, data.NAME_RESOURCE, 'RESOURCE_ID'),
+                          (data.NAME_EXERCISE_CATEGORY, data.NAME_CATEGORY, 'CATEGORY_ID')])
+        self.assertEqual(data_con.get_top_table_key(data.NAME_UNIT_PLAN), 'PLAN_ID')
+        self.assertEqual(data_con.get_top_table_key(data.NAME_EXERCISE), '')
+
+        # assert that table names with more underscores work, as the graph is built from the column relations
+        with tempfile.TemporaryDirectory() as directory:
+            db_def = os.path.join(directory, 'db_def.xml')
+            with open(db_def, 'w', encoding='UTF-8') as file:
+                file.write('<TABLES><TABLE NAME="TRAINING_PLAN" TYPE="MAIN"><COLUMN TYPE="ID">ID</COLUMN>'
+                           '<RELATION KEY="PLAN_ID">TRAINING_PLAN_DAY</RELATION></TABLE>'
+                           '<TABLE NAME="TRAINING_PLAN_DAY" TYPE="RELATION" TOP="TRAINING_PLAN">'
+                           '<COLUMN TYPE="INTEGER" RELATION="TRAINING_PLAN">PLAN_ID</COLUMN>'
+                           '<COLUMN TYPE="INTEGER" RELATION="TRAINING_DAY">DAY_ID</COLUMN></TABLE></TABLES>')
+            definition = data._DataTableDefinition('TRAINING_PLAN', data._read_db_definition(db_def)['TRAINING_PLAN'])
+            self.assertEqual(definition.get_relations(),
+                             (data._Relation('TRAINING_PLAN_DAY', 'PLAN_ID', 'TRAINING_DAY', 'DAY_ID'),))
+            self.assertEqual(data._DataTableDefinition('TRAINING_PLAN_DAY', data._read_db_definition(db_def)[
+                'TRAINING_PLAN_DAY']).get_top_table_key(), 'PLAN_ID')
+
+    def test_duration_totals(self):
+        totals = []
+
+        def listener(table_name, event, entry):
+            if event == data.EVENT_TOTAL:
+                totals.append((table_name, entry['ID'], entry[data.TOTAL_COLUMN]))
+
+        exercise = pd.Series(index=data_con.get_table_columns(data.NAME_EXERCISE),
+                             data=['', 'Test Dauer', 'Dies ist ein Test', 600, 'http://www.google.de'])
+        unit = pd.Series(index=data_con.get_table_columns(data.NAME_UNIT), data=['', 'Test Dauer', 'Test', 0])
+        exercise_id = data_con.add_entry_to_table(data.NAME_EXERCISE, exercise)
+        unit_id = data_con.add_entry_to_table(data.NAME_UNIT, unit)
+        data_con.connect_change_listener(listener)
+        data_con.add_entry_to_table(data.NAME_EXERCISE_UNIT, data_con.build_entry_for_relation_table(
+            data.NAME_EXERCISE_UNIT, {'EXERCISE_ID': exercise_id, 'UNIT_ID': unit_id}))
+        # assert that the total of the unit contains the duration of the new exercise
+        self.assertEqual(data_con.get_duration_total(data.NAME_UNIT, unit_id), 600)
+
+        exercise['DURATION'] = 900
+        data_con.modify_entry_in_table(data.NAME_EXERCISE, exercise)
+        # assert that a changed duration is applied to the totals of the units using the exercise
+        self.assertEqual(data_con.get_duration_total(data.NAME_UNIT, unit_id), 900)
+
+        data_con.delete_entry_from_table(data.NAME_EXERCISE, exercise)
+        data_con.disconnect_change_listener(listener)
+        # assert that the relation was removed with the exercise, and that every new total was notified
+        self.assertEqual(data_con.get_duration_total(data.NAME_UNIT, unit_id), 0)
+        self.assertEqual(totals, [(data.NAME_UNIT, unit_id, 600), (data.NAME_UNIT, unit_id, 900),
+                                  (data.NAME_UNIT, unit_id, 0)])
+        # assert that durations stored as time text by previous versions are read as seconds
+        self.assertEqual([data._parse_duration(value) for value in ['01:30:15', '00:45', '', None, 120]],
+                         [5415, 2700, 0, 0, 120])
+        with self.assertLogs(data.__name__, 'WARNING'):
+            self.assertEqual(data._parse_duration('1:xx'), 0)
+
+        data_con.rollback_changes()
+
+    def test_convert_durations(self):
+        with tempfile.TemporaryDirectory() as directory:
+            database = os.path.join(directory, 'old.db')
+            with closing(sqlite3.connect(database)) as sql_con:
+                # durations of a previous version as time text, some of them typed in another format
+                sql_con.execute('create table EXERCISE (ID INTEGER, NAME TEXT, DESCRIPTION TEXT, DURATION TEXT, '
+                                'VIDEO_URL TEXT)')
+                sql_con.executemany('insert into EXERCISE (ID, NAME, DURATION) values (?, ?, ?)',
+                                    [(0, 'A', '00:30:00'), (1, 'B', '1h'), (2, 'C', '90 min'), (3, 'D', '1:xx'),
+                                     (4, 'E', ''), (5, 'F', '45')])
+                sql_con.commit()
+
+            with self.assertLogs(data.__name__, 'WARNING') as logs:
+                old_con = data.DatabaseConnector(database, DB_DEF)
+            # assert that the malformed durations are converted to zero with a warning and the others into seconds
+            self.assertEqual(old_con.get_table_content(data.NAME_EXERCISE)['DURATION'].to_list(),
+                             [1800, 0, 0, 0, 0, 45])
+            self.assertEqual(len(logs.output), 3)
+            with closing(sqlite3.connect(database)) as sql_con:
+                self.assertEqual(sql_con.execute("select count(*) from EXERCISE "
+                                                 "where typeof(DURATION) != 'integer'").fetchone()[0], 0)
+
+            old_con.close()
+
+    def test_upgrade_shipped_databases(self):
+        for shipped_database in SHIPPED_DATABASES:
+            with self.subTest(database=shipped_database), tempfile.TemporaryDirectory() as directory:
+                database = shutil.copy(shipped_database, directory)
+                with closing(sqlite3.connect(database)) as sql_con:
+                    exercises = sql_con.execute('select ID, NAME, DURATION from EXERCISE order by ID').fetchall()
+
+                upgraded_con = data.DatabaseConnector(database, DB_DEF)
+                upgraded_con.close()
+                with closing(sqlite3.connect(database)) as sql_con:
+                    column_types = {name: {row[1]: row[2] for row in sql_con.execute(f'pragma table_info({name})')}
+                                    for name in [data.NAME_EXERCISE, data.NAME_UNIT, data.NAME_PLAN,
+                                                 data.NAME_CALENDAR]}
+                    # assert that the tables of the first version got the columns and types of the current one
+                    for name, types in column_types.items():
+                        self.assertEqual(types['ID'], 'INTEGER')
+                        self.assertIn(data.VERSION_COLUMN, types)
+                    self.assertEqual(column_types[data.NAME_EXERCISE][data.DURATION_COLUMN], 'INTEGER')
+                    self.assertEqual(column_types[data.NAME_UNIT][data.DURATION_COLUMN], 'INTEGER')
+                    self.assertIn('REPEAT_DAYS', column_types[data.NAME_CALENDAR])
+                    self.assertIn('END_DATE', column_types[data.NAME_CALENDAR])
+                    # assert that the content is kept with the durations in seconds
+                    self.assertEqual(sql_con.execute('select ID, NAME, DURATION from EXERCISE order by ID').fetchall(),
+                                     [(exercise_id, name, data._parse_duration(duration))
+                                      for exercise_id, name, duration in exercises])
+
+                # assert that the upgraded database is opened without another conversion
+                upgraded_con = data.DatabaseConnector(database, DB_DEF)
+                self.assertEqual(len(upgraded_con.get_table_content(data.NAME_EXERCISE).index), len(exercises))
+                upgraded_con.close()
+
+    def test_read_broken_table(self):
+        with tempfile.TemporaryDirectory() as directory:
+            database = shutil.copy(DATABASE, directory)
+            with closing(sqlite3.connect(database)) as sql_con:
+                sql_con.execute(f'insert into {data.NAME_EXERCISE} select * from {data.NAME_EXERCISE} limit 1')
+                sql_con.commit()
+
+            for read_only in [True, False]:
+                # assert that the error of the table with duplicate IDs is raised instead of creating the table
+                with self.assertRaisesRegex(ValueError, 'duplicate'):
+                    data.DatabaseConnector(database, DB_DEF, use_snapshots=False, read_only=read_only)
+
+    def test_calendar_text_keys(self):
+        with tempfile.TemporaryDirectory() as directory:
+            database = os.path.join(directory, 'calendar.db')
+            shutil.copyfile(DATABASE, database)
+            with closing(sqlite3.connect(database)) as sql_con:
+                # calendar of a previous version, whose IDs were stored as text
+                sql_con.execute(f'drop table {data.NAME_CALENDAR}')
+                sql_con.execute(f'create table {data.NAME_CALENDAR} ("ID" TEXT, "PLAN_ID" INTEGER, "DATE" TEXT)')
+                sql_con.execute(f'insert into {data.NAME_CALENDAR} values (?, ?, ?)', ['0', 0, '2026-01-05'])
+                sql_con.commit()
+            # assert that the IDs are read as integers, also if the database cannot be converted
+            viewer_con = data.DatabaseConnector(database, DB_DEF, read_only=True, use_snapshots=False)
+            self.assertEqual(viewer_con.get_table_content(data.NAME_CALENDAR)['ID'].to_list(), [0])
+            viewer_con.close()
+
+            columns = None
+            for day in ['2026-01-12', '2026-01-19']:
+                # add an entry and commit it, so the next entry is added to the IDs read from the database
+                calendar_con = data.DatabaseConnector(database, DB_DEF)
+                columns = calendar_con.get_table_columns(data.NAME_CALENDAR)
+                calendar_con.add_entry_to_table(data.NAME_CALENDAR, pd.Series(index=columns,
+                                                                              data=['', 0, day, 0, None]))
+                calendar_con.commit_changes()
+                calendar_con.close()
+
+            calendar_con = data.DatabaseConnector(database, DB_DEF)
+            # assert that the key column was converted and the IDs of all entries are integers
+            self.assertEqual(calendar_con.get_calendar_entries('2026-01-01', '2026-01-31')['ID'].to_list(),
+                             [0, 1, 2])
+            self.assertEqual(calendar_con.get_entry_conflicts(pd.Series(index=columns,
+                                                                        data=[1, 0, '2026-01-12', 0, None])), {})
+            calendar_con.close()
+            with closing(sqlite3.connect(database)) as sql_con:
+                self.assertEqual(sql_con.execute(f"select count(*) from {data.NAME_CALENDAR} "
+                                                 f"where typeof(ID) != 'integer'").fetchone()[0], 0)
+
+    def test_calendar(self):
+        plan = pd.Series(index=data_con.get_table_columns(data.NAME_PLAN), data=['', 'Test Kalender', 'Test'])
+        plan_id = data_con.add_entry_to_table(data.NAME_PLAN, plan)
+        columns = data_con.get_table_columns(data.NAME_CALENDAR)
+        weekly = pd.Series(index=columns, data=['', plan_id, '2026-01-05', 7, '2026-03-31'])
+        single = pd.Series(index=columns, data=['', plan_id, '2026-01-19', 0, None])
+        weekly_id = data_con.add_entry_to_table(data.NAME_CALENDAR, weekly)
+        # assert that a new entry on a day of the recurring entry is reported before it is saved
+        self.assertEqual(data_con.get_entry_conflicts(single), {weekly_id: '2026-01-19'})
+        single_id = data_con.add_entry_to_table(data.NAME_CALENDAR, single)
+
+        # assert that the recurring entry is expanded for the period of the query
+        self.assertEqual(data_con.get_calendar_entries('2026-01-01', '2026-01-31')['DATE'].to_list(),
+                         ['2026-01-05', '2026-01-12', '2026-01-19', '2026-01-19', '2026-01-26'])
+        self.assertEqual(data_con.get_calendar_conflicts('2026-01-01', '2026-12-31'),
+                         {'2026-01-19': [weekly_id, single_id]})
+        # assert that the next sessions are found in a period without end, the recurring entry ends in March
+        self.assertEqual(data_con.get_calendar_entries(date(2026, 3, 20), limit=3)['DATE'].to_list(),
+                         ['2026-03-23', '2026-03-30'])
+
+        single['DATE'] = '2026-01-20'
+        data_con.modify_entry_in_table(data.NAME_CALENDAR, single)
+        # assert that the index follows the changes and that a saved entry does not conflict with itself
+        self.assertEqual(data_con.get_calendar_conflicts('2026-01-01', '2026-12-31'), {})
+        self.assertEqual(data_con.get_entry_conflicts(single), {})
+
+        # assert that the calendar entries are deleted with their plan
+        data_con.delete_entry_from_table(data.NAME_PLAN, plan)
+        self.assertEqual(len(data_con.get_calendar_entries('2026-01-01', '2026-12-31').index), 0)
+        # check if DataMismatchError is raised for an invalid date
+        with self.assertRaises(error.DataMismatchError):
+            data_con.get_calendar_entries('2026-02-30')
+
+        data_con.rollback_changes()
+
+    def test_database_connector_registry(self):
         data_con1 = data.DatabaseConnector(DATABASE, DB_DEF)
         data_con2 = data.DatabaseConnector(DATABASE, DB_DEF)
 
-        # check if no additional instance of the database connector was created
+        # check if no additional instance of the database connector was created for the same database
         self.assertEqual(data_con1, data_con2)
+        self.assertEqual(data_con1, data_con)
+        # check if the open connector is not returned for other options
+        with self.assertRaises(ValueError):
+            data.DatabaseConnector(DATABASE, DB_DEF, read_only=True)
+        with self.assertRaises(ValueError):
+            data.DatabaseConnector(DATABASE, DB_DEF, use_snapshots=False)
+        with self.assertRaises(ValueError):
+            data.DatabaseConnector(DATABASE, DB_DEF, cache=snapshot.SharedMemoryCache(DATABASE))
+        with self.assertRaises(ValueError):
+            data.DatabaseConnector(DATABASE, 'data/other_def.xml')
+        self.assertEqual(data.DatabaseConnector(DATABASE, DB_DEF, cache=snapshot.SnapshotCache(DATABASE)), data_con)
+
+        with tempfile.TemporaryDirectory() as directory:
+            database = os.path.join(directory, 'other.db')
+            shutil.copyfile(DATABASE, database)
+            other_con = data.DatabaseConnector(database, DB_DEF)
+            # check if the connector of another database is a separate instance with its own tables
+            self.assertNotEqual(other_con, data_con)
+            self.assertEqual(os.path.realpath(database) in data.DatabaseConnector.get_open_connectors(), True)
+            other_con.delete_entry_from_table(data.NAME_EXERCISE_CATEGORY,
+                                              data_con.get_table_content(data.NAME_EXERCISE_CATEGORY).iloc[0])
+            self.assertEqual(len(other_con.get_table_content(data.NAME_EXERCISE_CATEGORY).index) + 1,
+                             len(data_con.get_table_content(data.NAME_EXERCISE_CATEGORY).index))
+
+            other_con.close()
+            # check if a closed connector is removed from the registry
+            self.assertEqual(os.path.realpath(database) in data.DatabaseConnector.get_open_connectors(), False)
+            self.assertNotEqual(data.DatabaseConnector(database, DB_DEF), other_con)
+            data.DatabaseConnector(database, DB_DEF).close()
+
+            with self.assertRaises(OSError):
+                data.DatabaseConnector(database, 'data/missing_def.xml')
+            # check if a connector that could not be opened is not kept in the registry
+            self.assertEqual(os.path.realpath(database) in data.DatabaseConnector.get_open_connectors(), False)
+            other_con = data.DatabaseConnector(database, DB_DEF)
+            self.assertEqual(len(other_con.get_table_content(data.NAME_EXERCISE).index),
+                             len(data_con.get_table_content(data.NAME_EXERCISE).index))
+            other_con.close()
 
 
 if __name__ == '__main__':
+    # the tests run on a copy, as opening the database upgrades the tables of the first version
+    test_directory = tempfile.mkdtemp()
+    atexit.register(shutil.rmtree, test_directory, ignore_errors=True)
+    DATABASE = shutil.copy(DATABASE, test_directory)
     data_con = data.DatabaseConnector(DATABASE, DB_DEF)
     unittest.main()
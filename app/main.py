@@ -3,14 +3,50 @@
 # IU Internationale Hochschule
 
 import control
+import data
+import profiling
+import snapshot
 import os
+import time
 
 DATABASE = 'data\\main.db'
 DB_DEF = 'data\\db_def.xml'
 GUI_DEF = 'view\\gui_def.xml'
+PROFILE = os.environ.get('SPORTAPP_PROFILE', '')  # path of the Chrome trace file, profiling is disabled if empty
+PROFILE_MEMORY = os.environ.get('SPORTAPP_PROFILE_MEMORY', '') == '1'  # measure the peak allocation per action
+MEMORY_BUDGET = int(os.environ.get('SPORTAPP_MEMORY_BUDGET', '0'))  # memory budget for the tables in MB, 0 = none
+# 'viewer' for read-only instances, 'loader' for the process that publishes the tables in shared memory for them
+MODE = os.environ.get('SPORTAPP_MODE', '')
+LOADER_INTERVAL = 1  # seconds between the checks for changes of the database by the loader process
 
 if __name__ == '__main__':
+    if PROFILE != '':
+        # instrument the button actions and the database access before the main control is created
+        profiling.enable(trace_memory=PROFILE_MEMORY)
+        profiling.instrument_class(control.MainControl, 'control', '_button_')
+        profiling.instrument_class(data.DatabaseConnector, 'data')
+
     path = os.path.dirname(os.path.realpath(__file__))  # get the current path
-    main_control = control.MainControl(DATABASE, DB_DEF, GUI_DEF, path)  # create the main control
+
+    if MODE == 'loader':
+        # no GUI: publish the tables in shared memory and publish them again when the database is changed
+        db_path = os.path.join(path, DATABASE)
+        data_con = data.DatabaseConnector(db_path, os.path.join(path, DB_DEF), read_only=True,
+                                          cache=snapshot.SharedMemoryCache(db_path, publish=True))
+        try:
+            while True:
+                time.sleep(LOADER_INTERVAL)
+                data_con.refresh()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            data_con.close()  # remove the shared memory, the viewers read the database themselves again
+        exit(0)
+
+    main_control = control.MainControl(DATABASE, DB_DEF, GUI_DEF, path, MODE == 'viewer')  # create the main control
+    main_control.data_con.set_memory_budget(MEMORY_BUDGET * 1024 * 1024)  # evict unused tables above the budget
     main_control.start_application()  # start the application
 
+    if PROFILE != '':
+        profiling.get_profiler().export_chrome_trace(PROFILE)
+
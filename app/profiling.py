@@ -0,0 +1,311 @@
+"""Module for the opt-in instrumentation of the application with timing spans.
+Nothing is wrapped until enable() is called, so there is no overhead when profiling is disabled.
+disable() restores all wrapped methods.
+"""
+
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+import pandas as pd
+
+ROLLING_SPANS = 10000  # number of spans that are kept in memory
+
+_profiler = None
+_originals = []  # (owner, name, original attribute) of all wrapped methods, in the order they were wrapped
+_MISSING = object()  # marks methods that were inherited, so the wrapper is removed instead of replaced
+
+
+class _Span:
+    """Timing span of a single call, including the DataFrame copies and rows touched during the call
+    """
+
+    __slots__ = ('name', 'category', 'thread_id', 'start', 'duration', 'copies', 'rows', 'memory_start', 'peak')
+
+    def __init__(self, name, category):
+        """Start a new span
+
+        :param name: name of the called method
+        :param category: category of the method (e.g. control or data)
+        """
+
+        self.name = name
+        self.category = category
+        self.thread_id = threading.get_ident()
+        self.start = time.perf_counter_ns()
+        self.duration = 0
+        self.copies = 0
+        self.rows = 0
+        self.memory_start = 0
+        self.peak = 0  # peak allocation in bytes, only measured for the outermost span if memory is traced
+
+
+class Profiler:
+    """Collects timing spans in a rolling buffer and exports them as statistics or Chrome trace
+    """
+
+    _spans: deque
+    _open_spans: threading.local
+    _start: int
+    _trace_memory: bool
+    _started_tracing: bool
+
+    def __init__(self, max_spans=ROLLING_SPANS, trace_memory=False):
+        """Create an empty profiler
+
+        :param max_spans: number of spans that are kept, older spans are discarded
+        :param trace_memory: measure the peak allocation of the outermost spans via tracemalloc
+        """
+
+        self._spans = deque(maxlen=max_spans)
+        self._open_spans = threading.local()  # every thread has its own stack of open spans
+        self._start = time.perf_counter_ns()
+        self._trace_memory = trace_memory
+        self._started_tracing = trace_memory and not tracemalloc.is_tracing()
+        if self._started_tracing:
+            tracemalloc.start()
+
+    def _get_open_spans(self) -> list:
+        """Get the stack of open spans of the current thread
+
+        :return: list of open spans
+        """
+
+        if not hasattr(self._open_spans, 'stack'):
+            self._open_spans.stack = []
+        return self._open_spans.stack
+
+    def start_span(self, name, category) -> _Span:
+        """Start a span and put it on the stack of open spans of the current thread
+
+        :param name: name of the span
+        :param category: category of the span
+        :return: started span
+        """
+
+        span = _Span(name, category)
+        if self._trace_memory and len(self._get_open_spans()) == 0:
+            # the peak can only be reset for the outermost span, inner spans would falsify it
+            tracemalloc.reset_peak()
+            span.memory_start = tracemalloc.get_traced_memory()[0]
+        self._get_open_spans().append(span)
+        return span
+
+    def end_span(self, span):
+        """End a span and store it in the rolling buffer
+
+        :param span: span that was started with start_span
+        :return: None
+        """
+
+        span.duration = time.perf_counter_ns() - span.start
+        open_spans = self._get_open_spans()
+        if span in open_spans:
+            open_spans.remove(span)
+        if self._trace_memory and len(open_spans) == 0:
+            span.peak = max(tracemalloc.get_traced_memory()[1] - span.memory_start, 0)
+        self._spans.append(span)
+
+    def count(self, copies=0, rows=0):
+        """Add DataFrame copies and touched rows to all open spans of the current thread
+
+        :param copies: number of DataFrame copies
+        :param rows: number of rows touched
+        :return: None
+        """
+
+        for span in self._get_open_spans():
+            span.copies += copies
+            span.rows += rows
+
+    def get_statistics(self) -> list:
+        """Get the statistics of all spans in the rolling buffer, aggregated by name
+
+        :return: list of dictionaries with the statistics per name, the slowest first
+        """
+
+        statistics = {}
+        for span in list(self._spans):
+            key = f'{span.category}.{span.name}'
+            if key not in statistics:
+                statistics[key] = {'NAME': key, 'COUNT': 0, 'TOTAL_MS': 0.0, 'MAX_MS': 0.0, 'COPIES': 0, 'ROWS': 0,
+                                   'PEAK_KB': 0.0}
+            stat = statistics[key]
+            stat['COUNT'] += 1
+            stat['TOTAL_MS'] += span.duration / 1e6
+            stat['MAX_MS'] = max(stat['MAX_MS'], span.duration / 1e6)
+            stat['COPIES'] += span.copies
+            stat['ROWS'] += span.rows
+            stat['PEAK_KB'] = max(stat['PEAK_KB'], span.peak / 1024)
+
+        for stat in statistics.values():
+            stat['MEAN_MS'] = stat['TOTAL_MS'] / stat['COUNT']
+        return sorted(statistics.values(), key=lambda item: item['TOTAL_MS'], reverse=True)
+
+    def export_chrome_trace(self, filename):
+        """Export all spans in the rolling buffer as Chrome trace JSON (chrome://tracing or Perfetto)
+
+        :param filename: path of the JSON file
+        :return: None
+        """
+
+        events = []
+        for span in list(self._spans):
+            events.append({'name': span.name, 'cat': span.category, 'ph': 'X', 'pid': os.getpid(),
+                           'tid': span.thread_id, 'ts': (span.start - self._start) / 1000,
+                           'dur': span.duration / 1000, 'args': {'copies': span.copies, 'rows': span.rows,
+                                                                  'peak_kb': span.peak / 1024}})
+
+        with open(filename, 'w', encoding='UTF-8') as file:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, file)
+
+
+def enable(max_spans=ROLLING_SPANS, trace_memory=False) -> Profiler:
+    """Enable profiling: create the profiler and count the copies of DataFrames.
+    Classes still need to be instrumented with instrument_class.
+
+    :param max_spans: number of spans that are kept in the rolling buffer
+    :param trace_memory: measure the peak allocation of every action via tracemalloc (slows down the application)
+    :return: the created profiler
+    """
+
+    global _profiler
+    if _profiler is None:
+        _profiler = Profiler(max_spans, trace_memory)
+        _replace(pd.DataFrame, 'copy', _wrap_copy(pd.DataFrame.copy))
+        _replace(pd.DataFrame, 'reset_index', _wrap_copy(pd.DataFrame.reset_index))
+    return _profiler
+
+
+def disable():
+    """Disable profiling: restore all wrapped methods, including the methods of instrumented classes,
+    and discard the profiler with its spans. Memory tracing is stopped if it was started by the profiler.
+
+    :return: None
+    """
+
+    global _profiler
+    if _profiler is None:
+        return
+
+    # restored in reverse order, so methods that were wrapped twice get their original back
+    while len(_originals) > 0:
+        owner, name, original = _originals.pop()
+        if original is _MISSING:
+            delattr(owner, name)
+        else:
+            setattr(owner, name, original)
+    if _profiler._started_tracing:
+        tracemalloc.stop()
+    _profiler = None
+
+
+def is_enabled() -> bool:
+    """Check if profiling is enabled
+
+    :return: True if enable was called
+    """
+
+    return _profiler is not None
+
+
+def get_profiler() -> Profiler:
+    """Get the profiler that was created by enable
+
+    :return: profiler or None if profiling is disabled
+    """
+
+    return _profiler
+
+
+def instrument_class(cls, category, prefix=None):
+    """Wrap methods of a class with timing spans.
+    If no prefix is given, all public methods are wrapped, else all methods whose name starts with the prefix.
+
+    :param cls: class to be instrumented
+    :param category: category of the spans (e.g. control or data)
+    :param prefix: optional prefix of the method names
+    :return: None
+    """
+
+    for name, method in list(vars(cls).items()):
+        if not inspect.isfunction(method):
+            continue  # static methods, class methods and attributes are not wrapped
+        if (prefix is None and not name.startswith('_')) or (prefix is not None and name.startswith(prefix)):
+            _replace(cls, name, _wrap_method(method, category))
+
+
+def _replace(owner, name, wrapper):
+    """Replace a method of a class by its wrapper and remember the original, so disable can restore it
+
+    :param owner: class of the method
+    :param name: name of the method
+    :param wrapper: wrapped method
+    :return: None
+    """
+
+    _originals.append((owner, name, vars(owner).get(name, _MISSING)))
+    setattr(owner, name, wrapper)
+
+
+def _wrap_method(method, category):
+    """Wrap a method, so every call is recorded as a span
+
+    :param method: function to be wrapped
+    :param category: category of the spans
+    :return: wrapped function
+    """
+
+    # Qt passes additional signal arguments to connected slots that are dropped if the method does not accept them
+    parameters = inspect.signature(method).parameters.values()
+    if any(parameter.kind == inspect.Parameter.VAR_POSITIONAL for parameter in parameters):
+        max_args = None
+    else:
+        max_args = len([parameter for parameter in parameters if parameter.kind in (
+            inspect.Parameter.POSITIONAL_ONLY, inspect.Parameter.POSITIONAL_OR_KEYWORD)])
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        span = _profiler.start_span(method.__name__, category)
+        try:
+            result = method(*args[:max_args], **kwargs)
+            # entries given as Series or as records of the tables and returned Dataframes count as touched rows
+            rows = len([arg for arg in args if _is_entry(arg)])
+            if isinstance(result, pd.DataFrame):
+                rows += len(result.index)
+            _profiler.count(rows=rows)
+            return result
+        finally:
+            _profiler.end_span(span)
+
+    return wrapper
+
+
+def _is_entry(arg) -> bool:
+    """Check if an argument of an instrumented method is an entry of a table
+
+    :param arg: argument of the method
+    :return: True for Series elements and for records of the tables, which are tuples that know their columns
+    """
+
+    return isinstance(arg, pd.Series) or (isinstance(arg, tuple) and hasattr(arg, 'get_columns'))
+
+
+def _wrap_copy(method):
+    """Wrap a DataFrame method that creates a copy, so the copies are counted
+
+    :param method: DataFrame method to be wrapped
+    :return: wrapped method
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not kwargs.get('inplace', False):
+            _profiler.count(copies=1)
+        return method(self, *args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,116 @@
+import data
+import json
+import os
+import pandas as pd
+import profiling
+import shutil
+import tempfile
+import unittest
+
+DATABASE = 'data/test.db'
+DB_DEF = 'data/db_def.xml'
+
+
+class _Instrumented:
+    """Class with methods to be instrumented by the tests
+    """
+
+    def _button_load(self):
+        return self.get_table()
+
+    def _button_ignore(self):
+        return None
+
+    def get_table(self):
+        return pd.DataFrame({'ID': [0, 1, 2]}).copy()
+
+    @staticmethod
+    def get_static():
+        return 0
+
+
+class ProfilingUnitTest(unittest.TestCase):
+    def tearDown(self):
+        profiling.disable()
+
+    def test_spans(self):
+        profiler = profiling.enable()
+        profiling.instrument_class(_Instrumented, 'control', '_button_')
+        profiling.instrument_class(_Instrumented, 'data')
+        _Instrumented()._button_load()
+        _Instrumented()._button_load('signal argument')  # arguments of Qt signals are dropped
+
+        statistics = {stat['NAME']: stat for stat in profiler.get_statistics()}
+        # assert that the nested spans were recorded with the copies and the rows of the returned Dataframes
+        self.assertEqual(set(statistics.keys()), {'control._button_load', 'data.get_table'})
+        self.assertEqual(statistics['control._button_load']['COUNT'], 2)
+        self.assertEqual(statistics['data.get_table']['COPIES'], 2)
+        self.assertEqual(statistics['data.get_table']['ROWS'], 6)
+        self.assertEqual(statistics['control._button_load']['ROWS'], 12)
+        # assert that only the methods with the prefix or the public methods were instrumented
+        self.assertEqual(hasattr(_Instrumented._button_ignore, '__wrapped__'), True)
+        self.assertEqual(hasattr(_Instrumented.get_table, '__wrapped__'), True)
+        self.assertEqual(isinstance(vars(_Instrumented)['get_static'], staticmethod), True)
+
+    def test_record_rows(self):
+        profiler = profiling.enable()
+        profiling.instrument_class(data.DatabaseConnector, 'data')
+        with tempfile.TemporaryDirectory() as directory:
+            database = shutil.copy(DATABASE, directory)
+            data_con = data.DatabaseConnector(database, DB_DEF)
+            exercise = data_con.build_record_for_table(data.NAME_EXERCISE, ['', 'Übung', '', 60, ''])
+            data_con.add_entry_to_table(data.NAME_EXERCISE, exercise)
+            data_con.add_entry_to_table(data.NAME_EXERCISE, pd.Series(index=exercise.get_columns(), data=exercise))
+            data_con.close()
+
+        statistics = {stat['NAME']: stat for stat in profiler.get_statistics()}
+        # assert that the entries given as records count as rows like the entries given as Series
+        self.assertEqual(statistics['data.add_entry_to_table']['COUNT'], 2)
+        self.assertEqual(statistics['data.add_entry_to_table']['ROWS'], 2)
+
+    def test_rolling_buffer(self):
+        profiler = profiling.enable(max_spans=3)
+        profiling.instrument_class(_Instrumented, 'data')
+        for _ in range(5):
+            _Instrumented().get_table()
+
+        # assert that only the latest spans are kept
+        self.assertEqual(profiler.get_statistics()[0]['COUNT'], 3)
+
+    def test_export_chrome_trace(self):
+        profiler = profiling.enable()
+        profiling.instrument_class(_Instrumented, 'control', '_button_')
+        _Instrumented()._button_load()
+
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'trace.json')
+            profiler.export_chrome_trace(filename)
+            with open(filename, encoding='UTF-8') as file:
+                trace = json.load(file)
+
+        # assert that the span was exported as complete event
+        self.assertEqual([(event['name'], event['cat'], event['ph']) for event in trace['traceEvents']],
+                         [('_button_load', 'control', 'X')])
+        self.assertEqual(trace['traceEvents'][0]['args']['copies'], 1)
+
+    def test_disable(self):
+        copy, reset_index = pd.DataFrame.copy, pd.DataFrame.reset_index
+        copy_defined = 'copy' in vars(pd.DataFrame)  # the method is inherited from NDFrame
+        button_load = _Instrumented._button_load
+        profiling.enable()
+        profiling.instrument_class(_Instrumented, 'control', '_button_')
+        profiling.instrument_class(_Instrumented, 'control', '_button_')
+        self.assertNotEqual(pd.DataFrame.copy, copy)
+
+        profiling.disable()
+        # assert that all wrapped methods were restored, also the ones that were wrapped twice
+        self.assertEqual(profiling.is_enabled(), False)
+        self.assertEqual(pd.DataFrame.copy, copy)
+        self.assertEqual(pd.DataFrame.reset_index, reset_index)
+        self.assertEqual('copy' in vars(pd.DataFrame), copy_defined)
+        self.assertEqual(_Instrumented._button_load, button_load)
+        self.assertEqual(len(_Instrumented()._button_load().index), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
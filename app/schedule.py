@@ -0,0 +1,302 @@
+"""Module for the calendar of the plans, which schedules a plan on a date and optionally repeats it in a fixed interval.
+The dates are kept in a sorted index of day numbers (proleptic Gregorian ordinals), so the sessions of a period are
+found by bisection instead of scanning the whole calendar. A recurring entry is stored once as a series of dates
+and only expanded for the requested period, so calendars over many years do not grow with the number of sessions.
+"""
+
+import bisect
+import itertools
+import math
+import numpy as np
+from datetime import date
+from typing import NamedTuple
+
+NO_END = date.max.toordinal()  # last day of recurring entries without an end date
+_EPOCH_DAY = date(1970, 1, 1).toordinal()  # day zero of numpy dates
+WINDOW_DAYS = 92  # days of a period that are expanded at once while iterating, about one season
+
+
+class _Series(NamedTuple):
+    """Dates of a calendar entry as arithmetic progression. An entry without repetition is a series of one day.
+    """
+
+    first: int  # ordinal of the first date
+    last: int  # ordinal of the last date, it is always a date of the series
+    interval: int  # days between two dates, at least 1
+    plan_id: int
+
+
+class CalendarIndex:
+    """Sorted index of the dates of all calendar entries.
+    Single dates are kept in a sorted list, recurring entries in a list sorted by their first date.
+    The index is changed entry by entry, so it does not need to be built again after a change.
+    """
+
+    _series: dict[int, _Series]
+    _singles: list[tuple[int, int]]
+    _recurring: list[tuple[int, int]]
+
+    def __init__(self, entries=()):
+        """Create the index for the given calendar entries. Entries without a valid date are not scheduled.
+
+        :param entries: iterable of (entry ID, plan ID, date, repeat days, end date) as stored in the table
+        """
+
+        self._series = {}  # dates of all scheduled entries by entry ID
+        for entry_id, plan_id, start, repeat_days, end in entries:
+            series = _build_series(plan_id, start, repeat_days, end)
+            if series is not None:
+                self._series[entry_id] = series
+        # the lists are sorted once, afterwards they are kept sorted by bisection
+        self._singles = sorted((series.first, entry_id) for entry_id, series in self._series.items()
+                               if series.first == series.last)
+        self._recurring = sorted((series.first, entry_id) for entry_id, series in self._series.items()
+                                 if series.first != series.last)
+
+    def __len__(self) -> int:
+        """Get the number of scheduled entries, a recurring entry is counted once
+
+        :return: number of entries
+        """
+
+        return len(self._series)
+
+    def add(self, entry_id, plan_id, start, repeat_days, end):
+        """Add an entry to the index, an existing entry with the same ID is replaced
+
+        :param entry_id: ID of the calendar entry
+        :param plan_id: ID of the scheduled plan
+        :param start: first date as ISO text or date
+        :param repeat_days: days between two sessions, 0 or missing if the entry is not repeated
+        :param end: last possible date of a recurring entry as ISO text or date, missing if it repeats without end
+        :return: None
+        """
+
+        self.remove(entry_id)
+        series = _build_series(plan_id, start, repeat_days, end)
+        if series is not None:
+            self._series[entry_id] = series
+            bisect.insort(self.__get_list(series), (series.first, entry_id))
+
+    def remove(self, entry_id):
+        """Remove an entry from the index, unknown entries are ignored
+
+        :param entry_id: ID of the calendar entry
+        :return: None
+        """
+
+        series = self._series.pop(entry_id, None)
+        if series is not None:
+            days = self.__get_list(series)
+            del days[bisect.bisect_left(days, (series.first, entry_id))]
+
+    def __get_list(self, series) -> list:
+        """Get the sorted list that contains a series
+
+        :param series: dates of an entry
+        :return: list of the single dates or of the recurring entries
+        """
+
+        return self._singles if series.first == series.last else self._recurring
+
+    def iter_occurrences(self, first, last=NO_END, plan_ids=None):
+        """Iterate the sessions of a period in the order of their dates.
+        The period is expanded window by window while iterating, so iterating only the first sessions is cheap
+        even if the period has no end. Empty windows are doubled, so sparse calendars are skipped quickly.
+        The index must not be changed during the iteration.
+
+        :param first: ordinal of the first day of the period
+        :param last: ordinal of the last day of the period
+        :param plan_ids: optional collection of plan IDs, the sessions of other plans are skipped
+        :return: iterator of (day, entry ID, plan ID), sorted by day and entry ID
+        """
+
+        window = WINDOW_DAYS
+        while first <= last:
+            window_last = min(last, first + window - 1)
+            occurrences = self.get_occurrences(first, window_last, plan_ids)
+            yield from occurrences
+            first = window_last + 1
+            if len(occurrences) == 0:
+                window *= 2
+
+    def get_occurrences(self, first, last, plan_ids=None) -> list[tuple[int, int, int]]:
+        """Get the sessions of a period. The single dates are found by bisection, the recurring entries are only
+        expanded for the period.
+
+        :param first: ordinal of the first day of the period
+        :param last: ordinal of the last day of the period
+        :param plan_ids: optional collection of plan IDs, the sessions of other plans are skipped
+        :return: list of (day, entry ID, plan ID), sorted by day and entry ID
+        """
+
+        occurrences = []
+        for position in range(bisect.bisect_left(self._singles, (first,)),
+                              bisect.bisect_left(self._singles, (last + 1,))):
+            day, entry_id = self._singles[position]
+            plan_id = self._series[entry_id].plan_id
+            if plan_ids is None or plan_id in plan_ids:
+                occurrences.append((day, entry_id, plan_id))
+
+        # recurring entries that start after the period cannot have sessions in it
+        for start, entry_id in self._recurring[:bisect.bisect_left(self._recurring, (last + 1,))]:
+            series = self._series[entry_id]
+            if series.last >= first and (plan_ids is None or series.plan_id in plan_ids):
+                occurrences += [(day, entry_id, series.plan_id) for day in _get_days(series, first, last)]
+        occurrences.sort()
+        return occurrences
+
+    def find_conflicts(self, first, last) -> dict[int, list]:
+        """Find the days of a period with more than one session
+
+        :param first: ordinal of the first day of the period
+        :param last: ordinal of the last day of the period
+        :return: dictionary of the lists of entry IDs by day
+        """
+
+        conflicts = {}
+        for day, occurrences in itertools.groupby(self.iter_occurrences(first, last), key=lambda item: item[0]):
+            entry_ids = [occurrence[1] for occurrence in occurrences]
+            if len(entry_ids) > 1:
+                conflicts[day] = entry_ids
+        return conflicts
+
+    def find_entry_conflicts(self, plan_id, start, repeat_days, end, entry_id=None) -> dict[int, int]:
+        """Find the entries that have a session on the same day as the given entry, e.g. before it is saved.
+        Recurring entries are compared as arithmetic progressions, so they are not expanded.
+        Single dates are compared by bisection, per date of the given entry or per single date in its period,
+        whatever is less.
+
+        :param plan_id: ID of the scheduled plan
+        :param start: first date as ISO text or date
+        :param repeat_days: days between two sessions, 0 or missing if the entry is not repeated
+        :param end: last possible date of a recurring entry as ISO text or date, missing if it repeats without end
+        :param entry_id: optional ID of the given entry, so it does not conflict with its previous version
+        :return: dictionary of the first common day by the IDs of the conflicting entries
+        """
+
+        series = _build_series(plan_id, start, repeat_days, end)
+        if series is None:
+            return {}
+
+        conflicts = {}
+        for other_first, other_id in self._recurring[:bisect.bisect_left(self._recurring, (series.last + 1,))]:
+            day = _get_first_common_day(series, self._series[other_id])
+            if day is not None and other_id != entry_id:
+                conflicts[other_id] = day
+
+        low = bisect.bisect_left(self._singles, (series.first,))
+        high = bisect.bisect_left(self._singles, (series.last + 1,))
+        if high - low <= (series.last - series.first) // series.interval + 1:
+            # fewer single dates than sessions of the entry in its period, so the single dates are checked
+            candidates = (self._singles[position] for position in range(low, high))
+        else:
+            days = _get_days(series, series.first, series.last)
+            candidates = itertools.chain.from_iterable(
+                self._singles[bisect.bisect_left(self._singles, (day,)):bisect.bisect_left(self._singles, (day + 1,))]
+                for day in days)
+        for day, other_id in candidates:
+            if (day - series.first) % series.interval == 0 and other_id != entry_id:
+                conflicts[other_id] = min(day, conflicts.get(other_id, day))
+        return dict(sorted(conflicts.items(), key=lambda item: (item[1], item[0])))
+
+
+def to_day(value) -> int:
+    """Convert a date into the ordinal of the day
+
+    :param value: date or ISO text (YYYY-MM-DD)
+    :return: ordinal of the day
+    """
+
+    if isinstance(value, date):
+        return value.toordinal()
+    return date.fromisoformat(value).toordinal()
+
+
+def to_text(day) -> str:
+    """Convert the ordinal of a day into ISO text, as the dates are stored in the database
+
+    :param day: ordinal of the day
+    :return: date as ISO text (YYYY-MM-DD)
+    """
+
+    return date.fromordinal(day).isoformat()
+
+
+def to_texts(days) -> list:
+    """Convert the ordinals of many days into ISO text at once
+
+    :param days: sequence of ordinals of days
+    :return: list of the dates as ISO text (YYYY-MM-DD)
+    """
+
+    return (np.asarray(days, dtype=np.int64) - _EPOCH_DAY).astype('datetime64[D]').astype(str).tolist()
+
+
+def _is_missing(value) -> bool:
+    """Check if a value of a calendar entry is missing, e.g. NULL in the database or an empty field
+
+    :param value: value of a column
+    :return: True if the value is missing
+    """
+
+    return value is None or value == '' or (isinstance(value, float) and math.isnan(value))
+
+
+def _build_series(plan_id, start, repeat_days, end) -> _Series:
+    """Build the series of dates of a calendar entry
+
+    :param plan_id: ID of the scheduled plan
+    :param start: first date as ISO text or date
+    :param repeat_days: days between two sessions, 0 or missing if the entry is not repeated
+    :param end: last possible date of a recurring entry as ISO text or date, missing if it repeats without end
+    :return: series of the entry, None if it has no valid date
+    """
+
+    try:
+        first = to_day(start)
+        last = NO_END if _is_missing(end) else to_day(end)
+    except (TypeError, ValueError):
+        return None  # the entry cannot be scheduled without a valid date
+    interval = 0 if _is_missing(repeat_days) else int(repeat_days)
+    if interval <= 0 or last <= first:
+        return _Series(first, first, 1, plan_id)
+    # the series ends with its last date before the end date, so it can be compared with other series
+    return _Series(first, first + (last - first) // interval * interval, interval, plan_id)
+
+
+def _get_days(series, first, last) -> range:
+    """Get the dates of a series within a period
+
+    :param series: dates of an entry
+    :param first: ordinal of the first day of the period
+    :param last: ordinal of the last day of the period
+    :return: range of the ordinals of the days
+    """
+
+    # the first date of the series that is not before the period
+    start = series.first + max(0, -(-(first - series.first) // series.interval)) * series.interval
+    return range(start, min(last, series.last) + 1, series.interval)
+
+
+def _get_first_common_day(series, other) -> int:
+    """Get the first day that two series have in common. The days of both series are congruent to their first days
+    modulo their intervals, so the common days are found with the Chinese remainder theorem.
+
+    :param series: dates of an entry
+    :param other: dates of another entry
+    :return: ordinal of the first common day, None if the series have no day in common
+    """
+
+    low, high = max(series.first, other.first), min(series.last, other.last)
+    divisor = math.gcd(series.interval, other.interval)
+    if low > high or (other.first - series.first) % divisor != 0:
+        return None
+
+    # solve series.first + series.interval * k = other.first (modulo other.interval) for k
+    modulus = other.interval // divisor
+    k = (other.first - series.first) // divisor * pow(series.interval // divisor, -1, modulus) % modulus
+    # the common days repeat with the least common multiple of the intervals
+    step = series.interval // divisor * other.interval
+    day = low + (series.first + series.interval * k - low) % step
+    return day if day <= high else None
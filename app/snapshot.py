@@ -0,0 +1,454 @@
+"""Module for the columnar snapshot cache of the tables, so the application does not need to parse all rows of the
+database on every start.
+Every column is stored as numpy .npy file in a folder next to the database and memory-mapped when it is loaded.
+Alternatively, a loader process publishes the columns in shared memory for several read-only viewer processes.
+The snapshots are only valid as long as the database file was not changed since they were written.
+"""
+
+import json
+import os
+import secrets
+import threading
+import weakref
+import numpy as np
+import pandas as pd
+from multiprocessing import resource_tracker, shared_memory
+
+CACHE_SUFFIX = '.cache'  # suffix of the cache folder next to the database
+SHARED_SUFFIX = '.shm.json'  # suffix of the manifest of the tables published in shared memory
+CACHE_VERSION = 3  # snapshots of other versions are ignored
+_HEADER_CHANGE_COUNTER = 24  # offset of the file change counter in the header of a SQLite database
+_published_blocks = set()  # names of the shared memory blocks created by this process
+
+
+class SnapshotCache:
+    """Reads and writes the snapshots of the tables of one database
+    """
+
+    _database: str
+    _directory: str
+
+    def __init__(self, database):
+        """Create the cache for the given database. The folder is created when the first snapshot is written.
+
+        :param database: path to the database file
+        """
+
+        self._database = database
+        self._directory = database + CACHE_SUFFIX
+
+    def get_database_stamp(self) -> list:
+        """Get the stamp of the current state of the database file
+
+        :return: stamp as list, so it can be compared with the stamp stored as JSON
+        """
+
+        return get_database_stamp(self._database)
+
+    def is_published(self, stamp) -> bool:
+        """Check if the snapshots for the given database stamp can be expected.
+        Snapshot files are written by every process that reads the database, so there is nothing to wait for.
+
+        :param stamp: stamp of the database from get_database_stamp
+        :return: True
+        """
+
+        return True
+
+    def is_compatible(self, other) -> bool:
+        """Check if another cache reads and writes the same snapshots as this cache
+
+        :param other: other cache
+        :return: True if both caches are of the same type and belong to the same database
+        """
+
+        return type(other) is type(self) and os.path.realpath(other._database) == os.path.realpath(self._database)
+
+    def has_publisher(self) -> bool:
+        """Check if another process publishes the snapshots, so it is worth waiting for them.
+        Snapshot files are written by every process that reads the database, so there is no publisher.
+
+        :return: False
+        """
+
+        return False
+
+    def close(self):
+        """Release the resources of the cache, the snapshot files are kept for the next start
+
+        :return: None
+        """
+
+        pass
+
+    def _get_path(self, name, file_name) -> str:
+        """Get the path of a file of the snapshot of a table
+
+        :param name: table name
+        :param file_name: name of the file within the snapshot
+        :return: path of the file
+        """
+
+        return os.path.join(self._directory, f'{name}.{file_name}')
+
+    def load_table(self, name, columns, stamp) -> pd.DataFrame:
+        """Load the snapshot of a table if it is valid for the given database stamp and columns
+
+        :param name: table name
+        :param columns: expected columns of the table, including the table keys
+        :param stamp: current stamp of the database from get_database_stamp
+        :return: Dataframe without special index or None if there is no valid snapshot
+        """
+
+        try:
+            with open(self._get_path(name, 'json'), encoding='UTF-8') as file:
+                manifest = json.load(file)
+        except (OSError, ValueError):
+            return None  # no snapshot written yet or snapshot is corrupt
+
+        if manifest.get('version') != CACHE_VERSION or manifest.get('stamp') != stamp or \
+                manifest.get('columns') != list(columns) or len(stamp) == 0:
+            return None  # database was changed since the snapshot was written
+
+        try:
+            table_data = {}
+            for index, column in enumerate(manifest['columns']):
+                # the column files are memory-mapped, so only the pages that are needed are read
+                arrays = [np.load(self._get_path(name, f'{index}.npy'), mmap_mode='r', allow_pickle=False)]
+                if manifest['text'][index]:
+                    arrays += [np.load(self._get_path(name, f'{index}.{part}.npy'), allow_pickle=False)
+                               for part in ('offsets', 'null')]
+                table_data[column] = _decode_column(*arrays)
+        except (OSError, ValueError, KeyError, IndexError):
+            return None
+
+        return pd.DataFrame(table_data, columns=manifest['columns'])
+
+    def save_table(self, name, table_data, stamp) -> bool:
+        """Write the snapshot of a table. Only tables with numeric columns and text columns can be stored.
+
+        :param name: table name
+        :param table_data: Dataframe without special index, as returned by load_table
+        :param stamp: stamp of the database the data corresponds to
+        :return: True if the snapshot was written
+        """
+
+        columns = _encode_columns(table_data)
+        if len(stamp) == 0 or columns is None:
+            return False
+
+        try:
+            os.makedirs(self._directory, exist_ok=True)
+            manifest_path = self._get_path(name, 'json')
+            if os.path.exists(manifest_path):
+                os.remove(manifest_path)  # the old snapshot is invalid while the columns are written
+            for index, arrays in enumerate(columns):
+                np.save(self._get_path(name, f'{index}.npy'), arrays[0], allow_pickle=False)
+                if len(arrays) > 1:
+                    np.save(self._get_path(name, f'{index}.offsets.npy'), arrays[1], allow_pickle=False)
+                    np.save(self._get_path(name, f'{index}.null.npy'), arrays[2], allow_pickle=False)
+
+            # the manifest is written last, so the snapshot only gets valid if all columns were written
+            manifest = {'version': CACHE_VERSION, 'stamp': stamp, 'columns': list(table_data.columns),
+                        'text': [len(arrays) > 1 for arrays in columns]}
+            with open(manifest_path + '.tmp', 'w', encoding='UTF-8') as file:
+                json.dump(manifest, file)
+            os.replace(manifest_path + '.tmp', manifest_path)
+        except OSError:
+            return False  # the cache is optional, so the application works without it
+        return True
+
+
+class SharedMemoryCache(SnapshotCache):
+    """Snapshots of the tables in shared memory, so several viewer processes can read the tables of one database
+    without parsing it. Only the loader process publishes the tables, the viewers attach to them.
+    The names of the shared memory blocks are listed in a manifest next to the database.
+    """
+
+    _manifest_path: str
+    _publish: bool
+    _blocks: dict[str, list]
+    _lock: threading.Lock
+
+    def __init__(self, database, publish=False):
+        """Create the cache for the given database
+
+        :param database: path to the database file
+        :param publish: True for the loader process that writes the snapshots, False for viewers that only read them
+        """
+
+        super().__init__(database)
+        self._manifest_path = database + SHARED_SUFFIX
+        self._publish = publish
+        self._blocks = {}  # shared memory blocks of the published tables, kept open by the loader process
+        self._lock = threading.Lock()  # tables may be published concurrently
+
+    def _read_manifest(self) -> dict:
+        """Read the manifest of the published tables
+
+        :return: dictionary of the published tables or an empty dictionary if nothing was published
+        """
+
+        try:
+            with open(self._manifest_path, encoding='UTF-8') as file:
+                manifest = json.load(file)
+        except (OSError, ValueError):
+            return {}
+        return manifest.get('tables', {}) if manifest.get('version') == CACHE_VERSION else {}
+
+    def is_published(self, stamp) -> bool:
+        """Check if the loader process has published all tables for the given database stamp.
+        The loader process itself does not need to wait, it publishes the tables when it reads them.
+
+        :param stamp: stamp of the database from get_database_stamp
+        :return: True if all published tables belong to the given stamp
+        """
+
+        if self._publish:
+            return True
+        tables = self._read_manifest()
+        return len(tables) > 0 and all(table['stamp'] == stamp for table in tables.values())
+
+    def has_publisher(self) -> bool:
+        """Check if a loader process publishes the tables, so viewers can wait for the tables of a changed database.
+        The blocks of a loader process are removed when it exits, even if it could not remove its manifest.
+
+        :return: True if this is the loader process or the published blocks still exist
+        """
+
+        if self._publish:
+            return True
+        entries = [entry for table in self._read_manifest().values() for column_blocks in table['blocks']
+                   for entry in column_blocks]
+        if len(entries) == 0:
+            return False
+        try:
+            block = _attach_block(entries[0][0])
+        except OSError:
+            return False  # the loader process has exited
+        block.close()
+        return True
+
+    def is_compatible(self, other) -> bool:
+        """Check if another cache reads and writes the same snapshots as this cache
+
+        :param other: other cache
+        :return: True if both caches belong to the same database and both publish the tables or both only read them
+        """
+
+        return super().is_compatible(other) and other._publish == self._publish
+
+    def load_table(self, name, columns, stamp) -> pd.DataFrame:
+        """Load a published table from shared memory if it is valid for the given database stamp and columns.
+        Numeric columns are read-only views on the shared memory, so all viewers use the same memory for them.
+        Only text columns are decoded into arrays of this process.
+
+        :param name: table name
+        :param columns: expected columns of the table, including the table keys
+        :param stamp: current stamp of the database from get_database_stamp
+        :return: Dataframe without special index or None if the table was not published for this stamp
+        """
+
+        table = self._read_manifest().get(name)
+        if table is None or table['stamp'] != stamp or table['columns'] != list(columns) or len(stamp) == 0:
+            return None
+
+        try:
+            table_data = {}
+            for column, column_blocks in zip(table['columns'], table['blocks']):
+                arrays = [_attach_array(*entry) for entry in column_blocks]
+                table_data[column] = arrays[0] if len(arrays) == 1 else _decode_column(*arrays)
+        except (OSError, ValueError, TypeError):
+            return None  # the loader process has replaced or removed the table in the meantime
+
+        return pd.DataFrame(table_data, columns=table['columns'], copy=False)
+
+    def save_table(self, name, table_data, stamp) -> bool:
+        """Publish a table in shared memory. Only the loader process publishes, for viewers nothing is written.
+        The blocks of the previous version of the table are removed, the memory is freed when all viewers closed them.
+
+        :param name: table name
+        :param table_data: Dataframe without special index, as returned by load_table
+        :param stamp: stamp of the database the data corresponds to
+        :return: True if the table was published
+        """
+
+        columns = _encode_columns(table_data)
+        if not self._publish or len(stamp) == 0 or columns is None:
+            return False
+
+        blocks = []
+        entries = []  # name, dtype and length of the block of every array per column
+        for arrays in columns:
+            entries.append([])
+            for array in arrays:
+                block = shared_memory.SharedMemory(name=f'sportapp_{secrets.token_hex(8)}', create=True,
+                                                   size=max(array.nbytes, 1))
+                np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+                _published_blocks.add(block.name)
+                blocks.append(block)
+                entries[-1].append([block.name, array.dtype.str, len(array)])
+
+        with self._lock:
+            tables = self._read_manifest()
+            tables[name] = {'stamp': stamp, 'columns': list(table_data.columns), 'blocks': entries}
+            try:
+                self._write_manifest(tables)
+            except OSError:
+                for block in blocks:  # the table was not published, so the new blocks are not needed
+                    _unlink_block(block)
+                return False
+            self._release_blocks(name)
+            self._blocks[name] = blocks
+        return True
+
+    def _write_manifest(self, tables):
+        """Write the manifest of the published tables, so it is replaced at once for the viewers
+
+        :param tables: dictionary of the published tables
+        :return: None
+        """
+
+        with open(self._manifest_path + '.tmp', 'w', encoding='UTF-8') as file:
+            json.dump({'version': CACHE_VERSION, 'tables': tables}, file)
+        os.replace(self._manifest_path + '.tmp', self._manifest_path)
+
+    def _release_blocks(self, name):
+        """Close and remove the shared memory blocks of a published table
+
+        :param name: table name
+        :return: None
+        """
+
+        for block in self._blocks.pop(name, []):
+            _unlink_block(block)
+
+    def close(self):
+        """Remove all published tables of the loader process, so the viewers read the database themselves again
+
+        :return: None
+        """
+
+        if not self._publish:
+            return
+        with self._lock:
+            if os.path.exists(self._manifest_path):
+                os.remove(self._manifest_path)
+            for name in list(self._blocks.keys()):
+                self._release_blocks(name)
+
+
+def get_database_stamp(database) -> list:
+    """Get the stamp of the current state of a database file.
+    It consists of the modification time, the size and the file change counter of SQLite,
+    which is increased with every committed transaction.
+
+    :param database: path to the database file
+    :return: stamp as list, so it can be compared with the stamp stored as JSON
+    """
+
+    try:
+        stat = os.stat(database)
+        with open(database, 'rb') as file:
+            file.seek(_HEADER_CHANGE_COUNTER)
+            change_counter = int.from_bytes(file.read(4), byteorder='big')
+    except OSError:
+        return []  # database does not exist, so no snapshot can be valid
+    return [stat.st_mtime_ns, stat.st_size, change_counter]
+
+
+def _encode_columns(table_data) -> list:
+    """Convert the columns of a table into numpy arrays that can be stored without pickle.
+    Text is stored as UTF-8 buffer of all values with the offsets of the values and a mask of the missing values,
+    so a single long text does not widen the other values of the column.
+
+    :param table_data: Dataframe without special index
+    :return: list of arrays per column, (values,) for numeric columns and (buffer, offsets, nulls) for text columns;
+        None if a column is not supported
+    """
+
+    columns = []
+    for column in table_data.columns:
+        values = table_data[column]
+        if values.dtype == object:
+            if pd.api.types.infer_dtype(values, skipna=True) not in ('string', 'empty'):
+                return None  # mixed values cannot be stored without pickle
+            nulls = values.isna().to_numpy()
+            texts = values.where(~nulls, '').to_list()
+            # the offsets count characters, so the values can be sliced out of the decoded buffer
+            offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+            np.cumsum([len(text) for text in texts], out=offsets[1:])
+            buffer = np.frombuffer(''.join(texts).encode('UTF-8', 'surrogatepass'), dtype=np.uint8)
+            columns.append((buffer, offsets, nulls))
+        elif isinstance(values.dtype, np.dtype):
+            columns.append((values.to_numpy(),))
+        else:
+            return None  # extension types of pandas are not supported
+    return columns
+
+
+def _decode_column(values, offsets=None, nulls=None) -> np.ndarray:
+    """Convert a stored column back into the array of the Dataframe
+
+    :param values: stored values or UTF-8 buffer of a text column, may be memory-mapped or in shared memory
+    :param offsets: offsets of the values in the decoded buffer of text columns, None for numeric columns
+    :param nulls: mask of the missing values of text columns, None for numeric columns
+    :return: new array, text columns get python strings like pd.read_sql returns them
+    """
+
+    if offsets is None:
+        return np.array(values)  # copy, as the Dataframe will be changed
+    text = values.tobytes().decode('UTF-8', 'surrogatepass')
+    bounds = offsets.tolist()
+    decoded = np.empty(len(nulls), dtype=object)
+    decoded[:] = [text[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+    decoded[nulls] = None
+    return decoded
+
+
+def _attach_block(name) -> shared_memory.SharedMemory:
+    """Attach a shared memory block of the loader process
+
+    :param name: name of the shared memory block
+    :return: shared memory block
+    """
+
+    block = shared_memory.SharedMemory(name=name)
+    if name not in _published_blocks:
+        # the block belongs to the loader process, so it must not be removed when this process exits
+        resource_tracker.unregister(block._name, 'shared_memory')
+    return block
+
+
+def _attach_array(name, dtype, length) -> np.ndarray:
+    """Attach an array in a shared memory block of the loader process without copying it.
+    The block stays attached as long as the array or any view on it is used.
+
+    :param name: name of the shared memory block
+    :param dtype: dtype of the array as string
+    :param length: number of elements
+    :return: read-only array in the shared memory block
+    """
+
+    block = _attach_block(name)
+    try:
+        array = np.frombuffer(block.buf, dtype=np.dtype(dtype), count=length)
+    except (ValueError, TypeError):
+        block.close()
+        raise
+    array.setflags(write=False)
+    # the base of the array is the buffer that all views on the array keep alive, so it is released after them
+    weakref.finalize(array.base, block.close).atexit = False
+    return array
+
+
+def _unlink_block(block):
+    """Close and remove a shared memory block created by this process
+
+    :param block: shared memory block
+    :return: None
+    """
+
+    block.close()
+    block.unlink()
+    _published_blocks.discard(block.name)
@@ -1,14 +1,58 @@
 # from PyQt5.QtGui import *
 from PyQt5.QtCore import *
+from PyQt5.QtGui import QKeySequence
 from PyQt5.QtWidgets import *
 from PyQt5 import uic
 from PyQt5.QtPrintSupport import QPrinter  # QPrintDialog, QPrintPreviewDialog
 from PyQt5.QtWebEngineWidgets import QWebEngineView
 import xml.etree.ElementTree as ElTr
+import numpy as np
 import error
 import sys
 import os
 
+LANGUAGES = ['de', 'en']  # languages with a dictionary file in the view folder
+LANGUAGE_DEFAULT = 'de'
+WIDTH_SAMPLE_ROWS = 200  # number of rows that are measured to estimate the column widths of tables and trees
+MAX_COLUMN_WIDTH = 400  # maximum estimated column width in pixels, longer texts are elided
+CELL_PADDING = 16  # space in pixels around the text of a cell or header section
+DURATION_COLUMNS = ('DURATION',)  # columns with durations in seconds, they are displayed as time
+TREE_TOTAL_COLUMN = 6  # column of the tree widgets that shows the total durations
+TOTAL_HEADER = 'TOTAL_DURATION'  # header of the total column, translated by the dictionary
+
+
+class _Worker(QObject):
+    """Worker object to execute a task in a background thread.
+    The task is called with a progress function and reports its state via signals.
+    """
+
+    progress = pyqtSignal(int, int, str)
+    failed = pyqtSignal(str)
+    finished = pyqtSignal()
+
+    def __init__(self, task):
+        """Initialize the worker with the task to be executed.
+
+        :param task: function that takes a progress function (done, total, name) as only parameter
+        """
+
+        super(_Worker, self).__init__()
+        self._task = task
+
+    def run(self):
+        """Execute the task and emit the finished signal afterward, even if the task failed.
+
+        :return: None
+        """
+
+        try:
+            self._task(self.progress.emit)
+        except Exception as e:
+            # errors cannot be shown in the background thread, so they are sent to the main thread
+            self.failed.emit(str(e))
+        finally:
+            self.finished.emit()
+
 
 class _MainWindow(QMainWindow):
     """Main window to manage all widgets and how to swap them out
@@ -20,6 +64,8 @@ class _MainWindow(QMainWindow):
     current_widget: QWidget
     main_display: bool
     detail_widgets: dict[str, QWidget]
+    widget_names: dict[QWidget, str]
+    progress_bar: QProgressBar
 
     def __init__(self, widgets, path, *args, **kwargs):
         """Initialize the main window with the main widgets.
@@ -32,21 +78,27 @@ class _MainWindow(QMainWindow):
         """
 
         super(_MainWindow, self).__init__(*args, **kwargs)
-        uic.loadUi(os.path.join(path, 'view\\main.ui'), self)  # load main layout
+        uic.loadUi(os.path.join(path, 'view/main.ui'), self)  # load main layout
         self.setWindowTitle('sportApp - main')  # set the main window title
 
         self.main_layout = self.horizontalLayout_main_widget
-        self.main_left = uic.loadUi(os.path.join(path, 'view\\main_left_2.ui'))  # load left main widget
-        self.main_right = uic.loadUi(os.path.join(path, 'view\\main_right.ui'))  # load right main widget
+        self.main_left = uic.loadUi(os.path.join(path, 'view/main_left_2.ui'))  # load left main widget
+        self.main_right = uic.loadUi(os.path.join(path, 'view/main_right.ui'))  # load right main widget
         self.main_layout.addWidget(self.main_left)  # add left main widget to the layout
         self.main_layout.addWidget(self.main_right)  # add right main widget to the layout
         self.main_display = True  # main display is active
 
+        # progress bar in the status bar to show the state of background tasks
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setMaximumWidth(200)
+        self.statusbar.addPermanentWidget(self.progress_bar)
+        self.progress_bar.hide()
+
         self.detail_widgets = {}  # create dict for the detail widgets
         for name in widgets:  # iterate through the given widget names
             try:
                 # load the widget into the dict and hide it
-                self.detail_widgets[name] = uic.loadUi(os.path.join(path, 'view/' + name + '_widget.ui'))
+                self.detail_widgets[name] = uic.loadUi(os.path.join(path, 'view/' + name.lower() + '_widget.ui'))
                 self.detail_widgets[name].hide()
             except FileNotFoundError:
                 # file could not be found, so widget cannot be loaded
@@ -55,6 +107,8 @@ class _MainWindow(QMainWindow):
             # set the icon for all buttons of the detail widgets
             for button in self.detail_widgets[name].findChildren(QPushButton):
                 self.__set_button_icon(button)
+        # names of the detail widgets, so the name of the current widget does not need to be searched
+        self.widget_names = {widget: name for name, widget in self.detail_widgets.items()}
 
         # set the icon for all buttons on the main widget
         for button in self.findChildren(QPushButton):
@@ -134,11 +188,7 @@ class _MainWindow(QMainWindow):
         :return: name of the currently stored widget
         """
 
-        # iterate through all widgets to find the name of the currently displayed widget
-        for name, widget in self.detail_widgets.items():
-            if widget == self.current_widget:
-                return name
-        return ''  # empty String
+        return self.widget_names.get(self.current_widget, '')  # empty String if it is no detail widget
 
 
 class MainApplication(QApplication):
@@ -149,6 +199,18 @@ class MainApplication(QApplication):
     _main_window: _MainWindow
     _gui_def: dict[str, list]
     _translation: dict
+    _translation_reverse: dict
+    _translations: dict[str, tuple]
+    _language: str
+    _header_cache: dict[tuple, list]
+    _thread: QThread
+    _worker: _Worker
+    _on_finished: callable
+    _main_tree_items: dict[tuple, list]
+    _debug_widgets: dict[str, QTableWidget]
+    _row_ids: dict[QTableWidget, np.ndarray]
+    _field_registry: dict[str, dict[str, tuple]]
+    _enabled_before_busy: dict[QWidget, bool]
 
     def __init__(self, tables, gui_def, path, *args, **kwargs):
         """Initialize the MainApplication and set the main window
@@ -164,8 +226,73 @@ class MainApplication(QApplication):
         self._main_window = _MainWindow(tables, path)  # create the main window
         self._main_window.show()  # show the main window and all its content
         self._gui_def = _read_gui_definition(gui_def)  # read the GUI definition from the xml file
-        self._translation = _read_translations(os.path.join(path, 'view/dictionary_de.txt'))
+        # read the translations of all languages once, so the language can be switched without reading them again
+        self._translations = {}
+        for language in LANGUAGES:
+            self._translations[language] = _read_translations(os.path.join(path, f'view/dictionary_{language}.txt'))
+        self._language = LANGUAGE_DEFAULT
+        self._translation, self._translation_reverse = self._translations[self._language]
+        self._header_cache = {}  # translated header labels by column names
         self.setStyle('Fusion')  # different style for better readability
+        self._thread = None  # no background task is running
+        self._main_tree_items = {}  # items of the main tree widget by table name and ID
+        self._debug_widgets = {}  # windows for debug tables, created when needed
+        self._row_ids = {}  # IDs of the rows of the table widgets in the order of the rows, None after sorting
+        self._field_registry = self.__build_field_registry()
+        self._enabled_before_busy = {}  # enabled state of the widgets that are disabled while a task is running
+
+    def __build_field_registry(self) -> dict[str, dict[str, tuple]]:
+        """Build the registry of the fields of all detail widgets out of the GUI definition,
+        so the fields do not need to be searched in the widget tree every time they are read or set.
+
+        :return: dictionary of (field, getter, setter) by field name and widget name
+        """
+
+        registry = {}
+        for widget_name, (ui_file, fields, tables) in self._gui_def.items():
+            widget = self._main_window.detail_widgets.get(widget_name)
+            if widget is not None:
+                registry[widget_name] = {field_name: self.__get_accessors(widget.findChild(QObject, field_name))
+                                         for field_name in fields.values()}
+                for field, getter, setter in registry[widget_name].values():
+                    if setter is not None:
+                        setter('')  # the fields start empty, as after saving or cancelling, e.g. dates with today
+        return registry
+
+    def __get_accessors(self, field) -> tuple:
+        """Get the functions to read and set the value of a field.
+        A table widget as field is used to choose one entry of another table, its value is the ID of the chosen row.
+
+        :param field: field of a widget
+        :return: tuple of field, getter and setter, getter and setter are None if the field type is unknown
+        """
+
+        if not isinstance(field, QTableWidget):
+            return _get_field_accessors(field)
+
+        def get_id():
+            ids = self._get_row_ids(field)[self._get_selection_mask(field)] if field in self._row_ids else []
+            return int(ids[0]) if len(ids) > 0 else ''
+
+        def set_id(field_data):
+            found = field in self._row_ids and field_data != ''
+            rows = np.flatnonzero(self._get_row_ids(field) == field_data) if found else []
+            self._set_table_widget_selection(field, rows[:1])
+
+        return field, get_id, set_id
+
+    def _get_field(self, field_name) -> tuple:
+        """Get a field of the current widget with the functions to read and set its value
+
+        :param field_name: name of the field in the current widget
+        :return: tuple of field, getter and setter, getter and setter are None if the field type is unknown
+        """
+
+        fields = self._field_registry.setdefault(self.get_current_widget_name(), {})
+        if field_name not in fields:
+            # fields that are not in the GUI definition are searched once
+            fields[field_name] = self.__get_accessors(self.get_current_widget().findChild(QObject, field_name))
+        return fields[field_name]
 
     def _set_field_editable(self, field_name, editable):
         """Set a given field to be editable or not
@@ -175,9 +302,13 @@ class MainApplication(QApplication):
         :return: None
         """
 
-        # find the field with the given name in the current widget and set it editable
-        field = self.get_current_widget().findChild(QObject, field_name)
-        field.setReadOnly(not editable)
+        # get the field with the given name in the current widget and set it editable
+        field, getter, setter = self._get_field(field_name)
+        if isinstance(field, QTableWidget):
+            # a table field cannot be read-only, so the entries cannot be chosen instead
+            field.setSelectionMode(QAbstractItemView.SingleSelection if editable else QAbstractItemView.NoSelection)
+        else:
+            field.setReadOnly(not editable)
 
     def connect_table_click(self, action):
         """Connect the double click on a table to the corresponding method
@@ -291,6 +422,46 @@ class MainApplication(QApplication):
             if 'search' in button_clicked:
                 button.clicked.connect(self._make_widget_action(action, button_clicked))
 
+    def connect_timer(self, interval, action):
+        """Connect a timer that calls the corresponding method periodically in the main thread
+
+        :param interval: interval of the calls in milliseconds
+        :param action: method to be called
+        :return: None
+        """
+
+        timer = QTimer(self._main_window)  # the timer is kept alive by the main window
+        timer.timeout.connect(action)
+        timer.start(interval)
+
+    def set_read_only(self):
+        """Hide all buttons that change data, so the data can only be displayed, searched and exported
+
+        :return: None
+        """
+
+        for button in self.get_main_left().findChildren(QPushButton):
+            if 'create' in button.objectName():
+                button.hide()
+        self._main_window.pushButton_save_db.hide()
+        self._main_window.pushButton_revert_db.hide()
+        for widget in self._main_window.detail_widgets.values():
+            for name in ['pushButton_save', 'pushButton_delete', 'pushButton_edit']:
+                if hasattr(widget, name):
+                    getattr(widget, name).hide()
+        self._main_window.statusbar.addPermanentWidget(QLabel('Nur Lesen'))
+
+    def connect_shortcut(self, key, action):
+        """Connect a keyboard shortcut of the main window to the corresponding method
+
+        :param key: key sequence of the shortcut, e.g. 'F12'
+        :param action: method to be connected to the shortcut
+        :return: None
+        """
+
+        shortcut = QShortcut(QKeySequence(key), self._main_window)
+        shortcut.activated.connect(action)
+
     def connect_commit(self, action):
         """Connect the commit button of the main widget to the corresponding method
 
@@ -367,6 +538,18 @@ class MainApplication(QApplication):
             # enable the delete button of the current widget
             self.get_current_widget().pushButton_delete.setEnabled(enabled)
 
+    def set_used_in(self, used_in):
+        """Show the entries that use the entry of the current widget in its 'used in' panel
+
+        :param used_in: dictionary of the lists of names of the using entries by table name
+        :return: None
+        """
+
+        label = getattr(self.get_current_widget(), 'label_used_in', None)
+        if label is not None:  # not every widget has the panel
+            label.setText('\n'.join(f'{self.translate_text(table_name)}: {", ".join(names)}'
+                                     for table_name, names in used_in.items()))
+
     def _enable_global_buttons(self, enabled):
         """Enable or disable the global buttons
 
@@ -442,21 +625,26 @@ class MainApplication(QApplication):
         return self._main_window.main_display
 
     @staticmethod
-    def _get_selection_of_widget(table_widget) -> list:
+    def _get_selection_mask(table_widget) -> np.ndarray:
+        """Retrieve the selection of a given table widget as mask of its rows.
+        The selected ranges are set as slices, so the costs depend on the number of ranges, not of rows.
+
+        :param table_widget: QTableWidget object
+        :return: boolean array with one element per row, True if the row is selected
+        """
+
+        mask = np.zeros(table_widget.rowCount(), dtype=bool)
+        for selection in table_widget.selectionModel().selection():  # iterate the selected ranges
+            mask[selection.top():selection.bottom() + 1] = True
+        return mask
+
+    def _get_selection_of_widget(self, table_widget) -> list:
         """Retrieve the selected row indices of a given table widget.
 
         :return: list of row indices that are selected
         """
 
-        selected_rows = []
-        for selection in table_widget.selectedRanges():  # iterate the selection of the given table widget
-            if selection.topRow() == selection.bottomRow():  # check if only one row is selected
-                selected_rows.append(selection.topRow())  # append the single row
-            else:
-                # more than one row is selected, so append all rows in the selected range
-                for row in range(selection.topRow(), selection.bottomRow() + 1):
-                    selected_rows.append(row)
-        return selected_rows
+        return np.flatnonzero(self._get_selection_mask(table_widget)).tolist()
 
     def get_selected_rows_of_current_widget(self) -> dict:
         """Retrieve the selected row indices of the current table widget.
@@ -489,6 +677,78 @@ class MainApplication(QApplication):
             # no table widget with the given name could be found
             raise error.WidgetNotKnownError(f'Widget {table_widget_name} is not known in current widget!')
 
+    def _get_row_ids(self, table_widget) -> np.ndarray:
+        """Get the IDs of all rows of a table widget, as they were set with the table data.
+        The IDs are stored in the items of the first column, so they move with the rows when the table is sorted.
+        After sorting, they are read from the items once and kept until the table is sorted again.
+
+        :param table_widget: QTableWidget object
+        :return: array of the IDs in the order of the rows
+        """
+
+        if table_widget not in self._row_ids:
+            # the table has no ID column, so no ID can be retrieved for its rows
+            raise error.WidgetNotKnownError(f'Widget {table_widget.objectName()} has no IDs!')
+        if self._row_ids[table_widget] is None:
+            self._row_ids[table_widget] = np.array([table_widget.item(row, 0).data(Qt.UserRole)
+                                                    for row in range(table_widget.rowCount())], dtype=np.int64)
+        return self._row_ids[table_widget]
+
+    def _reset_row_ids(self, table_widget):
+        """Mark the IDs of the rows of a table widget to be read again, as the rows were moved by sorting
+
+        :param table_widget: QTableWidget object
+        :return: None
+        """
+
+        if table_widget in self._row_ids:
+            self._row_ids[table_widget] = None
+
+    def get_selected_ids_of_current_widget(self) -> dict:
+        """Retrieve the IDs of the selected rows of all table widgets in the current widget.
+
+        :return: dict of the arrays of selected IDs by table widget name
+        """
+
+        tables = {}
+        for table_widget in self.get_current_widget().findChildren(QTableWidget):  # iterate through all table widgets
+            if table_widget in self._row_ids:
+                tables[table_widget.objectName()] = self._get_row_ids(table_widget)[
+                    self._get_selection_mask(table_widget)]
+        return tables
+
+    def get_selected_ids_of_widget(self, table_widget_name) -> np.ndarray:
+        """Retrieve the IDs of the selected rows of the given table widget.
+
+        :param table_widget_name: name of the table widget
+        :return: array of the selected IDs
+        """
+
+        # find the table widget in the main window with the given name
+        table_widget = self._main_window.findChild(QTableWidget, table_widget_name)
+
+        if table_widget is not None:  # check if a table widget was found
+            return self._get_row_ids(table_widget)[self._get_selection_mask(table_widget)]
+        else:
+            # no table widget with the given name could be found
+            raise error.WidgetNotKnownError(f'Widget {table_widget_name} is not known in current widget!')
+
+    def get_unselected_ids_of_widget(self, table_widget_name) -> np.ndarray:
+        """Retrieve the IDs of the unselected rows of the given table widget in the current widget.
+
+        :param table_widget_name: name of the table widget
+        :return: array of the unselected IDs
+        """
+
+        # find the table widget in the current widget with the given name
+        table_widget = self.get_current_widget().findChild(QTableWidget, table_widget_name)
+
+        if table_widget is not None:  # check if a table widget was found
+            return self._get_row_ids(table_widget)[~self._get_selection_mask(table_widget)]
+        else:
+            # no table widget with the given name could be found
+            raise error.WidgetNotKnownError(f'Widget {table_widget_name} is not known in current widget!')
+
     def get_unselected_rows_of_widget(self, table_widget_name) -> list:
         """Retrieve the unselected row indices of the given table widget in the current widget.
 
@@ -500,12 +760,8 @@ class MainApplication(QApplication):
         table_widget = self.get_current_widget().findChild(QTableWidget, table_widget_name)
 
         if table_widget is not None:  # check if a table widget was found
-            unselected_rows = []
-            rows = self._get_selection_of_widget(table_widget)  # retrieve the selected rows
-            for row in range(0, table_widget.rowCount()):  # iterate through all rows
-                if row not in rows:  # check if the current row is selected
-                    unselected_rows.append(row)  # append if the row is not selected
-            return unselected_rows
+            # all rows that are not set in the mask of the selected rows
+            return np.flatnonzero(~self._get_selection_mask(table_widget)).tolist()
         else:
             # no table widget with the given name could be found
             raise error.WidgetNotKnownError(f'Widget {table_widget_name} is not known in current widget!')
@@ -523,6 +779,80 @@ class MainApplication(QApplication):
             self._set_table_widget(table_widget, table_data[table], 2)
             self._set_table_widget_selection(table_widget, [])
 
+    def insert_main_table_row(self, table, row_data):
+        """Append a single row to the table of the main widget
+
+        :param table: name of the table
+        :param row_data: Series element of the row to be inserted
+        :return: None
+        """
+
+        table_widget = self.get_main_left().findChild(QTableWidget, 'tableMain_' + table.lower())
+        row = table_widget.rowCount()
+        table_widget.insertRow(row)
+        self._set_table_widget_row(table_widget, row, row_data)
+        if self._row_ids[table_widget] is not None:
+            self._row_ids[table_widget] = np.append(self._row_ids[table_widget], row_data['ID'])
+
+    def update_main_table_row(self, table, row_data):
+        """Update a single row in the table of the main widget, the row is found by the ID of the given data
+
+        :param table: name of the table
+        :param row_data: Series element of the row to be updated
+        :return: None
+        """
+
+        table_widget = self.get_main_left().findChild(QTableWidget, 'tableMain_' + table.lower())
+        row = self._find_table_widget_row(table_widget, row_data['ID'])
+        if row >= 0:
+            self._set_table_widget_row(table_widget, row, row_data)
+
+    def remove_main_table_row(self, table, entry_id):
+        """Remove a single row from the table of the main widget
+
+        :param table: name of the table
+        :param entry_id: ID of the row to be removed
+        :return: None
+        """
+
+        table_widget = self.get_main_left().findChild(QTableWidget, 'tableMain_' + table.lower())
+        row = self._find_table_widget_row(table_widget, entry_id)
+        if row >= 0:
+            table_widget.removeRow(row)
+            if self._row_ids[table_widget] is not None:
+                self._row_ids[table_widget] = np.delete(self._row_ids[table_widget], row)
+
+    @staticmethod
+    def _set_table_widget_row(table_widget, row, row_data):
+        """Set the items of a single row of the table widget to the given data
+
+        :param table_widget: QTableWidget object
+        :param row: index of the row
+        :param row_data: Series element or record of the entry, only the displayed columns are set
+        :return: None
+        """
+
+        # a sorted table would move the row as soon as its first item is set, so it is sorted afterwards
+        sorting = table_widget.isSortingEnabled()
+        table_widget.setSortingEnabled(False)
+        for col_index, text in enumerate(_get_display_texts(row_data)[:table_widget.columnCount()]):
+            item = QTableWidgetItem(text)
+            if col_index == 0:
+                item.setData(Qt.UserRole, int(row_data['ID']))
+            table_widget.setItem(row, col_index, item)
+        table_widget.setSortingEnabled(sorting)
+
+    def _find_table_widget_row(self, table_widget, entry_id) -> int:
+        """Find the row of a table widget with the given ID
+
+        :param table_widget: QTableWidget object
+        :param entry_id: ID to be searched for
+        :return: index of the row, -1 if no row was found
+        """
+
+        rows = np.flatnonzero(self._get_row_ids(table_widget) == entry_id)
+        return int(rows[0]) if len(rows) > 0 else -1
+
     def ask_user_confirmation(self, title, message):
         """Ask the user for confirmation of a message
 
@@ -539,6 +869,22 @@ class MainApplication(QApplication):
         else:
             return False
 
+    def show_debug_table(self, title, table_data):
+        """Show the given data as a table in a separate window. Every title has its own window that is reused.
+
+        :param title: title of the window
+        :param table_data: data to be displayed as Dataframe
+        :return: None
+        """
+
+        if title not in self._debug_widgets:
+            self._debug_widgets[title] = QTableWidget()
+            self._debug_widgets[title].setWindowTitle(f'sportApp - {title}')
+            self._debug_widgets[title].resize(800, 400)
+        self._set_table_widget(self._debug_widgets[title], table_data)
+        self._debug_widgets[title].show()
+        self._debug_widgets[title].raise_()
+
     def send_critical_message(self, message):
         """Send a critical message to the user and block the current widget until the message is confirmed
 
@@ -565,6 +911,9 @@ class MainApplication(QApplication):
         :return: None
         """
 
+        # a sorted table would move the rows while their items are set, so it is sorted after all rows are set
+        sorting = table_widget.isSortingEnabled()
+        table_widget.setSortingEnabled(False)
         # set the main settings of the table widget corresponding to the given data
         table_widget.setRowCount(len(table_data.index))
         if max_columns == 0:
@@ -572,37 +921,70 @@ class MainApplication(QApplication):
         else:
             table_widget.setColumnCount(max_columns)
 
-        header_list = []
-        for header_text in table_data.columns.to_list():
-            header_list.append(self.translate_text(header_text))
-        table_widget.setHorizontalHeaderLabels(header_list)
+        table_widget.setHorizontalHeaderLabels(self._translate_headers(table_data.columns))
 
         index = 0
+        has_ids = 'ID' in table_data.columns
         for key, row in table_data.iterrows():  # iterate through the given data
             col_index = 0
             for column in table_data.columns:  # iterate through the columns
                 if max_columns == 0 or col_index < max_columns:
                     # create a widget item and set it to the corresponding row/column
-                    table_widget.setItem(index, col_index, QTableWidgetItem(str(row[column])))
+                    item = QTableWidgetItem(_format_value(column, row[column]))
+                    if col_index == 0 and has_ids:
+                        item.setData(Qt.UserRole, int(row['ID']))  # the ID moves with the row when it is sorted
+                    table_widget.setItem(index, col_index, item)
                     col_index += 1
             index += 1
-        table_widget.resizeColumnsToContents()
+
+        # the widths are estimated from a sample of rows that are spread over the whole table
+        sample = np.unique(np.linspace(0, len(table_data.index) - 1, num=min(len(table_data.index),
+                                                                             WIDTH_SAMPLE_ROWS)).astype(int))
+        sample_data = table_data.iloc[sample, :table_widget.columnCount()]
+        self._set_section_widths(table_widget, table_widget.horizontalHeader(),
+                                 [(0, [_format_value(column, value) for column, value in zip(sample_data.columns, row)])
+                                  for row in sample_data.itertuples(index=False)])
+
+        if has_ids:
+            if table_widget not in self._row_ids:
+                # the rows are moved when the table is sorted, so the IDs are read from the items again afterwards
+                table_widget.model().layoutChanged.connect(lambda *args: self._reset_row_ids(table_widget))
+            # the IDs are kept aligned with the rows, so they do not need to be read from the items again
+            self._row_ids[table_widget] = table_data['ID'].to_numpy()
+        else:
+            self._row_ids.pop(table_widget, None)
+        table_widget.setSortingEnabled(sorting)
 
     @staticmethod
     def _set_table_widget_selection(table_widget, table_rows):
-        """Set the contents of the table widget to the given table data
+        """Set the selection of the table widget to the given rows, all other rows are unselected.
+        Consecutive rows are coalesced into one range and the selection is replaced at once,
+        so the selection signals are not emitted for every single row.
 
         :param table_widget: QTableWidget object
         :param table_rows: selected rows of the table
         :return: None
         """
 
-        for row in range(0, table_widget.rowCount()):  # iterate through all rows of the table widget
-            selection = QTableWidgetSelectionRange(row, 0, row, table_widget.columnCount() - 1)
-            if row in table_rows:  # check if this row is selected
-                table_widget.setRangeSelected(selection, True)  # set this row selected
-            else:
-                table_widget.setRangeSelected(selection, False)  # set this row unselected
+        mask = np.zeros(table_widget.rowCount(), dtype=bool)
+        rows = np.asarray(table_rows, dtype=np.int64)
+        mask[rows[(rows >= 0) & (rows < len(mask))]] = True
+
+        # the ranges of consecutive selected rows start where the mask changes from False to True and vice versa
+        edges = np.flatnonzero(np.diff(np.concatenate([[False], mask, [False]]).astype(np.int8)))
+        model = table_widget.model()
+        selection = QItemSelection()
+        if table_widget.columnCount() > 0:
+            for top, bottom in zip(edges[0::2], edges[1::2] - 1):
+                selection.select(model.index(int(top), 0), model.index(int(bottom), table_widget.columnCount() - 1))
+
+        selection_model = table_widget.selectionModel()
+        selection_model.blockSignals(True)
+        try:
+            selection_model.select(selection, QItemSelectionModel.ClearAndSelect)
+        finally:
+            selection_model.blockSignals(False)
+        table_widget.viewport().update()  # the view was not notified, so it needs to be painted again
 
     def switch_main_widget(self, name=None):
         """Switch the main widget to a table specific one or back to the initial main widget
@@ -710,16 +1092,10 @@ class MainApplication(QApplication):
         :return: value of the field as string
         """
 
-        # find the field with the given name in the current widget
-        field = self.get_current_widget().findChild(QObject, field_name)
-
-        # get the field data corresponding to the field type
-        if isinstance(field, QLineEdit):
-            return field.text()
-        elif isinstance(field, QTextEdit):
-            return field.toPlainText()
-        elif isinstance(field, QTimeEdit):
-            return str(field.time().toPyTime())
+        # get the field data with the getter corresponding to the field type
+        field, getter, setter = self._get_field(field_name)
+        if getter is not None:
+            return getter()
         else:
             # field type is unknown, so no data can be retrieved
             self.send_critical_message('Fehler beim Lesen der Felder im aktuellen Widget!')
@@ -747,19 +1123,10 @@ class MainApplication(QApplication):
         :return: None
         """
 
-        # find the field with the given name in the current widget
-        field = self.get_current_widget().findChild(QObject, field_name)
-
-        # set the field data corresponding to the field type
-        if isinstance(field, QLineEdit):
-            field.setText(str(field_data))
-        elif isinstance(field, QTextEdit):
-            field.setPlainText(field_data)
-        elif isinstance(field, QTimeEdit):
-            if field_data == '':
-                field.setTime(QTime().fromString('00:00'))
-            else:
-                field.setTime(QTime().fromString(field_data))
+        # set the field data with the setter corresponding to the field type
+        field, getter, setter = self._get_field(field_name)
+        if setter is not None:
+            setter(field_data)
         else:
             # field type is unknown, so no data can be set
             self.send_critical_message('Fehler beim Setzen der Felder im aktuellen Widget!')
@@ -779,30 +1146,65 @@ class MainApplication(QApplication):
         tree_widget.setHeaderLabels(header_labels)
         tree_widget.clear()  # remove all items that are currently stored
         tree_widget.insertTopLevelItems(0, tree_items)
-        tree_widget.header().setSectionResizeMode(QHeaderView.ResizeToContents)  # activate auto-resize
         if expand_all:
             tree_widget.expandAll()  # auto-expand the tree
 
+        # the widths are estimated from the first items, including the children in the order they are displayed
+        sample = []
+        pending = [(item, 0) for item in reversed(tree_items)]
+        while len(pending) > 0 and len(sample) < WIDTH_SAMPLE_ROWS:
+            item, depth = pending.pop()
+            sample.append(((depth + 1) * tree_widget.indentation(),
+                           [item.text(column) for column in range(column_count)]))
+            if expand_all or item.isExpanded():
+                pending += [(item.child(index), depth + 1) for index in reversed(range(item.childCount()))]
+        MainApplication._set_section_widths(tree_widget, tree_widget.header(), sample)
+
     @staticmethod
-    def create_tree_item(name, item_data, child_items):
+    def _set_section_widths(widget, header: QHeaderView, sample):
+        """Set the widths of the header sections once from the texts of a sample of rows.
+        Unlike resizing to the contents, not every cell is measured, so the costs do not depend on the number of rows.
+        The sections can still be resized by the user.
+
+        :param widget: table or tree widget that displays the rows
+        :param header: header of the widget
+        :param sample: list of (indentation of the first column, list of texts per column) of the sampled rows
+        :return: None
+        """
+
+        font_metrics = widget.fontMetrics()
+        header_metrics = header.fontMetrics()
+        model = widget.model()
+        header.setSectionResizeMode(QHeaderView.Interactive)
+        for column in range(header.count()):
+            label = str(model.headerData(column, Qt.Horizontal) or '')
+            width = header_metrics.horizontalAdvance(label)
+            for indentation, texts in sample:
+                if column < len(texts):
+                    # multi-line texts are as wide as their longest line
+                    text_width = max(font_metrics.horizontalAdvance(line) for line in texts[column].split('\n'))
+                    width = max(width, text_width + (indentation if column == 0 else 0))
+            header.resizeSection(column, min(width + CELL_PADDING, MAX_COLUMN_WIDTH))
+
+    def create_tree_item(self, name, item_data, child_items, total=None):
         """Create and return a tree item with the given item data and the child items.
+        The table name is stored in the item, so the item can be found again when the data changes.
 
         :param name: name of the table for which a tree item should be created
-        :param item_data: data of the tree item to be displayed
+        :param item_data: Series element or record of the entry to be displayed
         :param child_items: items that are children of this item
+        :param total: optional total duration in seconds, shown in the total column
         :return: QTreeWidgetItem with the given data
         """
 
-        value_list = [name]  # name is the first value of the item
-        for value in item_data:  # iterate through the given data to append to the value list
-            if isinstance(value, str):
-                # if the value is already a str, it can be appended
-                value_list.append(value)
-            else:
-                # if the value is not a str, it must be converted to a str first
-                value_list.append(str(value))
+        value_list = [self.translate_text(name)]  # translated name is the first value of the item
+        value_list += _get_display_texts(item_data)
+        if total is not None:
+            value_list = value_list[:TREE_TOTAL_COLUMN] + [''] * (TREE_TOTAL_COLUMN - len(value_list))
+            value_list.append(format_duration(total))
 
         tree_item = QTreeWidgetItem(value_list)  # create the tree item
+        tree_item.setData(0, Qt.UserRole, name)  # store the untranslated table name
 
         # add all given children to the item
         for child in child_items:
@@ -819,10 +1221,10 @@ class MainApplication(QApplication):
         :return: None
         """
 
-        header_labels = ['Objekt']
-        for header_text in header:
-            header_labels.append(self.translate_text(header_text))
-        self._set_tree_structure(self.get_current_widget().treeWidget, tree_items, header_labels, 6, expand_all)
+        header_labels = (['Objekt'] + self._translate_headers(header) + [''] * TREE_TOTAL_COLUMN)[:TREE_TOTAL_COLUMN]
+        header_labels.append(self.translate_text(TOTAL_HEADER))
+        self._set_tree_structure(self.get_current_widget().treeWidget, tree_items, header_labels,
+                                 TREE_TOTAL_COLUMN + 1, expand_all)
 
     def get_current_tree_widget(self):
         """Retrieve the tree widget of the currently displayed widget
@@ -839,8 +1241,138 @@ class MainApplication(QApplication):
         :return: None
         """
 
-        header_labels = ['Objekt', 'ID', '', '', '', '']
-        self._set_tree_structure(self._main_window.main_right.treeWidget, tree_items, header_labels, 6, False)
+        header_labels = ['Objekt', 'ID', '', '', '', '', self.translate_text(TOTAL_HEADER)]
+        self._set_tree_structure(self._main_window.main_right.treeWidget, tree_items, header_labels,
+                                 TREE_TOTAL_COLUMN + 1, False)
+
+        # index all items by table name and ID, so they can be changed without rebuilding the tree
+        self._main_tree_items = {}
+        for tree_item in tree_items:
+            self._index_tree_item(tree_item)
+
+    @staticmethod
+    def _get_tree_item_key(tree_item) -> tuple:
+        """Get the key of a tree item that consists of the table name and the ID
+
+        :param tree_item: QTreeWidgetItem created by create_tree_item
+        :return: tuple of table name and ID as str
+        """
+
+        return tree_item.data(0, Qt.UserRole), tree_item.text(1)
+
+    def _index_tree_item(self, tree_item):
+        """Add a tree item and all its children to the index of the main tree widget
+
+        :param tree_item: QTreeWidgetItem to be indexed
+        :return: None
+        """
+
+        self._main_tree_items.setdefault(self._get_tree_item_key(tree_item), []).append(tree_item)
+        for index in range(tree_item.childCount()):
+            self._index_tree_item(tree_item.child(index))
+
+    def _unindex_tree_item(self, tree_item):
+        """Remove a tree item and all its children from the index of the main tree widget
+
+        :param tree_item: QTreeWidgetItem to be removed from the index
+        :return: None
+        """
+
+        indexed_items = self._main_tree_items.get(self._get_tree_item_key(tree_item), [])
+        if tree_item in indexed_items:
+            indexed_items.remove(tree_item)
+        for index in range(tree_item.childCount()):
+            self._unindex_tree_item(tree_item.child(index))
+
+    def insert_main_tree_item(self, tree_item):
+        """Insert a top level item into the main tree widget after the last item of the same table
+
+        :param tree_item: QTreeWidgetItem created by create_tree_item
+        :return: None
+        """
+
+        tree_widget = self._main_window.main_right.treeWidget
+        name = tree_item.data(0, Qt.UserRole)
+
+        # search the last top level item of the same table from the bottom
+        position = tree_widget.topLevelItemCount()
+        for index in range(tree_widget.topLevelItemCount() - 1, -1, -1):
+            if tree_widget.topLevelItem(index).data(0, Qt.UserRole) == name:
+                position = index + 1
+                break
+
+        tree_widget.insertTopLevelItem(position, tree_item)
+        self._index_tree_item(tree_item)
+
+    def update_main_tree_items(self, table, item_data):
+        """Update all items of the main tree widget that show the entry with the ID of the given data
+
+        :param table: name of the table
+        :param item_data: Series element of the entry, starting with the ID
+        :return: None
+        """
+
+        for tree_item in self._main_tree_items.get((table, str(item_data['ID'])), []):
+            for column, text in enumerate(_get_display_texts(item_data), start=1):
+                tree_item.setText(column, text)
+
+    def update_main_tree_totals(self, table, entry_id, total):
+        """Update the total duration of all items of the main tree widget that show the entry with the given ID
+
+        :param table: name of the table
+        :param entry_id: ID of the entry
+        :param total: total duration in seconds
+        :return: None
+        """
+
+        for tree_item in self._main_tree_items.get((table, str(entry_id)), []):
+            tree_item.setText(TREE_TOTAL_COLUMN, format_duration(total))
+
+    def remove_main_tree_items(self, table, entry_id):
+        """Remove all items of the main tree widget that show the entry with the given ID
+
+        :param table: name of the table
+        :param entry_id: ID of the entry
+        :return: None
+        """
+
+        tree_widget = self._main_window.main_right.treeWidget
+        for tree_item in list(self._main_tree_items.get((table, str(entry_id)), [])):
+            if tree_item.parent() is None:
+                tree_widget.takeTopLevelItem(tree_widget.indexOfTopLevelItem(tree_item))
+            else:
+                tree_item.parent().removeChild(tree_item)
+            self._unindex_tree_item(tree_item)
+
+    def add_main_tree_child(self, parent_table, parent_id, tree_item):
+        """Add a child item to all items of the main tree widget that show the given parent entry
+
+        :param parent_table: name of the table of the parent entry
+        :param parent_id: ID of the parent entry
+        :param tree_item: QTreeWidgetItem to be added, it is copied for every parent
+        :return: None
+        """
+
+        for parent_item in list(self._main_tree_items.get((parent_table, str(parent_id)), [])):
+            child_item = tree_item.clone()
+            parent_item.addChild(child_item)
+            self._index_tree_item(child_item)
+
+    def remove_main_tree_child(self, parent_table, parent_id, child_table, child_id):
+        """Remove a child item from all items of the main tree widget that show the given parent entry
+
+        :param parent_table: name of the table of the parent entry
+        :param parent_id: ID of the parent entry
+        :param child_table: name of the table of the child entry
+        :param child_id: ID of the child entry
+        :return: None
+        """
+
+        for parent_item in self._main_tree_items.get((parent_table, str(parent_id)), []):
+            for index in range(parent_item.childCount()):
+                if self._get_tree_item_key(parent_item.child(index)) == (child_table, str(child_id)):
+                    self._unindex_tree_item(parent_item.takeChild(index))
+                    break
 
     def set_html_view(self, html):
         """Create a new html view, set the given html and display it.
@@ -915,18 +1447,191 @@ class MainApplication(QApplication):
         :param input_text: text to be translated
         :return: translated text or input text if no translation was found
         """
-        if input_text in self._translation.keys():
-            return self._translation[input_text]
-        else:
-            return input_text
+
+        return self._translation.get(input_text, input_text)
 
     def translate_text_reverse(self, input_text) -> str:
-        reverse_translation = dict(zip(self._translation.values(),self._translation.keys()))
-        if input_text in reverse_translation.keys():
-            return reverse_translation[input_text]
+        """Translate a given translated text back to the original text according to the stored translations
+
+        :param input_text: translated text
+        :return: original text or input text if no translation was found
+        """
+
+        return self._translation_reverse.get(input_text, input_text)
+
+    def _translate_headers(self, header) -> list:
+        """Translate a list of column names into header labels.
+        The result is cached per list of column names, as the same tables are displayed again and again.
+
+        :param header: list of column names
+        :return: list of translated header labels
+        """
+
+        key = tuple(header)
+        if key not in self._header_cache:
+            self._header_cache[key] = [self.translate_text(header_text) for header_text in key]
+        return list(self._header_cache[key])
+
+    def get_language(self) -> str:
+        """Get the language of the translations
+
+        :return: language code, one of LANGUAGES
+        """
+
+        return self._language
+
+    def set_language(self, language):
+        """Switch the language of the translations at runtime.
+        The translations were read at startup, so only the dictionaries are swapped.
+        The texts that are already displayed in the main widgets and the current widget are translated again.
+
+        :param language: language code, one of LANGUAGES
+        :return: None
+        """
+
+        old_translation_reverse = self._translation_reverse
+        self._language = language
+        self._translation, self._translation_reverse = self._translations[language]
+        self._header_cache = {}
+
+        # translate the header labels of the main tables again
+        for table_widget in self.get_main_left().findChildren(QTableWidget):
+            for column in range(table_widget.columnCount()):
+                header_item = table_widget.horizontalHeaderItem(column)
+                if header_item is not None:
+                    header_text = old_translation_reverse.get(header_item.text(), header_item.text())
+                    header_item.setText(self.translate_text(header_text))
+
+        # translate the table names of the main tree items and the header of the total column again
+        for (name, entry_id), tree_items in self._main_tree_items.items():
+            for tree_item in tree_items:
+                tree_item.setText(0, self.translate_text(name))
+        header_item = self._main_window.main_right.treeWidget.headerItem()
+        header_item.setText(TREE_TOTAL_COLUMN, self.translate_text(TOTAL_HEADER))
+
+        # translate the table name of the current widget again, as it is needed to get the displayed table
+        if not self.get_main_display() and hasattr(self.get_current_widget(), 'label_table_name'):
+            label = self.get_current_widget().label_table_name
+            label.setText(self.translate_text(old_translation_reverse.get(label.text(), label.text())))
+
+    def run_in_background(self, message, task, on_finished=None) -> bool:
+        """Run a task in a background thread, so the application stays responsive.
+        While the task is running, a busy indicator is shown and the main widgets are disabled.
+        The on_finished function is called in the main thread after the task is done.
+
+        :param message: text to be displayed in the status bar while the task is running
+        :param task: function that takes a progress function (done, total, name) as only parameter
+        :param on_finished: optional function to be called without parameters when the task is done
+        :return: True if the task was started, False if another task is still running
+        """
+
+        if self._thread is not None:
+            # only one background task may run at a time
+            return False
+
+        self._on_finished = on_finished
+        self._set_busy(True, message)
+
+        # move the worker into a new thread and connect the signals to the main thread
+        self._thread = QThread()
+        self._worker = _Worker(task)
+        self._worker.moveToThread(self._thread)
+        self._thread.started.connect(self._worker.run)
+        self._worker.progress.connect(self._show_progress)
+        self._worker.failed.connect(self.send_critical_message)
+        self._worker.finished.connect(self._thread.quit)
+        self._thread.finished.connect(self._background_finished)
+        self._thread.start()
+
+        return True
+
+    def run_in_foreground(self, message, task):
+        """Run a task in the main thread while showing its progress, e.g. for loading the data at startup.
+        The events are processed after every reported progress, so the main window is still painted.
+
+        :param message: text to be displayed in the status bar while the task is running
+        :param task: function that takes a progress function (done, total, name) as only parameter
+        :return: return value of the task
+        """
+
+        def progress(done, total, name):
+            self._show_progress(done, total, name)
+            self.processEvents()
+
+        self._set_busy(True, message)
+        try:
+            return task(progress)
+        finally:
+            self._set_busy(False)
+
+    def is_busy(self) -> bool:
+        """Return whether a background task is running
+
+        :return: True if a background task is running
+        """
+
+        return self._thread is not None
+
+    def _background_finished(self):
+        """Clean up after the background task has finished and call the on_finished function.
+
+        :return: None
+        """
+
+        self._worker.deleteLater()
+        self._thread.deleteLater()
+        self._thread = None
+        self._set_busy(False)
+
+        if self._on_finished is not None:
+            self._on_finished()
+
+    def _set_busy(self, busy, message=''):
+        """Show or hide the busy indicator and disable or enable the main widgets accordingly
+
+        :param busy: True if a background task is running
+        :param message: text to be displayed in the status bar
+        :return: None
+        """
+
+        progress_bar = self._main_window.progress_bar
+        if busy:
+            progress_bar.setRange(0, 0)  # busy indicator until the first progress is reported
+            progress_bar.show()
+            self._main_window.statusbar.showMessage(message)
+            self.setOverrideCursor(Qt.BusyCursor)
+        else:
+            progress_bar.hide()
+            self._main_window.statusbar.clearMessage()
+            self.restoreOverrideCursor()
+
+        # no user input is allowed while the data is processed in the background
+        if busy:
+            widgets = [self._main_window.main_left, self._main_window.main_right,
+                       self._main_window.findChild(QPushButton, 'pushButton_save_db'),
+                       self._main_window.findChild(QPushButton, 'pushButton_revert_db')]
+            if len(self._enabled_before_busy) == 0:
+                # the previous state is kept, so widgets that were disabled before the task stay disabled
+                self._enabled_before_busy = {widget: widget.isEnabled() for widget in widgets}
+            for widget in widgets:
+                widget.setEnabled(False)
         else:
-            return input_text
+            for widget, enabled in self._enabled_before_busy.items():
+                widget.setEnabled(enabled)
+            self._enabled_before_busy = {}
 
+    def _show_progress(self, done, total, name):
+        """Show the progress of the background task in the status bar
+
+        :param done: number of processed items
+        :param total: number of all items
+        :param name: name of the last processed item
+        :return: None
+        """
+
+        self._main_window.progress_bar.setRange(0, total)
+        self._main_window.progress_bar.setValue(done)
+        self._main_window.progress_bar.setFormat(f'{self.translate_text(name)} ({done}/{total})')
 
     def start_application(self):
         """Start the application
@@ -972,16 +1677,96 @@ def _read_gui_definition(gui_def) -> dict:
     return def_gui
 
 
-def _read_translations(translation_file) -> dict:
-    """Read the translations from the given file into a translation dictionary.
+def format_duration(seconds) -> str:
+    """Format a duration in seconds as time text (HH:MM:SS). Hours are not limited to one day.
+
+    :param seconds: duration in seconds
+    :return: time text, or the value as text if it is no number
+    """
+
+    try:
+        hours, rest = divmod(int(seconds), 3600)
+    except (TypeError, ValueError):
+        return str(seconds)  # missing or not converted value
+    return f'{hours:02d}:{rest // 60:02d}:{rest % 60:02d}'
+
+
+def _format_value(column, value) -> str:
+    """Format a value of a column as it is displayed
+
+    :param column: name of the column
+    :param value: value of the column
+    :return: text to be displayed
+    """
+
+    return format_duration(value) if column in DURATION_COLUMNS else str(value)
+
+
+def _get_display_texts(entry) -> list:
+    """Format all values of an entry as they are displayed
+
+    :param entry: Series element or record of the entry, the columns are given by keys()
+    :return: list of texts in the order of the columns
+    """
+
+    return [_format_value(column, value) for column, value in zip(entry.keys(), entry)]
+
+
+def _get_field_accessors(field) -> tuple:
+    """Get the functions to read and set the value of a field, chosen once by the type of the field
+
+    :param field: field of a widget (QLineEdit, QTextEdit, QTimeEdit, QDateEdit or QSpinBox)
+    :return: tuple of field, getter and setter, getter and setter are None if the field type is unknown
+    """
+
+    if isinstance(field, QLineEdit):
+        return field, field.text, lambda field_data: field.setText(str(field_data))
+    elif isinstance(field, QTextEdit):
+        return field, field.toPlainText, field.setPlainText
+    elif isinstance(field, QTimeEdit):
+        # the durations are stored in seconds, the field shows them as time
+        def set_time(field_data):
+            field.setTime(QTime(0, 0).addSecs(0 if field_data == '' else int(field_data)))
+
+        return field, lambda: QTime(0, 0).secsTo(field.time()), set_time
+    elif isinstance(field, QDateEdit):
+        # the dates are stored as ISO text, a field with a special value text shows a missing date as its minimum
+        def set_date(field_data):
+            if isinstance(field_data, str) and field_data != '':
+                field.setDate(QDate.fromString(field_data, Qt.ISODate))
+            else:
+                field.setDate(field.minimumDate() if field.specialValueText() != '' else QDate.currentDate())
+
+        def get_date():
+            if field.specialValueText() != '' and field.date() == field.minimumDate():
+                return ''
+            return field.date().toString(Qt.ISODate)
+
+        return field, get_date, set_date
+    elif isinstance(field, QSpinBox):
+        def set_number(field_data):
+            try:
+                field.setValue(int(field_data))
+            except (TypeError, ValueError):
+                field.setValue(field.minimum())  # missing value, e.g. NULL in the database
+
+        return field, field.value, set_number
+    return field, None, None
+
+
+def _read_translations(translation_file) -> tuple[dict, dict]:
+    """Read the translations from the given file into a translation dictionary and its reverse dictionary.
     The assignments in the file need to be separated by '='
 
     :param translation_file: file that stores the translations
-    :return: dictionary of the translation assignments
+    :return: tuple of the dictionary of the translation assignments and the reversed dictionary
     """
 
     translation_dict = {}
     for line in open(translation_file, encoding='UTF-8').readlines():
         line_data = line.split('=')
         translation_dict[line_data[0]] = line_data[1].split('\n')[0]
-    return translation_dict
+
+    # build the reverse dictionary once to translate displayed texts back
+    reverse_dict = dict(zip(translation_dict.values(), translation_dict.keys()))
+    return translation_dict, reverse_dict
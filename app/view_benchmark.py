@@ -0,0 +1,155 @@
+"""Headless benchmarks for the widget operations of the MainApplication on generated databases of increasing size.
+The application is started with the offscreen platform, so no display is needed.
+Every database size is measured in its own process, as only one QApplication can exist per process.
+
+Usage (from the app folder):
+    python view_benchmark.py --sizes 100 1000 10000 --output view_v1.json
+    python view_benchmark.py --output view_v2.json --compare view_v1.json
+"""
+
+import os
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')  # must be set before the QApplication is created
+
+import control
+import data
+import data_benchmark
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from PyQt5.QtCore import QObject, QEvent
+
+DB_DEF = 'data/db_def.xml'
+GUI_DEF = 'view/gui_def.xml'
+SIZES = [100, 1000, 10000]
+REPEAT = 3
+PAINT_TIMEOUT = 30  # seconds to wait for the first paint of the main window
+
+
+class _PaintFilter(QObject):
+    """Event filter to notice the first paint event of a widget
+    """
+
+    painted = False
+
+    def eventFilter(self, watched, event):
+        """Check every event of the watched widget for a paint event
+
+        :param watched: watched widget
+        :param event: event of the widget
+        :return: False, so the event is processed normally
+        """
+
+        if event.type() == QEvent.Paint:
+            self.painted = True
+        return False
+
+
+def _measure_startup(database, path) -> tuple:
+    """Create the main control and wait until the main window was painted for the first time
+
+    :param database: path to the database file
+    :param path: path of the application
+    :return: tuple of the main control and the duration in seconds
+    """
+
+    start = time.perf_counter()
+    main_control = control.MainControl(database, DB_DEF, GUI_DEF, path)
+    paint_filter = _PaintFilter()
+    main_control.main_app.get_main_window().installEventFilter(paint_filter)
+    while not paint_filter.painted and time.perf_counter() - start < PAINT_TIMEOUT:
+        main_control.main_app.processEvents()
+    duration = time.perf_counter() - start
+    main_control.main_app.get_main_window().removeEventFilter(paint_filter)
+
+    return main_control, duration
+
+
+def run_benchmarks(database, repeat=REPEAT) -> dict:
+    """Run all widget benchmarks on the given database
+
+    :param database: path to the database file
+    :param repeat: number of calls per benchmark
+    :return: dictionary of benchmark names and their statistics
+    """
+
+    path = os.path.dirname(os.path.realpath(__file__))
+    main_control, duration = _measure_startup(database, path)
+    main_app = main_control.main_app
+    results = {'startup_first_paint': {'min': duration, 'median': duration, 'mean': duration, 'repeat': 1}}
+
+    # the data is retrieved beforehand, so only the widget operations are measured
+    table_data = main_control._get_data_of_tables(main_control.main_tables)
+    results['get_tree_structure'] = data_benchmark.measure(main_control._get_tree_structure, repeat)
+    tree_items = []
+
+    def set_main_tree_widget():
+        # tree items can only be inserted into one tree widget, so they need to be built for every call
+        main_app.set_main_tree_widget(tree_items.pop())
+
+    for _ in range(repeat):
+        tree_items.append(main_control._get_tree_structure())
+    results['set_main_tree_widget'] = data_benchmark.measure(set_main_tree_widget, repeat)
+    results['init_main_widget'] = data_benchmark.measure(
+        lambda: main_app.init_main_widget(main_control.main_tables, table_data), repeat)
+
+    def switch_main_widget():
+        main_app.switch_main_widget(data.NAME_EXERCISE)
+        main_app.switch_main_widget()
+
+    results['switch_main_widget'] = data_benchmark.measure(switch_main_widget, repeat)
+
+    main_app.switch_main_widget(control.NAME_SEARCH)
+    results['set_search_table'] = data_benchmark.measure(
+        lambda: main_app.set_search_table(data.NAME_EXERCISE, table_data[data.NAME_EXERCISE]), repeat)
+    main_app.switch_main_widget()
+
+    main_app.switch_main_widget(data.NAME_EXERCISE)
+    results['set_relation_table'] = data_benchmark.measure(
+        lambda: main_app.set_relation_table(data.NAME_CATEGORY, table_data[data.NAME_CATEGORY], True), repeat)
+    main_app.switch_main_widget()
+
+    return results
+
+
+def main():
+    """Generate the databases, run the benchmarks for every size in a separate process and write the results as JSON.
+    If called with --database, the benchmarks are run for this database and the results are printed as JSON.
+
+    :return: exit code, 1 if a regression was found compared to the baseline
+    """
+
+    parser = data_benchmark.create_parser('Headless benchmarks for the MainApplication', 'view_benchmark.json',
+                                          SIZES, REPEAT)
+    parser.add_argument('--database', default=None, help='run the benchmarks for this database only')
+    args = parser.parse_args()
+
+    if args.database is not None:
+        # single process for one database, the results are read by the parent process
+        print(json.dumps(run_benchmarks(args.database, args.repeat)))
+        return 0
+
+    results = data_benchmark.create_results(platform=os.environ['QT_QPA_PLATFORM'])
+
+    with tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as directory:
+        for size in args.sizes:
+            database = os.path.join(directory, f'benchmark_{size}.db')
+            data_benchmark.generate_database(database, DB_DEF, size)
+
+            process = subprocess.run([sys.executable, os.path.realpath(__file__), '--database', database,
+                                      '--repeat', str(args.repeat)], capture_output=True, text=True)
+            if process.returncode != 0:
+                print(process.stderr)
+                return process.returncode
+
+            # the results are the last line of the output, Qt may print warnings before
+            results['results'][str(size)] = json.loads(process.stdout.strip().splitlines()[-1])
+            print(f'{size} rows per table: {results["results"][str(size)]["startup_first_paint"]["min"]:.3f}s startup')
+
+    return data_benchmark.write_results(results, args.output, args.compare)
+
+
+if __name__ == '__main__':
+    exit(main())
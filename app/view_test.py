@@ -0,0 +1,69 @@
+import atexit
+import os
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')  # must be set before the QApplication is created
+
+import control
+import data
+import pandas as pd
+import shutil
+import tempfile
+import unittest
+import view
+from PyQt5.QtWidgets import QTableWidget
+
+DATABASE = 'data/test.db'
+DB_DEF = 'data/db_def.xml'
+GUI_DEF = 'view/gui_def.xml'
+
+
+class ViewUnitTest(unittest.TestCase):
+    def test_set_language(self):
+        main_app = main_control.main_app
+        tree_item = main_app._main_tree_items[(data.NAME_EXERCISE, '0')][0]
+        header_item = main_app.get_main_window().main_right.treeWidget.headerItem()
+        table_widget = main_app.get_main_left().findChild(QTableWidget, 'tableMain_plan_calendar')
+
+        main_control._switch_language()
+        # assert that the displayed texts were translated into the next language
+        self.assertEqual(main_app.get_language(), 'en')
+        self.assertEqual(tree_item.text(0), 'Exercise')
+        self.assertEqual(header_item.text(view.TREE_TOTAL_COLUMN), 'Total duration')
+        self.assertEqual(table_widget.horizontalHeaderItem(1).text(), 'Plan ID')
+        self.assertEqual(main_app.translate_text_reverse('Exercise'), data.NAME_EXERCISE)
+
+        main_control._switch_language()
+        # assert that switching through all languages leads back to the default language
+        self.assertEqual(main_app.get_language(), view.LANGUAGE_DEFAULT)
+        self.assertEqual(tree_item.text(0), 'Übung')
+        self.assertEqual(header_item.text(view.TREE_TOTAL_COLUMN), 'Gesamtdauer')
+        self.assertEqual(table_widget.horizontalHeaderItem(1).text(), 'Plan-ID')
+
+    def test_sorted_table_ids(self):
+        main_app = main_control.main_app
+        table_widget = main_app.get_main_left().findChild(QTableWidget, 'tableMain_resource')
+        main_app._set_table_widget(table_widget, pd.DataFrame({'ID': [0, 1, 2], 'NAME': ['B', 'C', 'A'],
+                                                               'DESCRIPTION': ['', '', '']}), 2)
+        table_widget.sortItems(1)  # like a click on the header of the names
+
+        # assert that the IDs follow the rows when they are sorted
+        main_app._set_table_widget_selection(table_widget, [0])
+        self.assertEqual(main_app.get_selected_ids_of_widget('tableMain_resource').tolist(), [2])
+        self.assertEqual(main_app._get_row_ids(table_widget).tolist(), [2, 0, 1])
+        # assert that the changed rows are found by their IDs and sorted again
+        main_app.update_main_table_row(data.NAME_RESOURCE, pd.Series({'ID': 0, 'NAME': 'D', 'DESCRIPTION': ''}))
+        main_app.remove_main_table_row(data.NAME_RESOURCE, 1)
+        main_app.insert_main_table_row(data.NAME_RESOURCE, pd.Series({'ID': 3, 'NAME': 'B', 'DESCRIPTION': ''}))
+        self.assertEqual([table_widget.item(row, 1).text() for row in range(table_widget.rowCount())], ['A', 'B', 'D'])
+        self.assertEqual(main_app._get_row_ids(table_widget).tolist(), [2, 3, 0])
+
+        main_app.init_main_widget([data.NAME_RESOURCE], main_control._get_data_of_tables([data.NAME_RESOURCE]))
+
+
+if __name__ == '__main__':
+    # the tests run on a copy, as opening the database upgrades the tables of the first version
+    test_directory = tempfile.mkdtemp()
+    atexit.register(shutil.rmtree, test_directory, ignore_errors=True)
+    DATABASE = shutil.copy(DATABASE, test_directory)
+    main_control = control.MainControl(DATABASE, DB_DEF, GUI_DEF, os.path.dirname(os.path.realpath(__file__)))
+    unittest.main()